@@ -0,0 +1,111 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Compare the chunk splitters on sample PDF files.
+
+usage:
+    python benchmark/text_splitter_benchmark.py --chunk-size 500 --chunk-overlap 50 a.pdf b.pdf
+
+For each chunk splitter it prints the throughput in characters per second,
+the number of chunks, and the agreement of the chunk boundaries with the
+spacy splitter. The agreement is the Jaccard similarity of the chunk end
+positions, ignoring the whitespace.
+"""
+
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_manipulation'))
+
+from file_handle import text_splitter
+from langchain.document_loaders import PyPDFLoader
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the chunk splitters.')
+    parser.add_argument('files', nargs='+', help='the sample PDF files')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--chunk-overlap', type=int, default=50)
+    args = parser.parse_args()
+
+    pages = []
+    for file_path in args.files:
+        pages.extend(page.page_content for page in PyPDFLoader(file_path).load())
+    total_characters = sum(len(page) for page in pages)
+    print(f"{len(args.files)} files, {len(pages)} pages, {total_characters} characters")
+
+    # load the spaCy pipeline before timing
+    text_splitter.prewarm_spacy_pipeline()
+
+    chunk_ends_for_splitters = {}
+    for chunk_splitter in text_splitter.CHUNK_SPLITTERS:
+        splitter = text_splitter.get_text_splitter(
+            chunk_splitter=chunk_splitter,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap
+        )
+
+        start_time = time.perf_counter()
+        chunks_for_pages = [splitter.split_text(page) for page in pages]
+        cost = time.perf_counter() - start_time
+
+        chunk_ends = set()
+        for page_index, (page, chunks) in enumerate(zip(pages, chunks_for_pages)):
+            for chunk_end in _get_chunk_ends(page, chunks):
+                chunk_ends.add((page_index, chunk_end))
+        chunk_ends_for_splitters[chunk_splitter] = chunk_ends
+
+        agreement = _get_agreement(chunk_ends, chunk_ends_for_splitters['spacy'])
+        print(''.join([
+            f"{chunk_splitter:>8}: ",
+            f"{cost:8.3f} seconds, ",
+            f"{total_characters / max(cost, 1e-9):14.0f} characters/second, ",
+            f"{sum(len(chunks) for chunks in chunks_for_pages):6d} chunks, ",
+            f"boundary agreement with spacy {agreement:.2%}"
+        ]))
+
+
+def _get_chunk_ends(page, chunks):
+    """Get the end positions of the chunks in the page without whitespace."""
+    page = _WHITESPACE_PATTERN.sub('', page)
+    chunk_ends = []
+    search_start = 0
+    for chunk in chunks:
+        chunk = _WHITESPACE_PATTERN.sub('', chunk)
+        position = page.find(chunk, search_start)
+        if position < 0:
+            continue
+        chunk_ends.append(position + len(chunk))
+        search_start = position + 1
+
+    return chunk_ends
+
+
+def _get_agreement(chunk_ends, base_chunk_ends):
+    union = chunk_ends | base_chunk_ends
+    if len(union) == 0:
+        return 1.0
+
+    return len(chunk_ends & base_chunk_ends) / len(union)
+
+
+if __name__ == '__main__':
+    main()
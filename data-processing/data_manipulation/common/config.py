@@ -15,6 +15,7 @@
 
 import logging
 import os
+import threading
 from pathlib import Path
 import traceback
 import yaml
@@ -69,6 +70,26 @@ class Config(metaclass=Singleton):
         self.minio_secure = minio_config.get('minio_secure')
         # minio data set prefix
         self.minio_dataset_prefix = 'dataset'
+        # read the files from minio into a buffer instead of downloading
+        # them into the temp folder
+        minio_stream_enabled = os.getenv('MINIO_STREAM_ENABLED', 'false')
+        self.minio_stream_enabled = minio_stream_enabled.lower() == 'true'
+        # the max bytes of a file kept in memory when it is read into a buffer,
+        # a larger file is spilled to a temp file
+        self.minio_stream_max_memory_size = 64 * 1024 * 1024
+        # the number of files downloaded from minio ahead of the files being
+        # processed in a task
+        self.minio_prefetch_depth = 1
+        # the max bytes of the downloaded files kept in a task, including
+        # the files being processed
+        self.minio_prefetch_max_bytes = 1024 * 1024 * 1024
+        # the max number of files uploaded to minio at the same time
+        minio_upload_concurrency = os.getenv('MINIO_UPLOAD_CONCURRENCY', '8')
+        self.minio_upload_concurrency = max(1, int(minio_upload_concurrency))
+        # a file larger than the part size is uploaded in parts
+        self.minio_upload_part_size = 16 * 1024 * 1024
+        # the max number of parts of one file uploaded at the same time
+        self.minio_upload_part_concurrency = 3
 
         llm_qa_retry_count = model_cr.get_llm_qa_retry_count_in_k8s_configmap(
                 namespace=k8s_pod_namespace,
@@ -80,12 +101,83 @@ class Config(metaclass=Singleton):
 
         self.llm_qa_retry_count =  int(llm_qa_retry_count)
 
+        llm_qa_concurrency = model_cr.get_llm_qa_concurrency_in_k8s_configmap(
+                namespace=k8s_pod_namespace,
+                config_map_name=k8s_default_config
+            )
+
+        if llm_qa_concurrency is None:
+            llm_qa_concurrency = 5
+
+        # the max number of QA requests sent to one model at the same time
+        self.llm_qa_concurrency = max(1, int(llm_qa_concurrency))
+        # the max number of chunks of one file which are read but whose QA is
+        # not finished, the file is read further after one of them is finished
+        self.qa_chunk_window_size = 100
+        # the max number of QA requests sent to one endpoint per second,
+        # no limit if it is None
+        self.llm_qa_rate_limit = 2
+        # the max number of QA requests sent to one endpoint in a burst
+        self.llm_qa_rate_burst = 5
+        # reuse the QA list generated for the same chunk content and llm config
+        self.llm_qa_cache_enabled = True
+        # the max number of QA lists in the cache,
+        # the least recently hit ones are deleted beyond it
+        self.llm_qa_cache_max_size = 100000
+
         # knowledge
         # chunk size
         self.knowledge_chunk_size = 500
         # chunk overlap
         self.knowledge_chunk_overlap = 50
-        
+        # chunk splitter, 'spacy', 'rule' or 'regex'
+        self.knowledge_chunk_splitter = 'spacy'
+        # split the sentences by the spaCy senter instead of the parser, it is
+        # much faster but the sentences and chunks may differ from the parser
+        spacy_senter_enabled = os.getenv('SPACY_SENTER_ENABLED', 'false')
+        self.spacy_senter_enabled = spacy_senter_enabled.lower() == 'true'
+        # load the spaCy pipeline for text splitting when the server starts
+        text_splitter_prewarm = os.getenv('TEXT_SPLITTER_PREWARM', 'false')
+        self.text_splitter_prewarm = text_splitter_prewarm.lower() == 'true'
+
+        # the number of pdf pages kept in memory when a pdf file is split
+        self.pdf_page_window_size = 50
+        # the number of processes to extract the text of a pdf file
+        pdf_process_count = os.getenv('PDF_PROCESS_COUNT', '2')
+        self.pdf_process_count = max(1, int(pdf_process_count))
+        # the pdf file is extracted in one process if it has fewer pages
+        self.pdf_parallel_page_threshold = 100
+        # the number of word paragraphs kept in memory when a docx file is split
+        self.docx_paragraph_window_size = 200
+
+        # file process
+        # the max number of files processed at the same time in one task
+        self.file_process_concurrency = 1
+        # the folder of the temp files, which can be a tmpfs mount such as
+        # /dev/shm/data-processing, file_handle/temp_file in the current
+        # directory if it is not set
+        temp_file_root = os.getenv('TEMP_FILE_ROOT', '')
+        if not temp_file_root:
+            temp_file_root = os.path.join(os.getcwd(), 'file_handle/temp_file')
+        self.temp_file_root = temp_file_root
+        # the max bytes of the temp files and the file buffers of one task,
+        # no limit if it is 0. It is only checked before a file is downloaded,
+        # the files written later such as the csv files are not stopped
+        task_temp_file_quota = os.getenv('TASK_TEMP_FILE_QUOTA', '0')
+        self.task_temp_file_quota = max(0, int(task_temp_file_quota))
+
+        # task schedule
+        # the max number of tasks run at the same time in one server process
+        task_concurrency = os.getenv('TASK_CONCURRENCY', '1')
+        self.task_concurrency = max(1, int(task_concurrency))
+        # the max seconds a worker waits before looking for a waiting task
+        self.task_poll_interval = 5
+        # the seconds between two heartbeats of the running tasks
+        self.task_heartbeat_interval = 30
+        # a running task without a heartbeat for this many seconds is
+        # interrupted, and it is waiting to be run again
+        self.task_heartbeat_timeout = 120
+
         # backend PostgreSQL
         postgresql_config = postgresql_cr.get_postgresql_config_in_k8s_configmap(
                     namespace=k8s_pod_namespace,
@@ -104,6 +196,44 @@ class Config(metaclass=Singleton):
         self.pg_password = postgresql_config.get('password')
         # database name
         self.pg_database = postgresql_config.get('database')
+        # the max number of rows inserted in one statement
+        self.pg_insert_batch_size = 500
+        # the number of rows fetched at a time when the rows are streamed
+        self.pg_fetch_size = 1000
+        # the number of chunks saved in one transaction when a file is split
+        self.chunk_insert_batch_size = 1000
+
+
+
+class _LazyConfig:
+    """The Config which is loaded on first use instead of on import.
+
+    Importing a module does not read the config maps and the custom
+    resources, such as in the pdf worker processes which are spawned
+    and import server.py again.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def __getattr__(self, name):
+        return getattr(self._get_config(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_config(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._get_config(), name)
+
+    def _get_config(self):
+        loaded_config = self.__dict__.get('_config')
+        if loaded_config is None:
+            # 多个线程同时首次使用时只加载一次
+            with self._lock:
+                loaded_config = Config()
+                object.__setattr__(self, '_config', loaded_config)
+
+        return loaded_config
 
 
-config = Config()
+config = _LazyConfig()
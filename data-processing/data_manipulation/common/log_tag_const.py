@@ -29,6 +29,7 @@ PDF_HANDLE = "PDF Handle"
 CSV_HANDLE = "CSV Handle"
 WORD_HANDLE = "Word Handle"
 QA_SPLIT = "Question Answer Split"
+TEXT_SPLITTER = "Text Splitter"
 
 CLEAN_TRANSFORM = "Clean Transform"
 PRIVACY_TRANSFORM = "Privacy Transform"
@@ -14,7 +14,10 @@
 
 import logging
 import os
+import tempfile
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import urllib3
 from common import log_tag_const
@@ -36,6 +39,13 @@ def get_minio_client():
         secure=bool(config.minio_secure),
         http_client=urllib3.PoolManager(
             timeout=urllib3.Timeout.DEFAULT_TIMEOUT,
+            # keep a connection for each request sent at the same time, the
+            # files are downloaded one connection per file, and then uploaded
+            # one connection per part of each file uploaded at the same time
+            maxsize=max(
+                config.minio_upload_concurrency * config.minio_upload_part_concurrency,
+                config.file_process_concurrency
+            ),
             cert_reqs='CERT_NONE',
             retries=urllib3.Retry(
                 total=5,
@@ -51,6 +61,7 @@ def download(
     folder_prefix,
     bucket_name,
     file_name,
+    task_id=None
 ):
     """Download a file.
 
@@ -58,13 +69,14 @@ def download(
     folder_prefix: folder prefix;
     bucket_name: bucket name;
     file_name: file name;
+    task_id: data process task id, the file is downloaded into the temp
+             folder of the task if it is given;
     """
-    file_path = file_utils.get_temp_file_path()
+    file_path = file_utils.get_temp_file_path(task_id)
 
     # 如果文件夹不存在，则创建
     directory_path = file_path + 'original'
-    if not os.path.exists(directory_path):
-        os.makedirs(directory_path)
+    os.makedirs(directory_path, exist_ok=True)
 
     file_path = directory_path + '/' + file_name
 
@@ -75,6 +87,74 @@ def download(
     )
 
 
+def get_object_size(
+    minio_client,
+    folder_prefix,
+    bucket_name,
+    file_name
+):
+    """Get the bytes of a file.
+
+    minio_client: minio client;
+    folder_prefix: folder prefix;
+    bucket_name: bucket name;
+    file_name: file name;
+    """
+    stat = minio_client.stat_object(
+        bucket_name,
+        folder_prefix + '/' + file_name
+    )
+    return stat.size
+
+
+def get_object_buffer(
+    minio_client,
+    folder_prefix,
+    bucket_name,
+    file_name,
+    max_memory_size,
+    read_size=1024 * 1024,
+    temp_dir=None
+):
+    """Read a file into a buffer.
+
+    minio_client: minio client;
+    folder_prefix: folder prefix;
+    bucket_name: bucket name;
+    file_name: file name;
+    max_memory_size: the max bytes kept in memory;
+    read_size: the bytes read from the response at a time;
+    temp_dir: the folder of the temp file, the default temp folder of
+              the system is used if it is None;
+
+    The object is streamed by get_object into a spooled buffer, which is
+    kept in memory if the file is not larger than max_memory_size, or
+    else spilled to an anonymous temp file. The buffer is returned at
+    position 0, and the caller should close it.
+    """
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=max_memory_size,
+        dir=temp_dir
+    )
+    try:
+        response = minio_client.get_object(
+            bucket_name,
+            folder_prefix + '/' + file_name
+        )
+        try:
+            for data in response.stream(read_size):
+                buffer.write(data)
+        finally:
+            response.close()
+            response.release_conn()
+    except Exception:
+        buffer.close()
+        raise
+
+    buffer.seek(0)
+    return buffer
+
+
 def upload_files_to_minio_with_tags(
     minio_client,
     local_folder,
@@ -82,6 +162,7 @@ def upload_files_to_minio_with_tags(
     minio_prefix,
     support_type,
     data_volumes_file,
+    concurrency=None
 ):
     """Upload the files to minio with tags
     
@@ -90,14 +171,33 @@ def upload_files_to_minio_with_tags(
     minio_prefix: folder prefix;
     support_type: support type
     data_volumes_file: data volumes file
+    concurrency: the max number of files uploaded at the same time;
+
+    The files are uploaded by a bounded thread pool, and each uploaded
+    file is deleted. A file which fails to be uploaded is logged and
+    kept. It returns the upload info of each uploaded file, for example
+    [
+        {
+            "object_name": "dataset/ds/v1/a.csv",
+            "size": 1024,
+            "seconds": 0.01
+        }
+    ]
     """
 
     logger.debug(f"{log_tag_const.MINIO} 上传文件到minio中 {data_volumes_file}")
 
-    # 设置tag信息
-    tags = Tags(for_object=True)
-    tags["phase"] = "final"
-    
+    if concurrency is None:
+        concurrency = config.minio_upload_concurrency
+
+    # 针对QA拆分类型的处理需要加上object_type和object_count标签
+    is_qa_split = any(d.get('type') == 'qa_split' for d in support_type)
+    # 按文件名索引数据量
+    object_counts = {}
+    for item in data_volumes_file:
+        object_counts.setdefault(item['object_name'], item['object_count'])
+
+    upload_items = []
     for root, dirs, files in os.walk(local_folder):
         for file in files:
             local_file_path = os.path.join(root, file)
@@ -106,26 +206,99 @@ def upload_files_to_minio_with_tags(
                 os.path.relpath(local_file_path, local_folder)
             )
 
-            # 针对QA拆分类型的处理需要加上object_type和object_count标签
-            if any(d.get('type') == 'qa_split' for d in support_type):
+            # 设置tag信息
+            tags = Tags(for_object=True)
+            tags["phase"] = "final"
+            if is_qa_split:
                 tags['object_type'] = 'QA'
+                if file in object_counts:
+                    tags["object_count"] = str(object_counts[file])
+
+            upload_items.append((local_file_path, minio_object_name, tags))
+
+    start_time = time.time()
+    upload_result = []
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(int(concurrency), len(upload_items))),
+        thread_name_prefix='minio upload'
+    ) as executor:
+        futures = [
+            executor.submit(
+                _upload_file,
+                minio_client,
+                minio_bucket=minio_bucket,
+                minio_object_name=minio_object_name,
+                local_file_path=local_file_path,
+                tags=tags
+            )
+            for local_file_path, minio_object_name, tags in upload_items
+        ]
+
+        for future in as_completed(futures):
+            result = future.result()
+            if result is not None:
+                upload_result.append(result)
+
+    seconds = time.time() - start_time
+    size = sum(item['size'] for item in upload_result)
+    logger.debug(''.join([
+        f"{log_tag_const.MINIO} Upload the files to {minio_bucket}/{minio_prefix}.\n",
+        f"file number: {len(upload_result)}/{len(upload_items)}\n",
+        f"size: {size} bytes\n",
+        f"cost: {seconds:.2f} seconds\n",
+        f"throughput: {_get_throughput(size, seconds)}"
+    ]))
+
+    return upload_result
+
+
+def _upload_file(
+    minio_client,
+    minio_bucket,
+    minio_object_name,
+    local_file_path,
+    tags
+):
+    """Upload a file and delete it, return None if it fails."""
+    try:
+        size = os.path.getsize(local_file_path)
+        start_time = time.time()
+        minio_client.fput_object(
+            minio_bucket,
+            minio_object_name,
+            local_file_path,
+            tags=tags,
+            part_size=config.minio_upload_part_size,
+            num_parallel_uploads=config.minio_upload_part_concurrency
+        )
+        seconds = time.time() - start_time
+
+        logger.debug(''.join([
+            f"{log_tag_const.MINIO} Upload {minio_object_name} to {minio_bucket}.\n",
+            f"size: {size} bytes\n",
+            f"cost: {seconds:.3f} seconds\n",
+            f"throughput: {_get_throughput(size, seconds)}"
+        ]))
 
-                filtered = [item['object_count'] for item in data_volumes_file if item['object_name'] == file]
-                if filtered:
-                    tags["object_count"] = str(filtered[0])
+        # 删除本地文件
+        file_utils.delete_file(local_file_path)
 
-            try:
-                minio_client.fput_object(
-                    minio_bucket, minio_object_name, local_file_path, tags=tags
-                )
+        return {
+            'object_name': minio_object_name,
+            'size': size,
+            'seconds': seconds
+        }
+    except S3Error as ex:
+        logger.error(''.join([
+            f"{log_tag_const.MINIO} Error uploading {minio_object_name} ",
+            f"to {minio_bucket}. \n{traceback.format_exc()}"
+        ]))
+        return None
 
-                # 删除本地文件
-                file_utils.delete_file(local_file_path)
-            except S3Error as ex:
-                logger.error(''.join([
-                    f"{log_tag_const.MINIO} Error uploading {minio_object_name} ",
-                    f"to {minio_bucket}. \n{traceback.format_exc()}"
-                ]))
-                    
 
+def _get_throughput(size, seconds):
+    """Format the throughput in MB/s."""
+    if seconds <= 0:
+        return '-'
 
+    return f"{size / seconds / 1024 / 1024:.2f} MB/s"
@@ -0,0 +1,213 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import threading
+import time
+import traceback
+
+from common import log_tag_const
+
+logger = logging.getLogger(__name__)
+
+
+class FilePrefetcher:
+    """Download the files in order in a background thread, ahead of the
+    files being processed.
+
+    A file is kept from the time it is downloaded until it is released
+    after being processed. The next file is downloaded only if fewer than
+    depth files are kept and the kept files with the next one are not
+    larger than max_bytes, but a file is always downloaded if no file is
+    kept, so that a file larger than max_bytes can still be processed.
+
+    name: the name used in the logs, such as the task id;
+    items: the files to download;
+    size_func: the function which returns the bytes of a file,
+               size_func(item);
+    download_func: the function which downloads a file and returns the
+                   downloaded file, download_func(item);
+    close_func: the function which removes the downloaded file,
+                close_func(item, file);
+    depth: the max number of files kept, including the files being processed;
+    max_bytes: the max bytes of the files kept;
+    """
+
+    def __init__(
+        self,
+        name,
+        items,
+        size_func,
+        download_func,
+        close_func,
+        depth,
+        max_bytes
+    ):
+        self.name = name
+        self._items = items
+        self._size_func = size_func
+        self._download_func = download_func
+        self._close_func = close_func
+        self._depth = max(1, depth)
+        self._max_bytes = max_bytes
+        # the downloaded files keyed by the index in items, for example
+        # {
+        #     "file": the downloaded file,
+        #     "size": the bytes of the file,
+        #     "error": the exception raised by the download
+        # }
+        self._files = {}
+        # the indexes of the files which are released
+        self._released = set()
+        self._kept_count = 0
+        self._kept_bytes = 0
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """Start downloading in a background thread."""
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"file prefetcher {self.name}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def get(self, index):
+        """Wait until the file is downloaded and return it.
+
+        index: the index of the file in items;
+
+        It raises the exception if the file fails to be downloaded.
+        """
+        with self._condition:
+            while index not in self._files:
+                if self._stopped:
+                    raise RuntimeError(f"The file prefetcher {self.name} is stopped.")
+                self._condition.wait()
+
+            item = self._files[index]
+
+        if item.get('error') is not None:
+            raise item['error']
+
+        return item.get('file')
+
+    def release(self, index):
+        """Remove the downloaded file after it is processed.
+
+        index: the index of the file in items;
+        """
+        with self._condition:
+            item = self._files.pop(index, None)
+            self._released.add(index)
+            if item is None:
+                return
+
+            self._kept_count -= 1
+            self._kept_bytes -= item['size']
+            self._condition.notify_all()
+
+        self._close(index, item)
+
+    def stop(self):
+        """Stop downloading and remove the files which are not released."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+
+        with self._condition:
+            files = self._files
+            self._files = {}
+
+        for index, item in files.items():
+            self._close(index, item)
+
+    def _run(self):
+        for index, item in enumerate(self._items):
+            size = 0
+            try:
+                size = self._size_func(item)
+            except Exception:
+                # the size is unknown, the download will report the error
+                pass
+
+            with self._condition:
+                while not self._stopped and self._kept_count > 0 and (
+                    self._kept_count >= self._depth or
+                    self._kept_bytes + size > self._max_bytes
+                ):
+                    self._condition.wait()
+
+                if self._stopped:
+                    return
+
+                if index in self._released:
+                    # the file is skipped before it is downloaded
+                    continue
+
+                self._kept_count += 1
+                self._kept_bytes += size
+
+            start_time = time.time()
+            result = {
+                'size': size
+            }
+            try:
+                result['file'] = self._download_func(item)
+                logger.debug(''.join([
+                    f"{log_tag_const.MINIO_STORE_PROCESS} Prefetch a file of {self.name}.\n",
+                    f"index: {index}\n",
+                    f"size: {size} bytes\n",
+                    f"cost: {time.time() - start_time:.2f} seconds"
+                ]))
+            except Exception as ex:
+                logger.error(''.join([
+                    f"{log_tag_const.MINIO_STORE_PROCESS} Failed to prefetch a file of {self.name}.\n",
+                    f"index: {index}\n",
+                    f"The error is: \n{traceback.format_exc()}"
+                ]))
+                result['error'] = ex
+
+            with self._condition:
+                if index in self._released or self._stopped:
+                    # the file is released or stopped while downloading
+                    self._kept_count -= 1
+                    self._kept_bytes -= size
+                    close_item = result
+                else:
+                    self._files[index] = result
+                    close_item = None
+                self._condition.notify_all()
+
+            if close_item is not None:
+                self._close(index, close_item)
+
+    def _close(self, index, item):
+        if item.get('error') is not None:
+            return
+
+        try:
+            self._close_func(self._items[index], item.get('file'))
+        except Exception:
+            logger.error(''.join([
+                f"{log_tag_const.MINIO_STORE_PROCESS} Failed to remove a prefetched file of {self.name}.\n",
+                f"index: {index}\n",
+                f"The error is: \n{traceback.format_exc()}"
+            ]))
@@ -16,8 +16,10 @@
 import io
 import logging
 import os
+import threading
 import ulid
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pandas as pd
 from common import log_tag_const
@@ -28,6 +30,7 @@ from database_operate import (data_process_db_operate,
                               data_process_detail_db_operate,
                               data_process_detail_preview_db_operate,
                               data_process_log_db_operate)
+from data_store_process.file_prefetcher import FilePrefetcher
 from file_handle import csv_handle, pdf_handle, word_handle
 from kube import dataset_cr
 from utils import file_utils
@@ -35,6 +38,13 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# the bytes reserved against the temp file quota by the files which are
+# being downloaded or are kept in buffers, keyed by the task id and the
+# file name. The buffers are not counted by the size of the temp folder,
+# because they are in memory or spilled to anonymous temp files.
+_reserved_temp_file_bytes = {}
+_reserved_temp_file_bytes_lock = threading.Lock()
+
 
 def text_manipulate(
     req_json,
@@ -44,8 +54,26 @@ def text_manipulate(
     """Manipulate the text content.
     
     req_json is a dictionary object. 
+
+    The files of the task are kept in the temp folder of the task, which
+    is deleted when the task is finished, whether it succeeds or fails.
     """
-    
+    try:
+        return _text_manipulate(
+            req_json,
+            pool=pool,
+            id=id
+        )
+    finally:
+        # 删除任务的临时文件
+        file_utils.delete_dir(file_utils.get_temp_file_path(id))
+
+
+def _text_manipulate(
+    req_json,
+    pool,
+    id
+):
     bucket_name = req_json['bucket_name']
     support_type = req_json['data_process_config_info']
     file_names = req_json['file_names']
@@ -99,75 +127,17 @@ def text_manipulate(
         file_name['document_id']=document_id
 
     # 文件处理
-    task_status = 'process_complete'
-    error_msg = ''
+    file_process_result = _file_manipulate_with_concurrency(
+        req_json,
+        pool=pool,
+        id=id,
+        minio_client=minio_client,
+        folder_prefix=folder_prefix
+    )
+    task_status = file_process_result['task_status']
+    error_msg = file_process_result['error_msg']
     # 存放每个文件对应的数据量
-    data_volumes_file = []
-    
-    for item in file_names:
-        result = None
-        file_name = item['name']
-
-        # 将文件下载到本地
-        minio_store_client.download(
-            minio_client,
-            bucket_name=bucket_name,
-            folder_prefix=folder_prefix,
-            file_name=file_name
-        )
-
-        file_extension = file_utils.get_file_extension(file_name)
-        if file_extension in ['pdf']:
-            # 处理PDF文件
-            result = pdf_handle.text_manipulate(
-                chunk_size=req_json.get('chunk_size'),
-                chunk_overlap=req_json.get('chunk_overlap'),
-                file_name=file_name,
-                document_id=item.get('document_id'),
-                support_type=support_type,
-                conn_pool=pool,
-                task_id=id,
-                create_user=req_json['creator']
-            )
-        
-        elif file_extension in ['docx']:
-            # 处理.docx文件
-            result = word_handle.docx_text_manipulate(
-                chunk_size=req_json.get('chunk_size'),
-                chunk_overlap=req_json.get('chunk_overlap'),
-                file_name=file_name,
-                document_id=document_id,
-                support_type=support_type,
-                conn_pool=pool,
-                task_id=id,
-                create_user=req_json['creator']
-            )
-        
-        # 将下载的本地文件删除
-        _remove_local_file(file_name)
-
-        if result is None:
-            logger.error(''.join([
-                f"{log_tag_const.MINIO_STORE_PROCESS} The file type is not supported \n",
-                f"The current file type is: {file_extension}"
-            ]))
-            # 任务失败
-            task_status = 'process_fail'
-            error_msg = f"{file_extension} file type is not currently supported."
-            break
-
-        if result.get('status') != 200:
-            # 任务失败
-            logger.error(''.join([
-                f"{log_tag_const.MINIO_STORE_PROCESS} Data process fail \n",
-                f"The file name: {file_name}\n",
-                f"The error is: {result.get('message')}\n"
-            ]))
-            task_status = 'process_fail'
-            error_msg = result.get('message')
-            break
-
-        data_volumes_file.append(result['data'])
+    data_volumes_file = file_process_result['data_volumes_file']
 
     # insert QA list to detail preview
     logger.debug(f"{log_tag_const.MINIO_STORE_PROCESS} Insert QA list for detail preview.")
@@ -189,8 +159,8 @@ def text_manipulate(
         )
 
     # 将清洗后的文件上传到MinIO中
-    # 上传final文件夹下的文件，并添加tag
-    file_path = file_utils.get_temp_file_path()
+    # 上传任务的final文件夹下的文件，并添加tag
+    file_path = file_utils.get_temp_file_path(id)
     minio_store_client.upload_files_to_minio_with_tags(
         minio_client=minio_client,
         local_folder=file_path + 'final',
@@ -238,9 +208,380 @@ def text_manipulate(
     }
 
 
-def _remove_local_file(file_name):
+def _file_manipulate_with_concurrency(
+    req_json,
+    pool,
+    id,
+    minio_client,
+    folder_prefix
+):
+    """Manipulate all the files in the task, several files at the same time.
+
+    req_json: the task request, the optional key 'file_process_concurrency'
+              is the max number of files processed at the same time;
+    pool: database connection pool;
+    id: data process task id;
+    minio_client: minio client;
+    folder_prefix: folder prefix;
+
+    The files are processed by a bounded thread pool. Once a file fails,
+    the files which are not started yet are skipped and the first failure
+    is used as the task result. The files are downloaded in order by a
+    prefetcher, config.minio_prefetch_depth files ahead of the files being
+    processed, and the downloaded files are limited to
+    config.minio_prefetch_max_bytes.
+    """
+    file_names = req_json['file_names']
+    concurrency = _get_file_process_concurrency(req_json)
+
+    # the result of each file, in the same order as file_names
+    file_results = [None] * len(file_names)
+
+    stop_event = threading.Event()
+
+    # 处理当前文件时预先下载后面的文件
+    prefetcher = FilePrefetcher(
+        name=f"task {id}",
+        items=file_names,
+        size_func=lambda item: minio_store_client.get_object_size(
+            minio_client,
+            bucket_name=req_json['bucket_name'],
+            folder_prefix=folder_prefix,
+            file_name=item['name']
+        ),
+        download_func=lambda item: _download_file(
+            item,
+            req_json=req_json,
+            id=id,
+            minio_client=minio_client,
+            folder_prefix=folder_prefix
+        ),
+        close_func=lambda item, file: _close_file(item, file, id=id),
+        depth=concurrency + config.minio_prefetch_depth,
+        max_bytes=config.minio_prefetch_max_bytes
+    )
+
+    def manipulate_file_unless_stopped(index, item):
+        try:
+            if stop_event.is_set():
+                return None
+
+            result = _file_manipulate(
+                item,
+                req_json=req_json,
+                pool=pool,
+                id=id,
+                get_file=lambda: prefetcher.get(index)
+            )
+        finally:
+            prefetcher.release(index)
+
+        if result.get('status') != 200:
+            # 其余未开始处理的文件不再处理
+            stop_event.set()
+
+        return result
+
+    logger.debug(''.join([
+        f"{log_tag_const.MINIO_STORE_PROCESS} Start to manipulate the files.\n",
+        f"file number: {len(file_names)}\n",
+        f"concurrency: {concurrency}"
+    ]))
+
+    prefetcher.start()
+    try:
+        task_status, error_msg = _wait_for_files(
+            manipulate_file_unless_stopped,
+            file_names=file_names,
+            file_results=file_results,
+            concurrency=concurrency,
+            id=id
+        )
+    finally:
+        prefetcher.stop()
+
+    return {
+        'task_status': task_status,
+        'error_msg': error_msg,
+        'data_volumes_file': [item for item in file_results if item is not None]
+    }
+
+
+def _wait_for_files(
+    manipulate_file_unless_stopped,
+    file_names,
+    file_results,
+    concurrency,
+    id
+):
+    """Manipulate the files in a thread pool and wait for them.
+
+    It saves the result of each file into file_results, and returns the
+    task status and the error message.
+    """
+    task_status = 'process_complete'
+    error_msg = ''
+    with ThreadPoolExecutor(
+        max_workers=concurrency,
+        thread_name_prefix=f"file manipulate task {id}"
+    ) as executor:
+        future_to_index = {
+            executor.submit(manipulate_file_unless_stopped, index, item): index
+            for index, item in enumerate(file_names)
+        }
+
+        for future in as_completed(future_to_index):
+            if future.cancelled():
+                continue
+
+            result = future.result()
+            if result is None:
+                # the file is skipped because another file has failed.
+                continue
+
+            if result.get('status') != 200:
+                if task_status != 'process_fail':
+                    task_status = 'process_fail'
+                    error_msg = result.get('message')
+
+                    for not_done_future in future_to_index:
+                        not_done_future.cancel()
+                continue
+
+            file_results[future_to_index[future]] = result['data']
+
+    return task_status, error_msg
+
+
+def _file_manipulate(
+    item,
+    req_json,
+    pool,
+    id,
+    get_file
+):
+    """Manipulate a downloaded file.
+
+    item: the file info, for example
+        {
+            "name": "数据处理文件_小T.pdf",
+            "document_id": "01HGWBE48DT3ADE9ZKA62SW4WS"
+        }
+    req_json: the task request;
+    pool: database connection pool;
+    id: data process task id;
+    get_file: the function which waits until the file is downloaded and
+              returns the file object, or None if the file is downloaded
+              into the temp folder;
+    """
+    file_name = item['name']
+    support_type = req_json['data_process_config_info']
+    file_extension = file_utils.get_file_extension(file_name)
+
+    try:
+        result = None
+
+        # 等待文件下载完成
+        file = get_file()
+
+        if file_extension in ['pdf']:
+            # 处理PDF文件
+            result = pdf_handle.text_manipulate(
+                chunk_size=req_json.get('chunk_size'),
+                chunk_overlap=req_json.get('chunk_overlap'),
+                chunk_splitter=req_json.get('chunk_splitter'),
+                file_name=file_name,
+                document_id=item.get('document_id'),
+                support_type=support_type,
+                conn_pool=pool,
+                task_id=id,
+                create_user=req_json['creator'],
+                file=file
+            )
+
+        elif file_extension in ['docx']:
+            # 处理.docx文件
+            result = word_handle.docx_text_manipulate(
+                chunk_size=req_json.get('chunk_size'),
+                chunk_overlap=req_json.get('chunk_overlap'),
+                chunk_splitter=req_json.get('chunk_splitter'),
+                file_name=file_name,
+                document_id=item.get('document_id'),
+                support_type=support_type,
+                conn_pool=pool,
+                task_id=id,
+                create_user=req_json['creator'],
+                file=file
+            )
+    except Exception as ex:
+        logger.error(''.join([
+            f"{log_tag_const.MINIO_STORE_PROCESS} Data process fail \n",
+            f"The file name: {file_name}\n",
+            f"The error is: \n{traceback.format_exc()}\n"
+        ]))
+        return {
+            'status': 400,
+            'message': str(ex),
+            'data': traceback.format_exc()
+        }
+
+    if result is None:
+        logger.error(''.join([
+            f"{log_tag_const.MINIO_STORE_PROCESS} The file type is not supported \n",
+            f"The current file type is: {file_extension}"
+        ]))
+        return {
+            'status': 1000,
+            'message': f"{file_extension} file type is not currently supported.",
+            'data': ''
+        }
+
+    if result.get('status') != 200:
+        logger.error(''.join([
+            f"{log_tag_const.MINIO_STORE_PROCESS} Data process fail \n",
+            f"The file name: {file_name}\n",
+            f"The error is: {result.get('message')}\n"
+        ]))
+
+    return result
+
+
+def _get_file_process_concurrency(req_json):
+    """Get the max number of files processed at the same time.
+
+    req_json: the task request;
+    """
+    concurrency = req_json.get('file_process_concurrency')
+    if concurrency is None:
+        concurrency = config.file_process_concurrency
+
+    return max(1, int(concurrency))
+
+
+def _download_file(
+    item,
+    req_json,
+    id,
+    minio_client,
+    folder_prefix
+):
+    """Download a file from minio.
+
+    It returns a buffer of the file if config.minio_stream_enabled is
+    true, or else None after the file is downloaded into the temp folder
+    of the task.
+
+    The quota config.task_temp_file_quota is only checked before a file
+    is downloaded, it raises an error if the file with the temp folder of
+    the task and the buffers kept by the task would be larger than the
+    quota. The files written into the temp folder later, such as the csv
+    files under final, are not checked when they are written, they are
+    counted when the next file is downloaded.
+    """
+    file_name = item['name']
+    temp_dir = file_utils.get_temp_file_path(id)
+    if config.task_temp_file_quota > 0:
+        size = minio_store_client.get_object_size(
+            minio_client,
+            bucket_name=req_json['bucket_name'],
+            folder_prefix=folder_prefix,
+            file_name=file_name
+        )
+        _reserve_temp_file_bytes(
+            file_name,
+            size=size,
+            temp_dir=temp_dir,
+            id=id
+        )
+
+    try:
+        if config.minio_stream_enabled:
+            # 将文件读入内存，较大的文件写入匿名临时文件，不保存到本地目录
+            # 匿名临时文件不在目录中，关闭缓冲前一直占用配额
+            return minio_store_client.get_object_buffer(
+                minio_client,
+                bucket_name=req_json['bucket_name'],
+                folder_prefix=folder_prefix,
+                file_name=file_name,
+                max_memory_size=config.minio_stream_max_memory_size,
+                temp_dir=_make_dir(temp_dir)
+            )
+    except Exception:
+        _release_temp_file_bytes(file_name, id=id)
+        raise
+
+    # 将文件下载到本地，下载完成后文件的大小计入临时目录
+    try:
+        minio_store_client.download(
+            minio_client,
+            bucket_name=req_json['bucket_name'],
+            folder_prefix=folder_prefix,
+            file_name=file_name,
+            task_id=id
+        )
+    finally:
+        _release_temp_file_bytes(file_name, id=id)
+    return None
+
+
+def _close_file(item, file, id):
+    """Remove the file downloaded by _download_file."""
+    if file is not None:
+        file.close()
+        _release_temp_file_bytes(item['name'], id=id)
+    else:
+        # 将下载的本地文件删除
+        _remove_local_file(item['name'], task_id=id)
+
+
+def _reserve_temp_file_bytes(
+    file_name,
+    size,
+    temp_dir,
+    id
+):
+    """Reserve the bytes of a file against config.task_temp_file_quota.
+
+    It raises an error if the size of the temp folder, the bytes reserved
+    by the task and the file would be larger than the quota.
+    """
+    with _reserved_temp_file_bytes_lock:
+        task_reserved_bytes = _reserved_temp_file_bytes.setdefault(id, {})
+        reserved_size = sum(task_reserved_bytes.values())
+        used_size = file_utils.get_dir_size(temp_dir) + reserved_size
+        if used_size + size > config.task_temp_file_quota:
+            if len(task_reserved_bytes) == 0:
+                del _reserved_temp_file_bytes[id]
+            raise ValueError(''.join([
+                f"任务的临时文件超出磁盘配额，已使用{used_size}字节，",
+                f"其中缓冲占用{reserved_size}字节，",
+                f"文件{file_name}有{size}字节，配额为{config.task_temp_file_quota}字节"
+            ]))
+
+        task_reserved_bytes[file_name] = size
+
+
+def _release_temp_file_bytes(file_name, id):
+    """Release the bytes reserved by _reserve_temp_file_bytes."""
+    with _reserved_temp_file_bytes_lock:
+        task_reserved_bytes = _reserved_temp_file_bytes.get(id)
+        if task_reserved_bytes is None:
+            return
+
+        task_reserved_bytes.pop(file_name, None)
+        if len(task_reserved_bytes) == 0:
+            del _reserved_temp_file_bytes[id]
+
+
+def _make_dir(dir_path):
+    """Create the folder if it does not exist and return it."""
+    os.makedirs(dir_path, exist_ok=True)
+    return dir_path
+
+
+def _remove_local_file(file_name, task_id=None):
     try:
-        remove_file_path = file_utils.get_temp_file_path()
+        remove_file_path = file_utils.get_temp_file_path(task_id)
         local_file_path = remove_file_path + 'original/' + file_name
         file_utils.delete_file(local_file_path)
         return {
@@ -14,6 +14,7 @@
 
 import logging
 import traceback
+import uuid
 
 import psycopg2.extras
 from common import log_tag_const
@@ -91,6 +92,44 @@ def execute_query(pool, sql, params={}):
     }
 
     
+def iter_query(pool, sql, params={}, fetch_size=None):
+    """Execute a query with a server-side cursor and yield the rows one by one.
+
+    pool: database connection pool;
+    sql: the query sql;
+    params: the parameters;
+    fetch_size: the number of rows fetched from the server at a time;
+
+    The rows are tuples in the order of the selected columns, only
+    fetch_size rows are kept in memory. The connection is held until all
+    the rows are read or the generator is closed. An error is logged and
+    raised.
+    """
+    if fetch_size is None:
+        fetch_size = 1000
+
+    try:
+        # 服务端游标需要在事务中使用，不能共享连接
+        with pool.connection(shareable=False) as conn:
+            try:
+                with conn.cursor(name=f"iter_query_{uuid.uuid4().hex}") as cursor:
+                    cursor.execute(sql, params)
+                    while True:
+                        rows = cursor.fetchmany(fetch_size)
+                        if len(rows) == 0:
+                            break
+                        yield from rows
+            finally:
+                conn.rollback()
+    except Exception as ex:
+        logger.error(''.join([
+            f"{log_tag_const.DATABASE_POSTGRESQL} Executing the sql with a server-side cursor failed\n {sql} \n",
+            f"The error is: \n{str(ex)}\n",
+            f"The tracing error is: \n{traceback.format_exc()}\n"
+        ]))
+        raise
+
+
 def execute_count_query(pool, sql, params={}):
     """Execute a count query with the parameters."""
     error = ''
@@ -156,3 +195,169 @@ def execute_update(pool, sql, params={}):
     }
 
 
+def execute_update_returning(pool, sql, params={}):
+    """Execute a update with a returning clause and return the rows.
+
+    pool: database connection pool;
+    sql: the update sql which ends with 'returning ...';
+    params: the parameters;
+
+    The rows are returned only after the update is committed.
+    """
+    error = ''
+    data = []
+    try:
+        # 共享的连接可能被其他线程提交或回滚，使用独占的连接
+        with pool.connection(shareable=False) as conn:
+            try:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+                    cursor.execute(sql, params)
+                    for row in cursor.fetchall():
+                        data.append(dict(row))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    except Exception as ex:
+        error = str(ex)
+        data = None
+        logger.error(''.join([
+            f"{log_tag_const.DATABASE_POSTGRESQL} Executing the update sql failed\n {sql} \n",
+            f"\nThe error is: \n{error}\n",
+            f"The tracing error is: \n{traceback.format_exc()}\n"
+        ]))
+
+    if len(error) > 0:
+        return {
+            'status': 400,
+            'message': error,
+            'data': traceback.format_exc()
+        }
+
+    return {
+        'status': 200,
+        'message': '处理成功',
+        "data": data
+    }
+
+
+def execute_batch_insert(pool, sql, params_list, template=None, page_size=None):
+    """Execute a multi-row insert with the parameters list in one transaction.
+
+    pool: database connection pool;
+    sql: the insert sql which ends with 'values %s';
+    params_list: the parameters list, one item for one row;
+    template: the row template such as '(%(id)s, %(name)s)';
+    page_size: the max number of rows in one statement;
+    """
+    if page_size is None:
+        page_size = 100
+
+    error = ''
+    data = None
+    try:
+        # 共享的连接可能被其他线程提交或回滚，事务使用独占的连接
+        with pool.connection(shareable=False) as conn:
+            try:
+                with conn.cursor() as cursor:
+                    psycopg2.extras.execute_values(
+                        cursor,
+                        sql,
+                        params_list,
+                        template=template,
+                        page_size=page_size
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    except Exception as ex:
+        error = str(ex)
+        data = None
+        logger.error(''.join([
+            f"{log_tag_const.DATABASE_POSTGRESQL} Executing the batch insert sql failed\n {sql} \n",
+            f"\nThe error is: \n{error}\n",
+            f"The tracing error is: \n{traceback.format_exc()}\n"
+        ]))
+
+    if len(error) > 0:
+        return {
+            'status': 400,
+            'message': error,
+            'data': traceback.format_exc()
+        }
+
+    return {
+        'status': 200,
+        'message': '处理成功',
+        "data": data
+    }
+
+
+def execute_transaction(pool, statements):
+    """Execute the statements in one transaction, nothing is saved if one fails.
+
+    pool: database connection pool;
+    statements: the statements in order, for example
+        [
+            {
+                "sql": "update ... where id = %(id)s",
+                "params": {"id": "xxx"}
+            },
+            {
+                "sql": "insert into ... values %s",
+                "params_list": [{"id": "xxx"}],
+                "template": "(%(id)s)",
+                "page_size": 500
+            }
+        ]
+        a statement with params_list is a multi-row insert, it is skipped
+        if params_list is empty;
+    """
+    error = ''
+    data = None
+    sql = ''
+    try:
+        # 共享的连接可能被其他线程提交或回滚，事务使用独占的连接
+        with pool.connection(shareable=False) as conn:
+            try:
+                with conn.cursor() as cursor:
+                    for statement in statements:
+                        sql = statement['sql']
+                        if 'params_list' in statement:
+                            if len(statement['params_list']) == 0:
+                                continue
+                            psycopg2.extras.execute_values(
+                                cursor,
+                                sql,
+                                statement['params_list'],
+                                template=statement.get('template'),
+                                page_size=statement.get('page_size') or 100
+                            )
+                        else:
+                            cursor.execute(sql, statement.get('params', {}))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    except Exception as ex:
+        error = str(ex)
+        data = None
+        logger.error(''.join([
+            f"{log_tag_const.DATABASE_POSTGRESQL} Executing the transaction failed\n {sql} \n",
+            f"\nThe error is: \n{error}\n",
+            f"The tracing error is: \n{traceback.format_exc()}\n"
+        ]))
+
+    if len(error) > 0:
+        return {
+            'status': 400,
+            'message': error,
+            'data': traceback.format_exc()
+        }
+
+    return {
+        'status': 200,
+        'message': '处理成功',
+        "data": data
+    }
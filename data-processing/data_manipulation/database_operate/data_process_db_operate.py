@@ -127,6 +127,10 @@ def add(
         'post_data_set_name': req_json['post_data_set_name'],
         'post_data_set_version': req_json['post_data_set_version'],
         'data_process_config_info': ujson.dumps(req_json['data_process_config_info']),
+        # 数据集状态提交后才允许调度执行
+        'schedule_status': 'created',
+        'priority': int(req_json.get('priority') or 0),
+        'request_info': ujson.dumps(req_json),
         'start_datetime': now,
         'create_datetime': now,
         'create_user': user,
@@ -150,6 +154,9 @@ def add(
           post_data_set_name,
           post_data_set_version,
           data_process_config_info,
+          schedule_status,
+          priority,
+          request_info,
           start_datetime,
           create_datetime,
           create_program,
@@ -171,6 +178,9 @@ def add(
           %(post_data_set_name)s,
           %(post_data_set_version)s,
           %(data_process_config_info)s,
+          %(schedule_status)s,
+          %(priority)s,
+          %(request_info)s,
           %(start_datetime)s,
           %(create_datetime)s,
           %(create_program)s,
@@ -220,6 +230,198 @@ def update_status_by_id(
     return res
 
 
+def submit_schedule_by_id(
+    req_json,
+    pool
+):
+    """Set the created task to waiting, so that a worker can claim it.
+
+    req_json is a dictionary object. for example:
+    {
+        "id": "01HGWBE48DT3ADE9ZKA62SW4WS"
+    }
+    """
+    now = date_time_utils.now_str()
+    program = '调度任务-等待执行'
+
+    params = {
+        'id': req_json['id'],
+        'update_datetime': now,
+        'update_program': program
+    }
+
+    sql = """
+        update public.data_process_task set
+          schedule_status = 'waiting',
+          update_datetime = %(update_datetime)s,
+          update_program = %(update_program)s
+        where
+          id = %(id)s and
+          schedule_status = 'created'
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
+
+
+def claim_waiting_task(
+    req_json,
+    pool
+):
+    """Claim the waiting task with the highest priority for a worker.
+
+    The oldest one is claimed if the priorities are the same. The task
+    locked by another worker is skipped, so one task is claimed by only
+    one worker.
+
+    req_json is a dictionary object. for example:
+    {
+        "worker": "data-processing-xxx-1"
+    }
+    """
+    now = date_time_utils.now_str()
+    program = '调度任务-开始执行'
+
+    params = {
+        'worker': req_json['worker'],
+        'schedule_heartbeat_datetime': now,
+        'update_datetime': now,
+        'update_program': program
+    }
+
+    sql = """
+        update public.data_process_task set
+          schedule_status = 'running',
+          schedule_worker = %(worker)s,
+          schedule_heartbeat_datetime = %(schedule_heartbeat_datetime)s,
+          update_datetime = %(update_datetime)s,
+          update_program = %(update_program)s
+        where
+          id = (
+            select id from public.data_process_task
+            where
+              schedule_status = 'waiting'
+            order by priority desc, create_datetime asc
+            limit 1
+            for update skip locked
+          )
+        returning
+          id,
+          request_info
+    """.strip()
+
+    res = postgresql_pool_client.execute_update_returning(pool, sql, params)
+    return res
+
+
+def update_schedule_heartbeat(
+    req_json,
+    pool
+):
+    """Update the heartbeat of the running tasks of a worker.
+
+    req_json is a dictionary object. for example:
+    {
+        "worker": "data-processing-xxx-1"
+    }
+    """
+    params = {
+        'worker': req_json['worker'],
+        'schedule_heartbeat_datetime': date_time_utils.now_str()
+    }
+
+    sql = """
+        update public.data_process_task set
+          schedule_heartbeat_datetime = %(schedule_heartbeat_datetime)s
+        where
+          schedule_status = 'running' and
+          schedule_worker = %(worker)s
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
+
+
+def requeue_interrupted_tasks(
+    req_json,
+    pool
+):
+    """Set the running tasks without a heartbeat since a time back to waiting.
+
+    The worker of these tasks is stopped or crashed.
+
+    req_json is a dictionary object. for example:
+    {
+        "heartbeat_datetime": "2024-01-01 00:00:00.000000"
+    }
+    """
+    now = date_time_utils.now_str()
+    program = '调度任务-恢复中断任务'
+
+    params = {
+        'heartbeat_datetime': req_json['heartbeat_datetime'],
+        'update_datetime': now,
+        'update_program': program
+    }
+
+    sql = """
+        update public.data_process_task set
+          schedule_status = 'waiting',
+          schedule_worker = null,
+          update_datetime = %(update_datetime)s,
+          update_program = %(update_program)s
+        where
+          schedule_status = 'running' and
+          schedule_heartbeat_datetime < %(heartbeat_datetime)s
+        returning
+          id
+    """.strip()
+
+    res = postgresql_pool_client.execute_update_returning(pool, sql, params)
+    return res
+
+
+def finish_schedule_by_id(
+    req_json,
+    pool
+):
+    """Set the task to finished after the worker runs it.
+
+    req_json is a dictionary object. for example:
+    {
+        "id": "01HGWBE48DT3ADE9ZKA62SW4WS",
+        "worker": "data-processing-xxx-1",
+        "status": "process_fail"
+    }
+    worker is None if the task is not claimed by a worker. status is
+    optional, the task status is kept if it is None.
+    """
+    now = date_time_utils.now_str()
+    program = '调度任务-执行结束'
+
+    params = {
+        'id': req_json['id'],
+        'worker': req_json['worker'],
+        'status': req_json.get('status'),
+        'update_datetime': now,
+        'update_program': program
+    }
+
+    sql = """
+        update public.data_process_task set
+          schedule_status = 'finished',
+          status = coalesce(%(status)s, status),
+          update_datetime = %(update_datetime)s,
+          update_program = %(update_program)s
+        where
+          id = %(id)s and
+          schedule_worker is not distinct from %(worker)s
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
+
+
 def info_by_id(
     req_json,
     pool
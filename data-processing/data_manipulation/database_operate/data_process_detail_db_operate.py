@@ -13,6 +13,8 @@
 # limitations under the License.
 
 
+import ulid
+from common.config import config
 from database_clients import postgresql_pool_client
 from utils import date_time_utils
 
@@ -70,11 +72,11 @@ def insert_transform_info(
           %(pre_content)s,
           %(post_content)s,
           %(create_datetime)s,
-          %(create_program)s,
           %(create_user)s,
+          %(create_program)s,
           %(update_datetime)s,
           %(update_program)s,
-          %(update_user)s 
+          %(update_user)s
         )
     """.strip()
 
@@ -82,6 +84,95 @@ def insert_transform_info(
     return res
 
 
+def batch_insert_transform_info(
+    req_json_list,
+    pool
+):
+    """Insert a list of transform info in one transaction.
+
+    req_json_list: the transform info list, every item is the same as
+                   the req_json of insert_transform_info;
+    pool: databasec connection pool;
+    """
+    if len(req_json_list) == 0:
+        return {
+            'status': 200,
+            'message': '',
+            'data': None
+        }
+
+    now = date_time_utils.now_str()
+    program = '数据处理任务详情-新增'
+
+    params_list = []
+    for req_json in req_json_list:
+        user = req_json['create_user']
+        params_list.append({
+            'id': req_json['id'],
+            'task_id': req_json['task_id'],
+            'document_id': req_json['document_id'],
+            'document_chunk_id': req_json['document_chunk_id'],
+            'file_name': req_json['file_name'],
+            'transform_type': req_json['transform_type'],
+            'pre_content': req_json['pre_content'],
+            'post_content': req_json['post_content'],
+            'create_datetime': now,
+            'create_user': user,
+            'create_program': program,
+            'update_datetime': now,
+            'update_user': user,
+            'update_program': program
+        })
+
+    sql = """
+        insert into public.data_process_task_detail (
+          id,
+          task_id,
+          document_id,
+          document_chunk_id,
+          file_name,
+          transform_type,
+          pre_content,
+          post_content,
+          create_datetime,
+          create_user,
+          create_program,
+          update_datetime,
+          update_program,
+          update_user
+        )
+        values %s
+    """.strip()
+
+    template = """
+        (
+          %(id)s,
+          %(task_id)s,
+          %(document_id)s,
+          %(document_chunk_id)s,
+          %(file_name)s,
+          %(transform_type)s,
+          %(pre_content)s,
+          %(post_content)s,
+          %(create_datetime)s,
+          %(create_user)s,
+          %(create_program)s,
+          %(update_datetime)s,
+          %(update_program)s,
+          %(update_user)s
+        )
+    """.strip()
+
+    res = postgresql_pool_client.execute_batch_insert(
+        pool,
+        sql,
+        params_list,
+        template=template,
+        page_size=config.pg_insert_batch_size
+    )
+    return res
+
+
 def insert_question_answer_info(
     req_json,
     pool
@@ -433,6 +524,168 @@ def insert_question_answer_clean_info(
     return res
 
 
+def save_question_answer_list_of_chunk(
+    req_json,
+    pool
+):
+    """Save the QA list of a chunk, the chunk status and the document
+    progress in one transaction.
+
+    req_json is a dictionary object. for example:
+    {
+        "task_id": "01HGWBE48DT3ADE9ZKA62SW4WS",
+        "document_id": "01HGWBE48DT3ADE9ZKA62SW4WS",
+        "document_chunk_id": "01HGWBE48DT3ADE9ZKA62SW4WS",
+        "file_name": "MyFile.pdf",
+        "qa_list": [["question", "answer"]],
+        "progress": 50,
+        "create_user": "admin"
+    }
+    pool: database connection pool;
+
+    The QA list is saved into both the question answer table and the
+    question answer clean table. The progress is never decreased, so the
+    chunks finished at the same time can be saved in any order.
+    """
+    now = date_time_utils.now_str()
+    user = req_json['create_user']
+    program = '数据处理任务问题和答案-新增'
+
+    params_list = []
+    for qa in req_json['qa_list']:
+        params_list.append({
+            'id': ulid.ulid(),
+            'task_id': req_json['task_id'],
+            'document_id': req_json['document_id'],
+            'document_chunk_id': req_json['document_chunk_id'],
+            'file_name': req_json['file_name'],
+            'question': qa[0],
+            'answer': qa[1],
+            'create_datetime': now,
+            'create_user': user,
+            'create_program': program,
+            'update_datetime': now,
+            'update_user': user,
+            'update_program': program
+        })
+
+    qa_sql = """
+        insert into public.data_process_task_question_answer (
+          id,
+          task_id,
+          document_id,
+          document_chunk_id,
+          file_name,
+          question,
+          answer,
+          create_datetime,
+          create_user,
+          create_program,
+          update_datetime,
+          update_user,
+          update_program
+        )
+        values %s
+    """.strip()
+
+    qa_clean_sql = """
+        insert into public.data_process_task_question_answer_clean (
+          id,
+          task_id,
+          document_id,
+          document_chunk_id,
+          file_name,
+          question,
+          answer,
+          create_datetime,
+          create_user,
+          create_program,
+          update_datetime,
+          update_user,
+          update_program
+        )
+        values %s
+    """.strip()
+
+    template = """
+        (
+          %(id)s,
+          %(task_id)s,
+          %(document_id)s,
+          %(document_chunk_id)s,
+          %(file_name)s,
+          %(question)s,
+          %(answer)s,
+          %(create_datetime)s,
+          %(create_user)s,
+          %(create_program)s,
+          %(update_datetime)s,
+          %(update_user)s,
+          %(update_program)s
+        )
+    """.strip()
+
+    chunk_sql = """
+        update public.data_process_task_document_chunk set
+          status = 'success',
+          end_time = %(end_time)s,
+          update_datetime = %(update_datetime)s,
+          update_user = %(update_user)s,
+          update_program = %(update_program)s
+        where
+          id = %(id)s
+    """.strip()
+
+    progress_sql = """
+        update public.data_process_task_document set
+          progress = greatest(
+            coalesce(nullif(progress, ''), '0')::integer,
+            %(progress)s
+          )::varchar,
+          update_datetime = %(update_datetime)s,
+          update_program = %(update_program)s
+        where
+          id = %(id)s
+    """.strip()
+
+    statements = [
+        {
+            'sql': qa_sql,
+            'params_list': params_list,
+            'template': template,
+            'page_size': config.pg_insert_batch_size
+        },
+        {
+            'sql': qa_clean_sql,
+            'params_list': params_list,
+            'template': template,
+            'page_size': config.pg_insert_batch_size
+        },
+        {
+            'sql': chunk_sql,
+            'params': {
+                'id': req_json['document_chunk_id'],
+                'end_time': now,
+                'update_datetime': now,
+                'update_user': user,
+                'update_program': 'chunk后的内容处理完成'
+            }
+        },
+        {
+            'sql': progress_sql,
+            'params': {
+                'id': req_json['document_id'],
+                'progress': int(req_json['progress']),
+                'update_datetime': now,
+                'update_program': '文件处理进度-修改'
+            }
+        }
+    ]
+
+    res = postgresql_pool_client.execute_transaction(pool, statements)
+    return res
+
+
 def query_question_answer_list(
     document_id,
     pool
@@ -466,6 +719,38 @@ def query_question_answer_list(
     res = postgresql_pool_client.execute_query(pool, sql, params)
     return res
 
+def iter_question_answer_list(
+    document_id,
+    pool
+):
+    """Yield the question and answer of each QA pair with document id.
+
+    document_id: document id;
+    pool: databasec connection pool;
+
+    The rows are read with a server-side cursor, for example
+    ('question', 'answer')
+    """
+    params = {
+      'document_id': document_id
+    }
+
+    sql = """
+      select
+        question,
+        answer
+      from public.data_process_task_question_answer_clean
+      where 
+        document_id = %(document_id)s
+    """.strip()
+
+    return postgresql_pool_client.iter_query(
+        pool,
+        sql,
+        params,
+        fetch_size=config.pg_fetch_size
+    )
+
 def list_file_name_for_privacy(
     req_json,
     pool
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import ulid
+from common.config import config
 from database_clients import postgresql_pool_client
 from utils import date_time_utils
 
@@ -77,6 +78,95 @@ def add(
     res = postgresql_pool_client.execute_update(pool, sql, params)
     return res
 
+def bulk_add(
+    req_json_list,
+    pool,
+    batch_size=None
+):
+    """Add the records in one transaction.
+
+    req_json_list: the records, each one is the same as the req_json of add;
+    pool: database connection pool;
+    batch_size: the max number of rows inserted in one statement;
+    """
+    if len(req_json_list) == 0:
+        return {
+            'status': 200,
+            'message': '',
+            'data': None
+        }
+
+    if batch_size is None:
+        batch_size = config.pg_insert_batch_size
+
+    now = date_time_utils.now_str()
+    program = '数据处理文件拆分-新增'
+
+    params_list = []
+    for req_json in req_json_list:
+        user = req_json['creator']
+        params_list.append({
+            'id': req_json.get('id'),
+            'document_id': req_json.get('document_id'),
+            'status': req_json.get('status'),
+            'task_id': req_json.get('task_id'),
+            'content': req_json.get('content'),
+            'meta_info': req_json.get('meta_info'),
+            'page_number': req_json.get('page_number'),
+            'create_datetime': now,
+            'create_user': user,
+            'create_program': program,
+            'update_datetime': now,
+            'update_user': user,
+            'update_program': program
+        })
+
+    sql = """
+        insert into public.data_process_task_document_chunk (
+          id,
+          document_id,
+          status,
+          task_id,
+          content,
+          meta_info,
+          page_number,
+          create_datetime,
+          create_user,
+          create_program,
+          update_datetime,
+          update_user,
+          update_program
+        )
+        values %s
+    """.strip()
+
+    template = """
+        (
+          %(id)s,
+          %(document_id)s,
+          %(status)s,
+          %(task_id)s,
+          %(content)s,
+          %(meta_info)s,
+          %(page_number)s,
+          %(create_datetime)s,
+          %(create_user)s,
+          %(create_program)s,
+          %(update_datetime)s,
+          %(update_user)s,
+          %(update_program)s
+        )
+    """.strip()
+
+    res = postgresql_pool_client.execute_batch_insert(
+        pool,
+        sql,
+        params_list,
+        template=template,
+        page_size=batch_size
+    )
+    return res
+
 def update_document_chunk_status_and_start_time(
     req_json,
     pool
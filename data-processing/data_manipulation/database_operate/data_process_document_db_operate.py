@@ -140,6 +140,33 @@ def update_document_status_and_end_time(
     res = postgresql_pool_client.execute_update(pool, sql, params)
     return res
 
+def update_document_chunk_size(
+    req_json,
+    pool
+):
+    """Update the chunk size with id"""
+    now = date_time_utils.now_str()
+    program = '文件拆分数量-修改'
+
+    params = {
+        'id': req_json['id'],
+        'chunk_size': req_json['chunk_size'],
+        'update_datetime': now,
+        'update_program': program
+    }
+
+    sql = """
+        update public.data_process_task_document set
+          chunk_size = %(chunk_size)s,
+          update_datetime = %(update_datetime)s,
+          update_program = %(update_program)s
+        where
+          id = %(id)s
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
+
 def update_document_progress(
     req_json,
     pool
@@ -168,6 +195,37 @@ def update_document_progress(
     res = postgresql_pool_client.execute_update(pool, sql, params)
     return res
 
+def update_qa_cache_count(
+    req_json,
+    pool
+):
+    """Update the QA cache hit count and miss count with id"""
+    now = date_time_utils.now_str()
+    program = '文件QA缓存统计-修改'
+
+    params = {
+        'id': req_json['id'],
+        'qa_cache_hit_count': req_json['qa_cache_hit_count'],
+        'qa_cache_miss_count': req_json['qa_cache_miss_count'],
+        'update_datetime': now,
+        'update_user': req_json['update_user'],
+        'update_program': program
+    }
+
+    sql = """
+        update public.data_process_task_document set
+          qa_cache_hit_count = %(qa_cache_hit_count)s,
+          qa_cache_miss_count = %(qa_cache_miss_count)s,
+          update_datetime = %(update_datetime)s,
+          update_user = %(update_user)s,
+          update_program = %(update_program)s
+        where
+          id = %(id)s
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
+
 def list_file_by_task_id(
     req_json,
     pool
@@ -184,7 +242,9 @@ def list_file_by_task_id(
           status,
           start_time,
           end_time,
-          progress
+          progress,
+          qa_cache_hit_count,
+          qa_cache_miss_count
         from
           public.data_process_task_document
         where
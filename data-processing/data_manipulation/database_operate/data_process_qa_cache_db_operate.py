@@ -0,0 +1,166 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ujson
+from database_clients import postgresql_pool_client
+from utils import date_time_utils
+
+def info_by_id(
+    req_json,
+    pool
+):
+    """Get the cached QA list with id.
+
+    req_json is a dictionary object. for example:
+    {
+        "id": "the sha256 of the chunk content and the llm config"
+    }
+    pool: database connection pool;
+    """
+    params = {
+        'id': req_json['id']
+    }
+
+    sql = """
+        select
+          id,
+          model,
+          question_answer
+        from
+          public.data_process_task_qa_cache
+        where
+          id = %(id)s
+    """.strip()
+
+    res = postgresql_pool_client.execute_query(pool, sql, params)
+    return res
+
+def add(
+    req_json,
+    pool
+):
+    """Add a QA list to the cache, keep the existing one if the id exists."""
+    now = date_time_utils.now_str()
+    user = req_json['creator']
+    program = 'QA缓存-新增'
+
+    params = {
+        'id': req_json['id'],
+        'model': req_json.get('model'),
+        'question_answer': ujson.dumps(req_json['question_answer'], ensure_ascii=False),
+        'hit_count': 0,
+        'last_hit_datetime': now,
+        'create_datetime': now,
+        'create_user': user,
+        'create_program': program,
+        'update_datetime': now,
+        'update_user': user,
+        'update_program': program
+    }
+
+    sql = """
+        insert into public.data_process_task_qa_cache (
+          id,
+          model,
+          question_answer,
+          hit_count,
+          last_hit_datetime,
+          create_datetime,
+          create_user,
+          create_program,
+          update_datetime,
+          update_user,
+          update_program
+        )
+        values (
+          %(id)s,
+          %(model)s,
+          %(question_answer)s,
+          %(hit_count)s,
+          %(last_hit_datetime)s,
+          %(create_datetime)s,
+          %(create_user)s,
+          %(create_program)s,
+          %(update_datetime)s,
+          %(update_user)s,
+          %(update_program)s
+        )
+        on conflict (id) do nothing
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
+
+def update_hit_info(
+    req_json,
+    pool
+):
+    """Increase the hit count and update the last hit time with id"""
+    now = date_time_utils.now_str()
+    program = 'QA缓存命中-修改'
+
+    params = {
+        'id': req_json['id'],
+        'last_hit_datetime': now,
+        'update_datetime': now,
+        'update_user': req_json['update_user'],
+        'update_program': program
+    }
+
+    sql = """
+        update public.data_process_task_qa_cache set
+          hit_count = hit_count + 1,
+          last_hit_datetime = %(last_hit_datetime)s,
+          update_datetime = %(update_datetime)s,
+          update_user = %(update_user)s,
+          update_program = %(update_program)s
+        where
+          id = %(id)s
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
+
+def delete_least_recently_hit(
+    req_json,
+    pool
+):
+    """Delete the least recently hit records beyond the max number of records.
+
+    req_json is a dictionary object. for example:
+    {
+        "max_size": 100000
+    }
+    pool: database connection pool;
+    """
+    params = {
+        'max_size': int(req_json['max_size'])
+    }
+
+    sql = """
+        delete from public.data_process_task_qa_cache
+        where
+          id in (
+            select
+              id
+            from
+              public.data_process_task_qa_cache
+            order by
+              last_hit_datetime desc
+            offset %(max_size)s
+          )
+    """.strip()
+
+    res = postgresql_pool_client.execute_update(pool, sql, params)
+    return res
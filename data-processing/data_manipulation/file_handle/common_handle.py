@@ -13,27 +13,40 @@
 # limitations under the License.
 
 
+import hashlib
+import json
+import itertools
 import logging
 import os
+import threading
 import traceback
 import base64
+from concurrent.futures import (FIRST_COMPLETED, ThreadPoolExecutor,
+                                as_completed, wait)
 
 import pandas as pd
+import ujson
 import ulid
 from common import log_tag_const
 from common.config import config
 from database_operate import (data_process_detail_db_operate,
                               data_process_document_db_operate,
-                              data_process_document_chunk_db_operate)
+                              data_process_document_chunk_db_operate,
+                              data_process_qa_cache_db_operate)
 from langchain.text_splitter import SpacyTextSplitter
-from llm_api_service.qa_provider_open_ai import QAProviderOpenAI
+from llm_api_service.qa_provider_open_ai_async import AsyncQAProviderOpenAI
 from llm_api_service.qa_provider_zhi_pu_ai_online import QAProviderZhiPuAIOnline
-from transform.text import clean_transform, privacy_transform
+from llm_prompt_template import llm_prompt
+from transform.text import transform_plan
 from utils import csv_utils, file_utils, docx_utils, date_time_utils
 from kube import model_cr
 
 logger = logging.getLogger(__name__)
 
+# the semaphores which limit the QA requests sent to each model
+_llm_semaphores = {}
+_llm_semaphores_lock = threading.Lock()
+
 
 def text_manipulate(
     all_document_for_process,
@@ -44,7 +57,8 @@ def text_manipulate(
 ):
     """Manipulate the text content.
     
-    all_document_for_process: document info
+    all_document_for_process: the chunks of the document, a list or a
+        generator which yields the chunks while the file is being read;
     file_name: file name;
     support_type: support type;
     conn_pool: database connection pool;
@@ -55,70 +69,113 @@ def text_manipulate(
 
     try:
         support_type_map = _convert_support_type_to_map(support_type)
-        document_chunk_size = len(all_document_for_process)
+        # the number of chunks is known after all the chunks are read
+        # if they are yielded by a generator
+        document_chunk_size = None
+        if isinstance(all_document_for_process, list):
+            document_chunk_size = len(all_document_for_process)
+
+        all_document_for_process = iter(all_document_for_process)
+        first_document = next(all_document_for_process, None)
+        if first_document is None:
+            raise ValueError('文件中没有可处理的内容')
+        all_document_for_process = itertools.chain([first_document], all_document_for_process)
 
         # 更新文件状态为开始
-        task_id = all_document_for_process[0].get('task_id')
-        document_id = all_document_for_process[0].get('document_id')
+        task_id = first_document.get('task_id')
+        document_id = first_document.get('document_id')
         _update_document_status_and_start_time(
-            id=all_document_for_process[0].get('document_id'),
+            id=document_id,
             chunk_size=document_chunk_size,
             conn_pool=conn_pool
         )
 
-        text_process_success_num = 0
-        for document in all_document_for_process:
-            document_chunk_id = document.get('id')
-            # Clean the data such as removing invisible characters.
-            clean_result = _data_clean(
-                support_type_map=support_type_map,
-                file_name=file_name,
-                data=document.get('content'),
-                conn_pool=conn_pool,
-                task_id=task_id,
-                document_id=document_id,
-                document_chunk_id=document_chunk_id,
-                create_user=create_user
-            )
+        # 文件读取完成前，已读取的chunk数量
+        read_chunk_count = 0
+
+        def iter_qa_chunks():
+            """Clean the chunks while the file is being read and yield them."""
+            nonlocal document_chunk_size, read_chunk_count
+            # 清洗的详情数据先缓存，再批量存入数据库
+            transform_detail_list = []
+            try:
+                for document in all_document_for_process:
+                    document_chunk_id = document.get('id')
+                    content = document.get('content')
+                    # Clean the data such as removing invisible characters and
+                    # remove the privacy info such as removing email.
+                    clean_result = _data_clean(
+                        support_type_map=support_type_map,
+                        file_name=file_name,
+                        data=content,
+                        task_id=task_id,
+                        document_id=document_id,
+                        document_chunk_id=document_chunk_id,
+                        create_user=create_user,
+                        transform_detail_list=transform_detail_list
+                    )
 
-            if clean_result['status'] == 200:
-                content = clean_result['data']
-
-            # Remove the privacy info such as removing email.
-            clean_result = _remove_privacy_info(
-                support_type_map=support_type_map,
-                file_name=file_name,
-                data=document.get('content'),
-                conn_pool=conn_pool,
-                task_id=task_id,
-                document_id=document_id,
-                document_chunk_id=document_chunk_id,
-                create_user=create_user
-            )
+                    if clean_result['status'] == 200:
+                        content = clean_result['data']
+
+                    if len(transform_detail_list) >= config.pg_insert_batch_size:
+                        _insert_transform_detail_list(
+                            transform_detail_list,
+                            conn_pool=conn_pool
+                        )
 
-            if clean_result['status'] == 200:
-                content = clean_result['data']
+                    read_chunk_count += 1
+                    yield {
+                        'document_chunk_id': document_chunk_id,
+                        'content': content
+                    }
+            finally:
+                # QA失败后不再读取文件，已清洗的详情数据也要存入数据库
+                _insert_transform_detail_list(
+                    transform_detail_list,
+                    conn_pool=conn_pool
+                )
+
+            if document_chunk_size is None:
+                document_chunk_size = read_chunk_count
+                _update_document_chunk_size(
+                    id=document_id,
+                    chunk_size=document_chunk_size,
+                    conn_pool=conn_pool
+                )
 
+        def get_chunk_count():
+            """Return the number of chunks, and whether the number is final."""
+            if document_chunk_size is not None:
+                return (document_chunk_size, True)
+
+            return (read_chunk_count, False)
+
+        qa_chunks = iter_qa_chunks()
+        try:
             if support_type_map.get('qa_split'):
                 logger.debug(f"{log_tag_const.QA_SPLIT} Start to split QA.")
-                text_process_success_num += 1
 
-                qa_response = _qa_split(
+                # 边读取文件边生成QA，不会缓存所有的chunk
+                qa_response = _qa_split_with_concurrency(
                     support_type_map=support_type_map,
                     task_id=task_id,
-                    document_chunk_size=document_chunk_size,
-                    document_chunk_id=document_chunk_id,
+                    get_chunk_count=get_chunk_count,
+                    qa_chunks=qa_chunks,
                     file_name=file_name,
-                    content=content,
                     document_id=document_id,
-                    text_process_success_num=text_process_success_num,
                     conn_pool=conn_pool,
                     create_user=create_user
                 )
 
                 if qa_response.get('status') != 200:
                     return qa_response
-        
+            else:
+                for _ in qa_chunks:
+                    pass
+        finally:
+            qa_chunks.close()
+
         # 文件处理成功，更新data_process_task_document中的文件状态
         _updata_document_status_and_end_time(
             id=document_id,
@@ -126,18 +183,19 @@ def text_manipulate(
             conn_pool=conn_pool
         )
 
-        # 通过documentId查询生成的所有QA数据
-        qa_list = data_process_detail_db_operate.query_question_answer_list(
+        # 通过documentId逐行读取生成的所有QA数据，直接写入csv文件
+        qa_rows = data_process_detail_db_operate.iter_question_answer_list(
             document_id=document_id,
             pool=conn_pool
         )
+        qa_count = 0
 
-        qa_data_dict = [['q', 'a']]
-        for item in qa_list.get('data'):
-            qa_data_dict.append([
-                item.get('question'),
-                item.get('answer')
-            ])
+        def iter_qa_data():
+            nonlocal qa_count
+            yield ['q', 'a']
+            for row in qa_rows:
+                qa_count += 1
+                yield row
 
         # Save the csv file.        
         file_name_without_extension = file_utils.get_file_name_without_extension(file_name)
@@ -145,7 +203,8 @@ def text_manipulate(
         csv_utils.save_csv(
             file_name=file_name_csv,
             phase_value='final',
-            data=qa_data_dict
+            data=iter_qa_data(),
+            task_id=task_id
         )
         
         logger.debug(f"{log_tag_const.COMMON_HANDLE} Finish manipulating the text")
@@ -154,7 +213,7 @@ def text_manipulate(
             'message': '',
             'data': {
                 'object_name': file_name_csv,
-                'object_count': len(qa_list.get('data'))
+                'object_count': qa_count
             }
         }
     except Exception as ex:
@@ -169,6 +228,48 @@ def text_manipulate(
             'data': traceback.format_exc()
         }
 
+
+def save_documents(
+    documents,
+    document_id,
+    task_id,
+    create_user,
+    conn_pool
+):
+    """Save the chunks to database in batches and yield them one by one.
+    
+    documents: the chunks of the file, the page number is metadata['page'] + 1
+               if there is a page, such as in a pdf file;
+    document_id: document id;
+    task_id: data process task id;
+    create_user: creator;
+    conn_pool: database connection pool;
+    """
+    chunks = []
+    for document in documents:
+        chunck_id = ulid.ulid()
+        page = document['metadata'].get('page')
+        content = document['page_content'].replace("\n", "")
+        meta_info = ujson.dumps(document['metadata'], ensure_ascii=False)
+        chunk_insert_item = {
+            'id': chunck_id,
+            'document_id': document_id,
+            'task_id': task_id,
+            'status': 'not_start',
+            'content': content,
+            'meta_info': meta_info,
+            'page_number': '' if page is None else page + 1,
+            'creator': create_user
+        }
+
+        chunks.append(chunk_insert_item)
+
+        if len(chunks) >= config.chunk_insert_batch_size:
+            yield from _add_chunks(chunks, conn_pool)
+            chunks = []
+
+    yield from _add_chunks(chunks, conn_pool)
+
 def _data_clean(
     support_type_map,
     data,
@@ -177,9 +278,9 @@ def _data_clean(
     document_chunk_id,
     file_name,
     create_user,
-    conn_pool
+    transform_detail_list
 ):
-    """Clean the data.
+    """Clean the data and remove the privacy info.
     
     support_type_map: example
         {
@@ -200,379 +301,293 @@ def _data_clean(
         }
     data: data;
     file_name: file name;
-    conn_pool: database connection pool;
     task_id: data process task id;
-    """
-    # remove invisible characters
-    if support_type_map.get('remove_invisible_characters'):
-        result = clean_transform.remove_invisible_characters(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_invisible_characters',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
-
-    
-    # process for space standardization
-    if support_type_map.get('space_standardization'):
-        result = clean_transform.space_standardization(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'space_standardization',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
+    transform_detail_list: the transform detail rows are appended to it
+                           and inserted into the database in batches;
 
+    All the enabled transforms are executed by one transform plan, the
+    regex based transforms such as removing emojis and removing email
+    scan the text together.
+    """
+    transform_types = tuple(
+        transform_type
+        for transform_type in transform_plan.TRANSFORM_ORDER
+        if support_type_map.get(transform_type)
+    )
+    if len(transform_types) == 0:
+        return {
+            'status': 200,
+            'message': '',
+            'data': data
+        }
 
-    # process for remove garbled text
-    if support_type_map.get('remove_garbled_text'):
-        result = clean_transform.remove_garbled_text(
-            text=data
-        )
-        if result['status'] == 200:
-            if result['data']['found'] > 0:
-                task_detail_item = {
-                    'id': ulid.ulid(),
-                    'task_id': task_id,
-                    'document_id': document_id,
-                    'document_chunk_id': document_chunk_id,
-                    'file_name': file_name,
-                    'transform_type': 'remove_garbled_text',
-                    'pre_content': data,
-                    'post_content': result['data']['text'],
-                        'create_user': create_user
-                }
-                data_process_detail_db_operate.insert_transform_info(
-                    task_detail_item,
-                    pool=conn_pool
-                )
-            data = result['data']['text']
+    result = transform_plan.execute_transform_plan(
+        transform_plan.get_transform_plan(transform_types),
+        text=data
+    )
+    if result['status'] != 200:
+        return result
+
+    for item in result['data']['clean_data']:
+        task_detail_item = {
+            'id': ulid.ulid(),
+            'task_id': task_id,
+            'document_id': document_id,
+            'document_chunk_id': document_chunk_id,
+            'file_name': file_name,
+            'transform_type': item['transform_type'],
+            'pre_content': item['pre_content'],
+            'post_content': item['post_content'],
+            'create_user': create_user
+        }
+        transform_detail_list.append(task_detail_item)
 
+    return {
+        'status': 200,
+        'message': '',
+        'data': result['data']['text']
+    }
 
-    # process for Traditional Chinese to Simplified Chinese
-    if support_type_map.get('traditional_to_simplified'):
-        result = clean_transform.traditional_to_simplified(
-            text=data
-        )
-        if result['status'] == 200:
-            if result['data']['found'] > 0:
-                task_detail_item = {
-                    'id': ulid.ulid(),
-                    'task_id': task_id,
-                    'document_id': document_id,
-                    'document_chunk_id': document_chunk_id,
-                    'file_name': file_name,
-                    'transform_type': 'traditional_to_simplified',
-                    'pre_content': data,
-                    'post_content': result['data']['text'],
-                        'create_user': create_user
-                }
-                data_process_detail_db_operate.insert_transform_info(
-                    task_detail_item,
-                    pool=conn_pool
-                )
-            data = result['data']['text']
 
+def _insert_transform_detail_list(
+    transform_detail_list,
+    conn_pool
+):
+    """Insert the buffered transform detail rows and empty the buffer.
 
-    # process for clean html code in text samples
-    if support_type_map.get('remove_html_tag'):
-        result = clean_transform.remove_html_tag(
-            text=data
-        )
-        if result['status'] == 200:
-            if result['data']['found'] > 0:
-                task_detail_item = {
-                    'id': ulid.ulid(),
-                    'task_id': task_id,
-                    'document_id': document_id,
-                    'document_chunk_id': document_chunk_id,
-                    'file_name': file_name,
-                    'transform_type': 'remove_html_tag',
-                    'pre_content': data,
-                    'post_content': result['data']['text'],
-                    'create_user': create_user
-                }
-                data_process_detail_db_operate.insert_transform_info(
-                    task_detail_item,
-                    pool=conn_pool
-                )
-            data = result['data']['text']
-    
+    transform_detail_list: the transform detail rows;
+    conn_pool: database connection pool;
+    """
+    if len(transform_detail_list) == 0:
+        return
 
-    # process for remove emojis
-    if support_type_map.get('remove_emojis'):
-        result = clean_transform.remove_emojis(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_emojis',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
+    res = data_process_detail_db_operate.batch_insert_transform_info(
+        transform_detail_list,
+        pool=conn_pool
+    )
+    if res['status'] != 200:
+        logger.error(''.join([
+            f"{log_tag_const.COMMON_HANDLE} Insert the transform detail failed.\n",
+            f"The number of rows: {len(transform_detail_list)}\n",
+            f"The error is: {res['message']}"
+        ]))
 
-    return {
-        'status': 200,
-        'message': '',
-        'data': data
-    }
+    transform_detail_list.clear()
 
 
-def _remove_privacy_info(
+def _qa_split_with_concurrency(
     support_type_map,
-    data,
     task_id,
-    document_id,
-    document_chunk_id,
+    get_chunk_count,
+    qa_chunks,
     file_name,
-    create_user,
-    conn_pool
+    document_id,
+    conn_pool,
+    create_user
 ):
-    """"Remove the privacy info such as removing email.
-    
-    support_type_map: example
+    """Generate the QA list for all the chunks, several chunks at the same time.
+
+    support_type_map: support type map;
+    task_id: data process task id;
+    get_chunk_count: the function which returns the number of chunks read
+                     and whether all the chunks are read;
+    qa_chunks: the cleaned chunks, a list or a generator which yields the
+        chunks while the file is being read, each one is like
         {
-            "qa_split": {
-                "type": "qa_split",
-                "name": "xx",
-                "namespace": "xx"
-            }, 
-            "remove_invisible_characters": {
-                "type": "remove_invisible_characters"
-            }, 
-            "space_standardization": {
-                "type": "space_standardization"
-            },
-            "remove_email": {
-                "type": "remove_email"
-            }
+            "document_chunk_id": "01HGWBE48DT3ADE9ZKA62SW4WS",
+            "content": "xxx"
         }
-    data: data;
     file_name: file name;
+    document_id: document id;
     conn_pool: database connection pool;
-    task_id: data process task id;
-    """
-    # remove email
-    if support_type_map.get('remove_email'):
-        result = privacy_transform.remove_email(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_email',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
-        
+    create_user: creator;
 
-    # remove ip addresses
-    if support_type_map.get('remove_ip_address'):
-        result = privacy_transform.remove_ip_address(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_ip_address',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
+    The number of QA requests sent to one model at the same time is limited
+    by config.llm_qa_concurrency, across all the files and tasks. At most
+    config.qa_chunk_window_size chunks are read but not finished, the next
+    chunk is read after one of them is finished. Once a chunk fails, no
+    more chunks are read, the chunks which are not started yet are skipped
+    and the first failure is returned. If reading the chunks raises an
+    error, the chunks which are not started yet are skipped and the error
+    is raised. The QA cache hit and miss counts
+    are saved for the document.
+    """
+    llm_config = support_type_map.get('qa_split').get('llm_config')
+    concurrency = config.llm_qa_concurrency
+    window_size = max(concurrency, config.qa_chunk_window_size)
+    llm_semaphore = _get_llm_semaphore(llm_config)
+
+    stop_event = threading.Event()
+
+    # 更新文件处理进度
+    # 进度随chunk的QA数据一起保存，chunk完成的先后顺序不影响进度
+    progress_lock = threading.Lock()
+    finished_num = 0
+
+    def get_progress():
+        nonlocal finished_num
+        with progress_lock:
+            finished_num += 1
+            chunk_count, is_final = get_chunk_count()
+            if not is_final:
+                # 文件还未读完，chunk总数未知，按已读取的数量加上窗口大小估算
+                chunk_count += window_size
+            return min(100, int(finished_num / chunk_count * 100))
+
+    def qa_split_unless_stopped(qa_chunk):
+        with llm_semaphore:
+            if stop_event.is_set():
+                return None
+
+            try:
+                qa_response = _qa_split(
+                    support_type_map=support_type_map,
+                    task_id=task_id,
+                    document_chunk_id=qa_chunk.get('document_chunk_id'),
+                    file_name=file_name,
+                    content=qa_chunk.get('content'),
+                    document_id=document_id,
+                    conn_pool=conn_pool,
+                    create_user=create_user,
+                    get_progress=get_progress
+                )
+            except Exception as ex:
+                logger.error(''.join([
+                    f"{log_tag_const.QA_SPLIT} There is an error when split QA.\n",
+                    f"The document chunk id: {qa_chunk.get('document_chunk_id')}\n",
+                    f"The error is: \n{traceback.format_exc()}"
+                ]))
+                qa_response = {
+                    'status': 400,
+                    'message': str(ex),
+                    'data': traceback.format_exc()
+                }
 
-    # remove number
-    if support_type_map.get('remove_number'):
-        # remove phone
-        result = privacy_transform.remove_phone(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_number',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
-        
-        # remove id card
-        result = privacy_transform.remove_id_card(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_number',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
+        if qa_response.get('status') != 200:
+            # 其余未开始处理的chunk不再处理
+            stop_event.set()
 
-        # remove weixin
-        result = privacy_transform.remove_weixin(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_number',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
+        return qa_response
 
-        # remove bank card
-        result = privacy_transform.remove_bank_card(
-            text=data
-        )
-        if result['status'] == 200:
-            clean_data = result['data']['clean_data']
-            if len(clean_data) > 0:
-                for item in clean_data:
-                    task_detail_item = {
-                        'id': ulid.ulid(),
-                        'task_id': task_id,
-                        'document_id': document_id,
-                        'document_chunk_id': document_chunk_id,
-                        'file_name': file_name,
-                        'transform_type': 'remove_number',
-                        'pre_content': item['pre_content'],
-                        'post_content': item['post_content'],
-                        'create_user': create_user
-                    }
-                    data_process_detail_db_operate.insert_transform_info(
-                        task_detail_item,
-                        pool=conn_pool
-                    )
-            data = result['data']['text']
-   
-    return {
+    result = {
         'status': 200,
         'message': '',
-        'data': data
+        'data': ''
     }
+    qa_cache_hit_count = 0
+    qa_cache_miss_count = 0
+
+    def handle_result(future, futures):
+        nonlocal result, qa_cache_hit_count, qa_cache_miss_count
+        if future.cancelled():
+            return
+
+        qa_response = future.result()
+        if qa_response is None:
+            # the chunk is skipped because another chunk has failed.
+            return
+
+        if qa_response.get('status') != 200:
+            if result.get('status') == 200:
+                result = qa_response
+
+                for not_done_future in futures:
+                    not_done_future.cancel()
+            return
+
+        if qa_response.get('qa_cache_hit') is True:
+            qa_cache_hit_count += 1
+        elif qa_response.get('qa_cache_hit') is False:
+            qa_cache_miss_count += 1
+
+    with ThreadPoolExecutor(
+        max_workers=concurrency,
+        thread_name_prefix=f"qa split document {document_id}"
+    ) as executor:
+        futures = set()
+        try:
+            for qa_chunk in qa_chunks:
+                if stop_event.is_set():
+                    break
+
+                if len(futures) >= window_size:
+                    # 窗口已满，等待一个chunk处理完成后再读取文件
+                    done_futures, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done_futures:
+                        handle_result(future, futures)
+                    if stop_event.is_set():
+                        break
+
+                futures.add(executor.submit(qa_split_unless_stopped, qa_chunk))
+        except BaseException:
+            # 读取文件失败，文件处理失败，已提交但未开始的chunk不再处理
+            stop_event.set()
+            for future in futures:
+                future.cancel()
+            raise
+
+        for future in as_completed(futures):
+            handle_result(future, futures)
+
+    if result.get('status') == 200:
+        # 进度在读完文件前是估算的，全部chunk完成后更新为100
+        _update_document_progress(
+            id=document_id,
+            progress=100,
+            update_user=create_user,
+            conn_pool=conn_pool
+        )
+
+    if config.llm_qa_cache_enabled:
+        _update_document_qa_cache_count(
+            id=document_id,
+            qa_cache_hit_count=qa_cache_hit_count,
+            qa_cache_miss_count=qa_cache_miss_count,
+            update_user=create_user,
+            conn_pool=conn_pool
+        )
+
+        if qa_cache_miss_count > 0:
+            _evict_qa_cache(conn_pool=conn_pool)
+
+    return result
+
+
+def _get_llm_semaphore(llm_config):
+    """Get the semaphore which limits the QA requests sent to the model.
+
+    llm_config: llms config info;
+    """
+    key = (
+        llm_config.get('namespace'),
+        llm_config.get('name'),
+        llm_config.get('model')
+    )
+    with _llm_semaphores_lock:
+        llm_semaphore = _llm_semaphores.get(key)
+        if llm_semaphore is None:
+            llm_semaphore = threading.BoundedSemaphore(config.llm_qa_concurrency)
+            _llm_semaphores[key] = llm_semaphore
+
+    return llm_semaphore
 
 
 def _qa_split(
     support_type_map,
     task_id,
-    document_chunk_size,
     document_chunk_id,
     file_name,
     content,
     document_id,
-    text_process_success_num,
     conn_pool,
-    create_user
+    create_user,
+    get_progress
 ):
+    """Generate the QA list for a chunk and save it.
+
+    get_progress: the function which returns the document progress after
+                  this chunk is finished;
+    """
     qa_list_dict = support_type_map.get('qa_split')
     llm_config = qa_list_dict.get('llm_config')
 
@@ -583,72 +598,190 @@ def _qa_split(
         conn_pool=conn_pool
     )
 
-    qa_response = _generate_qa_list(
-        content=content,
-        llm_config=llm_config
-    )
-
-    if qa_response.get('status') != 200:
-        # 处理失败
-        # 更新data_process_task_document_chunk中的状态
-        _updata_document_chunk_status_and_end_time(
-            id=document_chunk_id,
+    qa_cache_key = None
+    qa_response = None
+    if config.llm_qa_cache_enabled:
+        qa_cache_key = _get_qa_cache_key(
+            content=content,
+            llm_config=llm_config
+        )
+        qa_response = _get_qa_list_from_cache(
+            qa_cache_key=qa_cache_key,
             update_user=create_user,
-            status='fail',
             conn_pool=conn_pool
         )
 
-        # 更新data_process_task_document中的文件状态
-        _updata_document_status_and_end_time(
-            id=document_id,
-            status='fail',
-            conn_pool=conn_pool
+    if qa_response is None:
+        qa_response = _generate_qa_list(
+            content=content,
+            llm_config=llm_config
         )
-    else:
-        # 将QA数据存入表中
-        qa_data = qa_response.get('data')
-        for i in range(len(qa_data)):
-            qa_insert_item = {
-                'id': ulid.ulid(),
+
+        if qa_cache_key is not None:
+            qa_response['qa_cache_hit'] = False
+            if qa_response.get('status') == 200:
+                _add_qa_list_to_cache(
+                    qa_cache_key=qa_cache_key,
+                    model=llm_config.get('model'),
+                    qa_list=qa_response.get('data'),
+                    create_user=create_user,
+                    conn_pool=conn_pool
+                )
+
+    if qa_response.get('status') == 200:
+        # 将QA数据、chunk状态和文件处理进度在一个事务中存入表中
+        save_res = data_process_detail_db_operate.save_question_answer_list_of_chunk(
+            {
                 'task_id': task_id,
                 'document_id': document_id,
                 'document_chunk_id': document_chunk_id,
                 'file_name': file_name,
-                'question': qa_data[i][0],
-                'answer': qa_data[i][1],
+                'qa_list': qa_response.get('data'),
+                'progress': get_progress(),
                 'create_user': create_user
-            }
-            
-            data_process_detail_db_operate.insert_question_answer_info(
-                qa_insert_item,
-                pool=conn_pool
-            )
-
-            data_process_detail_db_operate.insert_question_answer_clean_info(
-                qa_insert_item,
-                pool=conn_pool
-            )
+            },
+            pool=conn_pool
+        )
+        if save_res.get('status') != 200:
+            qa_response = save_res
 
+    if qa_response.get('status') != 200:
+        # 处理失败
         # 更新data_process_task_document_chunk中的状态
         _updata_document_chunk_status_and_end_time(
             id=document_chunk_id,
             update_user=create_user,
-            status='success',
+            status='fail',
             conn_pool=conn_pool
         )
 
-        # 更新文件处理进度
-        progress = int(text_process_success_num / document_chunk_size * 100)
-        _updata_document_progress(
+        # 更新data_process_task_document中的文件状态
+        _updata_document_status_and_end_time(
             id=document_id,
-            progress=progress,
-            update_user=create_user,
+            status='fail',
             conn_pool=conn_pool
         )
 
     return qa_response
 
 
+def _get_qa_cache_key(
+    content,
+    llm_config
+):
+    """Get the QA cache key of the chunk content and the llm config.
+
+    content: the text used to generate QA;
+    llm_config: llms config info;
+    """
+    prompt_template = llm_config.get('prompt_template')
+    if prompt_template is None:
+        prompt_template = llm_prompt.get_default_prompt_template()
+
+    key_info = json.dumps(
+        [
+            content,
+            llm_config.get('model'),
+            prompt_template,
+            llm_config.get('temperature'),
+            llm_config.get('top_p'),
+            llm_config.get('max_tokens')
+        ],
+        ensure_ascii=False
+    )
+
+    return hashlib.sha256(key_info.encode('utf-8')).hexdigest()
+
+
+def _get_qa_list_from_cache(
+    qa_cache_key,
+    update_user,
+    conn_pool
+):
+    """Get the cached QA list, None if it is not found.
+
+    qa_cache_key: QA cache key;
+    update_user: update user;
+    conn_pool: database connection pool;
+    """
+    cache_res = data_process_qa_cache_db_operate.info_by_id(
+        {'id': qa_cache_key},
+        pool=conn_pool
+    )
+    if cache_res.get('status') != 200 or len(cache_res.get('data')) == 0:
+        return None
+
+    qa_list = cache_res.get('data')[0].get('question_answer')
+    if isinstance(qa_list, str):
+        qa_list = json.loads(qa_list)
+    if not qa_list:
+        return None
+
+    data_process_qa_cache_db_operate.update_hit_info(
+        {
+            'id': qa_cache_key,
+            'update_user': update_user
+        },
+        pool=conn_pool
+    )
+
+    logger.debug(f"{log_tag_const.QA_SPLIT} Reuse the cached QA list {qa_cache_key}.")
+
+    return {
+        'status': 200,
+        'message': '',
+        'data': qa_list,
+        'qa_cache_hit': True
+    }
+
+
+def _add_qa_list_to_cache(
+    qa_cache_key,
+    model,
+    qa_list,
+    create_user,
+    conn_pool
+):
+    """Add the QA list to the cache.
+
+    qa_cache_key: QA cache key;
+    model: model name;
+    qa_list: QA list, such as [['question', 'answer']];
+    create_user: creator;
+    conn_pool: database connection pool;
+    """
+    if not qa_list:
+        return
+
+    res = data_process_qa_cache_db_operate.add(
+        {
+            'id': qa_cache_key,
+            'model': model,
+            'question_answer': [[item[0], item[1]] for item in qa_list],
+            'creator': create_user
+        },
+        pool=conn_pool
+    )
+    if res.get('status') != 200:
+        logger.error(''.join([
+            f"{log_tag_const.QA_SPLIT} Failed to add the QA list to the cache.\n",
+            f"The error is: {res.get('message')}"
+        ]))
+
+
+def _evict_qa_cache(conn_pool):
+    """Delete the least recently hit QA lists beyond config.llm_qa_cache_max_size."""
+    res = data_process_qa_cache_db_operate.delete_least_recently_hit(
+        {'max_size': config.llm_qa_cache_max_size},
+        pool=conn_pool
+    )
+    if res.get('status') != 200:
+        logger.error(''.join([
+            f"{log_tag_const.QA_SPLIT} Failed to evict the QA cache.\n",
+            f"The error is: {res.get('message')}"
+        ]))
+
+
 def _generate_qa_list(
     content,
     llm_config
@@ -666,20 +799,21 @@ def _generate_qa_list(
     top_p=llm_config.get('top_p')
     max_tokens=llm_config.get('max_tokens')
 
-    # llms cr 中模型相关信息
-    llm_spec_info = model_cr.get_spec_for_llms_k8s_cr(
+    # llms cr 中模型相关信息, 在所有chunk和任务之间共享
+    llm_endpoint_config = model_cr.get_llm_endpoint_config(
         name=name,
-        namespace=namespace
+        namespace=namespace,
+        config_map_name=config.k8s_default_config,
+        config_map_namespace=config.k8s_pod_namespace
     )
+    if llm_endpoint_config.get('status') != 200:
+        return llm_endpoint_config
+    llm_endpoint_info = llm_endpoint_config.get('data')
 
     # Generate the QA list.
     qa_list = []
-    if llm_spec_info.get('data').get('provider').get('worker'):
-        # get base url for configmap
-        base_url = model_cr.get_worker_base_url_k8s_configmap(
-            name=config.k8s_default_config,
-            namespace=config.k8s_pod_namespace
-        )
+    if llm_endpoint_info.get('worker'):
+        base_url = llm_endpoint_info.get('base_url')
         logger.debug(''.join([
             f"worker llm \n",
             f"name: {name}\n",
@@ -689,7 +823,7 @@ def _generate_qa_list(
         ]))
 
         # generate QA list
-        qa_provider = QAProviderOpenAI(
+        qa_provider = AsyncQAProviderOpenAI(
             api_key='fake',
             base_url=base_url,
             model=model,
@@ -708,17 +842,8 @@ def _generate_qa_list(
 
         qa_list.extend(data.get('data'))
     else:
-        endpoint = llm_spec_info.get('data').get('provider').get('endpoint')
-        base_url = endpoint.get('url')
-        secret_name = endpoint.get('authSecret').get('name')
-
-        # get api key for secret
-        secret_info = model_cr.get_secret_info(
-            name=secret_name,
-            namespace=namespace
-        )
-        api_key = secret_info.get('apiKey')
-        llm_type = llm_spec_info.get('data').get('type')
+        api_key = llm_endpoint_info.get('api_key')
+        llm_type = llm_endpoint_info.get('type')
 
         logger.debug(''.join([
             f"3rd_party llm \n",
@@ -818,6 +943,70 @@ def _update_document_status_and_start_time(
             'data': traceback.format_exc()
         }
 
+def _update_document_progress(
+    id,
+    progress,
+    update_user,
+    conn_pool
+):
+    try:
+        document_update_item = {
+            'id': id,
+            'progress': progress,
+            'update_user': update_user
+        }
+        data_process_document_db_operate.update_document_progress(
+            document_update_item,
+            pool=conn_pool
+        )
+
+        return {
+            'status': 200,
+            'message': '',
+            'data': ''
+        }
+    except Exception as ex:
+        logger.error(''.join([
+            f"{log_tag_const.COMMON_HANDLE} update document progress ",
+            f"\n{traceback.format_exc()}"
+        ]))
+        return {
+            'status': 1000,
+            'message': str(ex),
+            'data': traceback.format_exc()
+        }
+
+def _update_document_chunk_size(
+    id,
+    chunk_size,
+    conn_pool
+):
+    try:
+        document_update_item = {
+            'id': id,
+            'chunk_size': chunk_size
+        }
+        data_process_document_db_operate.update_document_chunk_size(
+            document_update_item,
+            pool=conn_pool
+        )
+
+        return {
+            'status': 200,
+            'message': '',
+            'data': ''
+        }
+    except Exception as ex:
+        logger.error(''.join([
+            f"{log_tag_const.COMMON_HANDLE} update document chunk size ",
+            f"\n{traceback.format_exc()}"
+        ]))
+        return {
+            'status': 1000,
+            'message': str(ex),
+            'data': traceback.format_exc()
+        }
+
 def _updata_document_status_and_end_time(
     id,
     status,
@@ -851,20 +1040,21 @@ def _updata_document_status_and_end_time(
             'data': traceback.format_exc()
         }
 
-def _updata_document_progress(
+def _update_document_qa_cache_count(
     id,
-    progress,
+    qa_cache_hit_count,
+    qa_cache_miss_count,
     update_user,
     conn_pool
 ):
     try:
-        now = date_time_utils.now_str()
         document_update_item = {
             'id': id,
-            'update_user': update_user,
-            'progress': progress
+            'qa_cache_hit_count': qa_cache_hit_count,
+            'qa_cache_miss_count': qa_cache_miss_count,
+            'update_user': update_user
         }
-        data_process_document_db_operate.update_document_progress(
+        data_process_document_db_operate.update_qa_cache_count(
             document_update_item,
             pool=conn_pool
         )
@@ -876,7 +1066,7 @@ def _updata_document_progress(
         }
     except Exception as ex:
         logger.error(''.join([
-            f"{log_tag_const.COMMON_HANDLE} update document progress ",
+            f"{log_tag_const.COMMON_HANDLE} update document QA cache count ",
             f"\n{traceback.format_exc()}"
         ]))
         return {
@@ -953,3 +1143,18 @@ def _updata_document_chunk_status_and_end_time(
             'message': str(ex),
             'data': traceback.format_exc()
         }
+
+
+def _add_chunks(
+    chunks,
+    conn_pool
+):
+    """Save the chunks to database in one transaction and yield them."""
+    res = data_process_document_chunk_db_operate.bulk_add(
+        chunks,
+        pool=conn_pool
+    )
+    if res['status'] != 200:
+        raise Exception(res['message'])
+
+    yield from chunks
@@ -15,16 +15,11 @@
 
 import logging
 import traceback
-import ulid
-import ujson
 
 from common import log_tag_const
 from common.config import config
-from file_handle import common_handle
-from utils import file_utils
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import SpacyTextSplitter
-from database_operate import data_process_document_chunk_db_operate
+from file_handle import common_handle, text_splitter
+from utils import file_utils, pdf_utils
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +32,9 @@ def text_manipulate(
     task_id,
     create_user,
     chunk_size,
-    chunk_overlap
+    chunk_overlap,
+    chunk_splitter=None,
+    file=None
 ):
     """Manipulate the text content from a pdf file.
     
@@ -47,45 +44,36 @@ def text_manipulate(
     task_id: data process task id;
     chunk_size: chunk size;
     chunk_overlap: chunk overlap;
+    chunk_splitter: 'spacy', 'rule' or 'regex';
+    file: the file object of the file, such as a buffer read from minio,
+          the file is read from the temp folder if it is None;
     """
     
     logger.debug(f"{log_tag_const.PDF_HANDLE} Start to manipulate the text in pdf")
 
     try:
-        pdf_file_path = file_utils.get_temp_file_path()
+        pdf_file_path = file_utils.get_temp_file_path(task_id)
         file_path = pdf_file_path + 'original/' + file_name
         
         # Text splitter
-        documents = _get_documents_by_langchain(
+        # 按页读取并拆分，不会一次加载所有的页
+        documents = _get_documents(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            file_path=file_path
+            chunk_splitter=chunk_splitter,
+            file_path=file_path,
+            file=file
         )
 
         # step 2
-        # save all chunk info to database
-        all_document_for_process = []
-        for document in documents:
-            chunck_id = ulid.ulid()
-            page = document.metadata.get('page') + 1
-            content = document.page_content.replace("\n", "")
-            meta_info = ujson.dumps(document.metadata, ensure_ascii=False)
-            chunk_insert_item = {
-                'id': chunck_id,
-                'document_id': document_id,
-                'task_id': task_id,
-                'status': 'not_start',
-                'content': content,
-                'meta_info': meta_info,
-                'page_number': page,
-                'creator': create_user
-            }
-            all_document_for_process.append(chunk_insert_item)
-
-            data_process_document_chunk_db_operate.add(
-                chunk_insert_item,
-                pool=conn_pool
-            )
+        # save the chunk info to database in batches, and clean it
+        all_document_for_process = common_handle.save_documents(
+            documents,
+            document_id=document_id,
+            task_id=task_id,
+            create_user=create_user,
+            conn_pool=conn_pool
+        )
 
         response = common_handle.text_manipulate(
             file_name=file_name,
@@ -108,11 +96,27 @@ def text_manipulate(
             'data': traceback.format_exc()
         }
 
-def _get_documents_by_langchain(
+def _get_documents(
     chunk_size,
     chunk_overlap,
-    file_path
+    chunk_splitter,
+    file_path,
+    file=None
 ):
+    """Split the pages into chunks, and yield the chunks page by page.
+
+    The chunks are the same as PyPDFLoader(file_path).load_and_split,
+    which splits each page separately, but only a window of pages is
+    kept in memory. The file object is read instead of file_path if it
+    is given. For example
+    {
+        "page_content": "xxx",
+        "metadata": {
+            "source": "/tmp/original/a.pdf",
+            "page": 0
+        }
+    }
+    """
     # Split the text.
     if chunk_size is None:
         chunk_size = config.knowledge_chunk_size
@@ -120,13 +124,27 @@ def _get_documents_by_langchain(
     if chunk_overlap is None:
         chunk_overlap = config.knowledge_chunk_overlap
 
-    source_reader = PyPDFLoader(file_path)
-    text_splitter = SpacyTextSplitter(
+    if chunk_splitter is None:
+        chunk_splitter = config.knowledge_chunk_splitter
+
+    splitter = text_splitter.get_text_splitter(
+        chunk_splitter=chunk_splitter,
         separator="\n\n",
-        pipeline="zh_core_web_sm",
-        chunk_size=int(chunk_size),
-        chunk_overlap=int(chunk_overlap)
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
     )
-    documents = source_reader.load_and_split(text_splitter)
 
-    return documents
+    for page_number, page_content in pdf_utils.iter_pages(
+        file_path if file is None else file,
+        page_window_size=config.pdf_page_window_size,
+        process_count=config.pdf_process_count,
+        parallel_page_threshold=config.pdf_parallel_page_threshold
+    ):
+        for chunk in splitter.split_text(page_content):
+            yield {
+                'page_content': chunk,
+                'metadata': {
+                    'source': file_path,
+                    'page': page_number
+                }
+            }
@@ -0,0 +1,344 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import re
+import threading
+import time
+
+from common import log_tag_const
+from common.config import config
+from langchain.text_splitter import TextSplitter
+
+logger = logging.getLogger(__name__)
+
+# the components which are never used by sentence segmentation
+_SPACY_EXCLUDED_COMPONENTS = ['ner', 'tagger', 'attribute_ruler', 'lemmatizer']
+
+# the punctuation which ends a Chinese sentence
+_SENTENCE_END_CHARACTERS = '。！？；!?'
+# the closing quotes and brackets which belong to the sentence before them
+_SENTENCE_CLOSING_CHARACTERS = '”’」』》）)'
+_SENTENCE_PATTERN = re.compile(''.join([
+    f"[^{_SENTENCE_END_CHARACTERS}\\n]*",
+    f"(?:[{_SENTENCE_END_CHARACTERS}]+[{_SENTENCE_CLOSING_CHARACTERS}]*)?"
+]))
+
+# the supported chunk splitters
+CHUNK_SPLITTERS = ['spacy', 'rule', 'regex']
+
+# spaCy pipelines keyed by the pipeline name, such as 'zh_core_web_sm'
+_spacy_pipelines = {}
+# text splitters keyed by (pipeline or chunk splitter, chunk_size, chunk_overlap, separator)
+_text_splitters = {}
+_lock = threading.Lock()
+
+
+class SentenceTextSplitter(TextSplitter):
+    """Splitting text into sentences and merging the sentences into chunks.
+
+    The sentences are merged the same way as SpacyTextSplitter in langchain,
+    so chunk_size and chunk_overlap have the same meaning.
+    """
+
+    def __init__(self, separator='\n\n', **kwargs):
+        super().__init__(**kwargs)
+        self._separator = separator
+
+    def split_sentences(self, text):
+        raise NotImplementedError
+
+    def split_text(self, text):
+        return self._merge_splits(self.split_sentences(text), self._separator)
+
+    def merge_sentences(self, sentences):
+        """Merge the sentences into chunks.
+
+        sentences: the sentences from split_sentences, which may come from
+                   several texts;
+
+        It returns a list of (chunk, start, end), the chunk is made of
+        the sentences from index start to index end, both included.
+        """
+        splits = []
+        for index, sentence in enumerate(sentences):
+            sentence = sentence.strip()
+            if len(sentence) > 0:
+                splits.append(_Sentence(sentence, index))
+
+        return [
+            (str(chunk), chunk.start, chunk.end)
+            for chunk in self._merge_splits(splits, self._separator)
+        ]
+
+    def _join_docs(self, docs, separator):
+        text = super()._join_docs(docs, separator)
+        # 记录块的起止句子
+        if text is not None and isinstance(docs[0], _Sentence):
+            text = _Chunk(text)
+            text.start = docs[0].index
+            text.end = docs[-1].index
+        return text
+
+
+class _Sentence(str):
+    """A sentence with its index in the sentences to merge."""
+
+    def __new__(cls, text, index):
+        sentence = super().__new__(cls, text)
+        sentence.index = index
+        return sentence
+
+
+class _Chunk(str):
+    """A chunk with the index of its first and last sentences."""
+
+
+class SpacyPipelineTextSplitter(SentenceTextSplitter):
+    """Splitting text using a loaded spaCy pipeline.
+
+    It splits the text the same way as SpacyTextSplitter in langchain,
+    but the pipeline is shared by all the splitters instead of being
+    loaded by each one. The pipeline is called by one thread at a time,
+    so the splitting of all the files and tasks in the process is
+    serialized; the 'rule' and 'regex' chunk splitters do not have
+    this limit.
+    """
+
+    def __init__(self, nlp, nlp_lock, separator='\n\n', **kwargs):
+        super().__init__(separator=separator, **kwargs)
+        self._nlp = nlp
+        self._nlp_lock = nlp_lock
+
+    def split_sentences(self, text):
+        # spaCy does not promise that a pipeline can be called by
+        # several threads at the same time.
+        with self._nlp_lock:
+            return [sentence.text for sentence in self._nlp(text).sents]
+
+
+class ChineseSentenceTextSplitter(SentenceTextSplitter):
+    """Splitting text on the Chinese sentence end punctuation and newlines."""
+
+    def __init__(self, chunk_splitter='regex', separator='\n\n', **kwargs):
+        super().__init__(separator=separator, **kwargs)
+        if chunk_splitter == 'rule':
+            self._split_sentences = split_sentences_by_rule
+        else:
+            self._split_sentences = split_sentences_by_regex
+
+    def split_sentences(self, text):
+        return self._split_sentences(text)
+
+
+def split_sentences_by_rule(text):
+    """Split the text into sentences by scanning the characters.
+
+    text: text;
+
+    usage:
+    input:
+    他说：“你好！”今天天气很好。
+    明天呢？
+    
+    output:
+    ['他说：“你好！”', '今天天气很好。', '明天呢？']
+    """
+    sentences = []
+    start = 0
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char == '\n':
+            _append_sentence(sentences, text[start:index])
+            index += 1
+            start = index
+        elif char in _SENTENCE_END_CHARACTERS:
+            index += 1
+            while index < length and text[index] in _SENTENCE_END_CHARACTERS:
+                index += 1
+            while index < length and text[index] in _SENTENCE_CLOSING_CHARACTERS:
+                index += 1
+            _append_sentence(sentences, text[start:index])
+            start = index
+        else:
+            index += 1
+
+    _append_sentence(sentences, text[start:])
+
+    return sentences
+
+
+def split_sentences_by_regex(text):
+    """Split the text into sentences with a regular expression.
+
+    text: text;
+
+    It returns the same sentences as split_sentences_by_rule.
+    """
+    sentences = []
+    for match in _SENTENCE_PATTERN.finditer(text):
+        _append_sentence(sentences, match.group(0))
+
+    return sentences
+
+
+def get_text_splitter(
+    chunk_splitter,
+    chunk_size,
+    chunk_overlap,
+    separator='\n\n'
+):
+    """Get the shared text splitter.
+
+    chunk_splitter: 'spacy', 'rule' or 'regex', 'spacy' if it is None;
+    chunk_size: chunk size;
+    chunk_overlap: chunk overlap;
+    separator: the separator used to merge the sentences;
+    """
+    if chunk_splitter is None or chunk_splitter == 'spacy':
+        return get_spacy_text_splitter(
+            separator=separator,
+            pipeline='zh_core_web_sm',
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+
+    if chunk_splitter not in CHUNK_SPLITTERS:
+        raise ValueError(f"{chunk_splitter} chunk splitter is not currently supported.")
+
+    key = (chunk_splitter, int(chunk_size), int(chunk_overlap), separator)
+    text_splitter = _text_splitters.get(key)
+    if text_splitter is not None:
+        return text_splitter
+
+    with _lock:
+        text_splitter = _text_splitters.get(key)
+        if text_splitter is None:
+            text_splitter = ChineseSentenceTextSplitter(
+                chunk_splitter=chunk_splitter,
+                separator=separator,
+                chunk_size=int(chunk_size),
+                chunk_overlap=int(chunk_overlap)
+            )
+            _text_splitters[key] = text_splitter
+
+    return text_splitter
+
+
+def get_spacy_text_splitter(
+    chunk_size,
+    chunk_overlap,
+    pipeline='zh_core_web_sm',
+    separator='\n\n'
+):
+    """Get the shared spaCy text splitter.
+
+    chunk_size: chunk size;
+    chunk_overlap: chunk overlap;
+    pipeline: spaCy pipeline name;
+    separator: the separator used to merge the sentences;
+
+    The pipeline is loaded on first use.
+    """
+    key = (pipeline, int(chunk_size), int(chunk_overlap), separator)
+    text_splitter = _text_splitters.get(key)
+    if text_splitter is not None:
+        return text_splitter
+
+    nlp, nlp_lock = _get_spacy_pipeline(pipeline)
+    with _lock:
+        text_splitter = _text_splitters.get(key)
+        if text_splitter is None:
+            text_splitter = SpacyPipelineTextSplitter(
+                nlp=nlp,
+                nlp_lock=nlp_lock,
+                separator=separator,
+                chunk_size=int(chunk_size),
+                chunk_overlap=int(chunk_overlap)
+            )
+            _text_splitters[key] = text_splitter
+
+    return text_splitter
+
+
+def prewarm_spacy_pipeline(pipeline='zh_core_web_sm'):
+    """Load the spaCy pipeline in advance.
+
+    pipeline: spaCy pipeline name;
+    """
+    _get_spacy_pipeline(pipeline)
+
+
+def _get_spacy_pipeline(pipeline):
+    """Get the shared spaCy pipeline and the lock for calling it.
+
+    pipeline: spaCy pipeline name;
+    """
+    item = _spacy_pipelines.get(pipeline)
+    if item is not None:
+        return item
+
+    with _lock:
+        item = _spacy_pipelines.get(pipeline)
+        if item is None:
+            item = (_load_spacy_pipeline(pipeline), threading.Lock())
+            _spacy_pipelines[pipeline] = item
+
+    return item
+
+
+def _load_spacy_pipeline(pipeline):
+    """Load the spaCy pipeline with only the components for sentence segmentation.
+
+    pipeline: spaCy pipeline name;
+
+    The sentences are split by the parser, the same as SpacyTextSplitter
+    in langchain. If config.spacy_senter_enabled is true and the pipeline
+    has a senter, the senter is used instead, which is much faster but
+    may split the sentences differently. The tok2vec is kept only if a
+    remaining component listens to it.
+    """
+    import spacy
+
+    start_time = time.time()
+    nlp = spacy.load(pipeline, exclude=_SPACY_EXCLUDED_COMPONENTS)
+
+    if config.spacy_senter_enabled and 'senter' in nlp.disabled:
+        nlp.enable_pipe('senter')
+        if 'parser' in nlp.pipe_names:
+            nlp.disable_pipe('parser')
+
+    if 'tok2vec' in nlp.pipe_names:
+        listeners = getattr(nlp.get_pipe('tok2vec'), 'listening_components', [])
+        if not any(name in nlp.pipe_names for name in listeners):
+            nlp.disable_pipe('tok2vec')
+
+    logger.debug(''.join([
+        f"{log_tag_const.TEXT_SPLITTER} Load the spaCy pipeline.\n",
+        f"pipeline: {pipeline}\n",
+        f"components: {nlp.pipe_names}\n",
+        f"cost: {time.time() - start_time:.2f} seconds"
+    ]))
+
+    return nlp
+
+
+def _append_sentence(sentences, sentence):
+    """Append the sentence without the surrounding whitespace."""
+    sentence = sentence.strip()
+    if len(sentence) > 0:
+        sentences.append(sentence)
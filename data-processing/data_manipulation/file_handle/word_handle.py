@@ -18,10 +18,8 @@ import traceback
 
 from common import log_tag_const
 from common.config import config
-from file_handle import common_handle
+from file_handle import common_handle, text_splitter
 from utils import file_utils, docx_utils
-from langchain.text_splitter import SpacyTextSplitter
-from database_operate import data_process_document_chunk_db_operate
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +32,9 @@ def docx_text_manipulate(
     task_id,
     create_user,
     chunk_size,
-    chunk_overlap
+    chunk_overlap,
+    chunk_splitter=None,
+    file=None
 ):
     """Manipulate the text content from a word file.
     
@@ -44,43 +44,36 @@ def docx_text_manipulate(
     task_id: data process task id;
     chunk_size: chunk size;
     chunk_overlap: chunk overlap;
+    chunk_splitter: 'spacy', 'rule' or 'regex';
+    file: the file object of the file, such as a buffer read from minio,
+          the file is read from the temp folder if it is None;
     """
     
     logger.debug(f"{log_tag_const.WORD_HANDLE} Start to manipulate the text in word")
 
     try:
-        word_file_path = file_utils.get_temp_file_path()
+        word_file_path = file_utils.get_temp_file_path(task_id)
         file_path = word_file_path + 'original/' + file_name
         
         # Text splitter
-        documents = _get_documents_by_langchain(
+        # 按段落流式读取并拆分，不会一次加载所有的文本
+        documents = _get_documents(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            file_path=file_path
+            chunk_splitter=chunk_splitter,
+            file_path=file_path,
+            file=file
         )
 
         # step 2
-        # save all chunk info to database
-        all_document_for_process = []
-        for document in documents:
-            chunck_id = ulid.ulid()
-            content = document.replace("\n", "")
-            chunk_insert_item = {
-                'id': chunck_id,
-                'document_id': document_id,
-                'task_id': task_id,
-                'status': 'not_start',
-                'content': content,
-                'meta_info': '',
-                'page_number': '',
-                'creator': create_user
-            }
-            all_document_for_process.append(chunk_insert_item)
-
-            data_process_document_chunk_db_operate.add(
-                chunk_insert_item,
-                pool=conn_pool
-            )
+        # save the chunk info to database in batches, and clean it
+        all_document_for_process = common_handle.save_documents(
+            documents,
+            document_id=document_id,
+            task_id=task_id,
+            create_user=create_user,
+            conn_pool=conn_pool
+        )
 
         response = common_handle.text_manipulate(
             file_name=file_name,
@@ -103,11 +96,28 @@ def docx_text_manipulate(
             'data': traceback.format_exc()
         }
 
-def _get_documents_by_langchain(
+def _get_documents(
     chunk_size,
     chunk_overlap,
-    file_path
+    chunk_splitter,
+    file_path,
+    file=None
 ):
+    """Split the paragraphs and the table cells into chunks, and yield the chunks.
+
+    The sentences of a window of paragraphs are merged into chunks, a chunk
+    never crosses a section. The file object is read instead of file_path
+    if it is given. For example
+    {
+        "page_content": "xxx",
+        "metadata": {
+            "source": "/tmp/original/a.docx",
+            "section": 0,
+            "paragraph_start": 3,
+            "paragraph_end": 5
+        }
+    }
+    """
     # Split the text.
     if chunk_size is None:
         chunk_size = config.knowledge_chunk_size
@@ -115,13 +125,66 @@ def _get_documents_by_langchain(
     if chunk_overlap is None:
         chunk_overlap = config.knowledge_chunk_overlap
 
-    content = docx_utils.get_content(file_path)
-    text_splitter = SpacyTextSplitter(
+    if chunk_splitter is None:
+        chunk_splitter = config.knowledge_chunk_splitter
+
+    splitter = text_splitter.get_text_splitter(
+        chunk_splitter=chunk_splitter,
         separator="\n\n",
-        pipeline="zh_core_web_sm",
-        chunk_size=int(chunk_size),
-        chunk_overlap=int(chunk_overlap)
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
     )
-    documents = text_splitter.split_text(data)
 
-    return documents
+    # the sentences waiting to be merged, and the paragraph index of each one
+    sentences = []
+    paragraphs = []
+    section = None
+    for block in docx_utils.iter_blocks(file_path if file is None else file):
+        if section is not None and block['section'] != section:
+            yield from _merge_sentences(splitter, sentences, paragraphs, section, file_path, True)
+
+        # 表格的单元格按段落计数
+        if len(paragraphs) > 0 and block['paragraph'] != paragraphs[-1] and \
+           block['paragraph'] - paragraphs[0] >= config.docx_paragraph_window_size:
+            yield from _merge_sentences(splitter, sentences, paragraphs, section, file_path, False)
+
+        section = block['section']
+        for sentence in splitter.split_sentences(block['text']):
+            if len(sentence.strip()) > 0:
+                sentences.append(sentence)
+                paragraphs.append(block['paragraph'])
+
+    yield from _merge_sentences(splitter, sentences, paragraphs, section, file_path, True)
+
+def _merge_sentences(
+    splitter,
+    sentences,
+    paragraphs,
+    section,
+    file_path,
+    is_last
+):
+    """Merge the waiting sentences into chunks and remove them from the lists.
+
+    If it is not the last window, the sentences of the last chunk are kept,
+    so that they are merged with the next window.
+    """
+    chunks = splitter.merge_sentences(sentences)
+    keep_start = len(sentences)
+    if not is_last and len(chunks) > 0:
+        keep_start = chunks[-1][1]
+        chunks = chunks[:-1]
+
+    for chunk, start, end in chunks:
+        yield {
+            'page_content': chunk,
+            'metadata': {
+                'source': file_path,
+                'section': section,
+                'paragraph_start': paragraphs[start],
+                'paragraph_end': paragraphs[end]
+            }
+        }
+
+    del sentences[:keep_start]
+    del paragraphs[:keep_start]
@@ -15,12 +15,14 @@
 
 import logging
 import os
+import threading
 import traceback
 
 from common import log_tag_const
 from kubernetes import client, config
 from kubernetes.client import CustomObjectsApi, CoreV1Api
 
+from .informer import Informer
 from .custom_resources import (arcadia_resource_datasets,
                                arcadia_resource_datasources,
                                arcadia_resource_versioneddatasets,
@@ -28,6 +30,10 @@ from .custom_resources import (arcadia_resource_datasets,
 
 logger = logging.getLogger(__name__)
 
+# the client shared by the whole process
+_kube_env = None
+_kube_env_lock = threading.Lock()
+
 
 class NamespacedName:
     def __init__(self, namespace, name):
@@ -65,9 +71,24 @@ class KubeEnv:
                     "Failed to load incluster config. ",
                     "Make sure the code is running inside a Kubernetes cluster."
                 ]))
+
+        # the api clients keep the connections alive between calls
+        self.custom_objects_api = CustomObjectsApi()
+        self.core_v1_api = CoreV1Api()
+
+        # the VersionedDatasets, LLMs and ConfigMaps are read from the
+        # informers fed by list and watch, instead of the api server
+        informer_enabled = os.environ.get('KUBE_INFORMER_ENABLED', 'true')
+        self.informer_enabled = informer_enabled.lower() == 'true'
+        # informers keyed by (resource, namespace)
+        self._informers = {}
+        self._informers_lock = threading.Lock()
+        # the functions called after an object is changed in an informer,
+        # keyed by resource, handler(namespace, name)
+        self._informer_handlers = {}
          
     def list_datasources(self, namespace: str, **kwargs):
-        return CustomObjectsApi().list_namespaced_custom_object(
+        return self.custom_objects_api.list_namespaced_custom_object(
             arcadia_resource_datasources.get_group(),
             arcadia_resource_datasources.get_version(),
             namespace,
@@ -76,7 +97,7 @@ class KubeEnv:
         )
 
     def list_datasets(self, namespace: str, **kwargs):
-        return CustomObjectsApi().list_namespaced_custom_object(
+        return self.custom_objects_api.list_namespaced_custom_object(
             arcadia_resource_datasets.get_group(),
             arcadia_resource_datasets.get_version(),
             namespace, 
@@ -85,7 +106,7 @@ class KubeEnv:
         )
 
     def list_versioneddatasets(self, namespace: str, **kwargs):
-        return CustomObjectsApi().list_namespaced_custom_object(
+        return self.custom_objects_api.list_namespaced_custom_object(
             arcadia_resource_versioneddatasets.get_group(),
             arcadia_resource_versioneddatasets.get_version(),
             namespace, arcadia_resource_versioneddatasets.get_name(),
@@ -93,7 +114,7 @@ class KubeEnv:
         )
     
     def patch_versioneddatasets_status(self, namespace: str, name: str, status: any):
-        CustomObjectsApi().patch_namespaced_custom_object_status(
+        self.custom_objects_api.patch_namespaced_custom_object_status(
             arcadia_resource_versioneddatasets.get_group(),
             arcadia_resource_versioneddatasets.get_version(),
             namespace,
@@ -102,8 +123,17 @@ class KubeEnv:
             status
         )
         
-    def get_versioneddatasets_status(self, namespace: str, name: str):
-        return CustomObjectsApi().get_namespaced_custom_object_status(
+    def get_versioneddatasets_status(self, namespace: str, name: str, cached: bool = True):
+        if cached:
+            obj = self._get_custom_object_from_informer(
+                arcadia_resource_versioneddatasets,
+                namespace,
+                name
+            )
+            if obj is not None:
+                return obj
+
+        return self.custom_objects_api.get_namespaced_custom_object_status(
             arcadia_resource_versioneddatasets.get_group(),
             arcadia_resource_versioneddatasets.get_version(),
             namespace, 
@@ -112,7 +142,7 @@ class KubeEnv:
         )
     
     def patch_versioneddatasets_status(self, namespace: str, name: str, status: any):
-        CustomObjectsApi().patch_namespaced_custom_object_status(
+        self.custom_objects_api.patch_namespaced_custom_object_status(
             arcadia_resource_versioneddatasets.get_group(),
             arcadia_resource_versioneddatasets.get_version(),
             namespace,
@@ -121,8 +151,49 @@ class KubeEnv:
             status
         )
 
+    def json_patch_versioneddatasets_status(self, namespace: str, name: str, operations: list):
+        """Patch the status with a JSON patch, for example
+        [
+            {
+                "op": "replace",
+                "path": "/status/conditions/0",
+                "value": {"type": "DataProcessing", ...}
+            }
+        ]
+
+        The generated api only sends merge patches for the status.
+        """
+        return self.custom_objects_api.api_client.call_api(
+            '/apis/{group}/{version}/namespaces/{namespace}/{plural}/{name}/status',
+            'PATCH',
+            {
+                'group': arcadia_resource_versioneddatasets.get_group(),
+                'version': arcadia_resource_versioneddatasets.get_version(),
+                'namespace': namespace,
+                'plural': arcadia_resource_versioneddatasets.get_name(),
+                'name': name
+            },
+            [],
+            {
+                'Accept': 'application/json',
+                'Content-Type': 'application/json-patch+json'
+            },
+            body=operations,
+            response_type='object',
+            auth_settings=['BearerToken'],
+            _return_http_data_only=True
+        )
+
     def get_versionedmodels_status(self, namespace: str, name: str):
-        return CustomObjectsApi().get_namespaced_custom_object_status(
+        obj = self._get_custom_object_from_informer(
+            arcadia_resource_models,
+            namespace,
+            name
+        )
+        if obj is not None:
+            return obj
+
+        return self.custom_objects_api.get_namespaced_custom_object_status(
             arcadia_resource_models.get_group(),
             arcadia_resource_models.get_version(),
             namespace, 
@@ -131,14 +202,24 @@ class KubeEnv:
         )
 
     def read_namespaced_config_map(self, namespace: str, name: str):
-        return CoreV1Api().read_namespaced_config_map(
+        informer = self._get_informer(
+            key=('configmaps', namespace),
+            list_func=self.core_v1_api.list_namespaced_config_map,
+            list_args=[namespace]
+        )
+        if informer is not None:
+            obj = informer.get(name)
+            if obj is not None:
+                return obj
+
+        return self.core_v1_api.read_namespaced_config_map(
             namespace=namespace,
             name=name
         )
 
     def get_secret_info(self, namespace: str, name: str):
         """Get the secret info."""
-        data = CoreV1Api().read_namespaced_secret(
+        data = self.core_v1_api.read_namespaced_secret(
             namespace=namespace,
             name=name 
         )
@@ -146,10 +227,95 @@ class KubeEnv:
 
     def get_datasource_object(self, namespace: str, name: str):
         """Get the Datasource object."""
-        return CustomObjectsApi().get_namespaced_custom_object(
+        return self.custom_objects_api.get_namespaced_custom_object(
             group=arcadia_resource_models.get_group(),
             version=arcadia_resource_models.get_version(),
             namespace=namespace,
             plural= arcadia_resource_datasources.get_name(),
             name=name
-        )
\ No newline at end of file
+        )
+
+    def _get_custom_object_from_informer(self, resource, namespace: str, name: str):
+        """Get the custom object from the informer, None if it is not found."""
+        informer = self._get_informer(
+            key=(resource.get_name(), namespace),
+            list_func=self.custom_objects_api.list_namespaced_custom_object,
+            list_args=[
+                resource.get_group(),
+                resource.get_version(),
+                namespace,
+                resource.get_name()
+            ]
+        )
+        if informer is None:
+            return None
+
+        return informer.get(name)
+
+    def add_informer_handler(self, resource, handler):
+        """Add a function called after an object of the resource is changed.
+
+        resource: the resource name, such as arcadia_resource_models.get_name();
+        handler: the function called with the namespace and the name of the
+                 object which is added, changed or deleted,
+                 handler(namespace, name);
+
+        The handler is called in the informer thread, it is added only once.
+        """
+        with self._informers_lock:
+            handlers = self._informer_handlers.setdefault(resource, [])
+            if handler not in handlers:
+                handlers.append(handler)
+
+    def _on_informer_change(self, key, name):
+        resource, namespace = key
+        with self._informers_lock:
+            handlers = list(self._informer_handlers.get(resource, []))
+
+        for handler in handlers:
+            handler(namespace, name)
+
+    def _get_informer(self, key, list_func, list_args):
+        """Get the synced informer, it is started on first use.
+
+        None is returned until the objects have been listed, so the caller
+        reads the api server instead.
+        """
+        if not self.informer_enabled:
+            return None
+
+        informer = self._informers.get(key)
+        if informer is None:
+            with self._informers_lock:
+                informer = self._informers.get(key)
+                if informer is None:
+                    informer = Informer(
+                        name='/'.join(key),
+                        list_func=list_func,
+                        list_args=list_args,
+                        on_change=lambda name, key=key: self._on_informer_change(key, name)
+                    )
+                    informer.start()
+                    self._informers[key] = informer
+
+        if not informer.has_synced():
+            return None
+
+        return informer
+
+
+def get_kube_env():
+    """Get the KubeEnv shared by the whole process.
+
+    The kubeconfig is loaded only once, on first use.
+    """
+    global _kube_env
+
+    if _kube_env is not None:
+        return _kube_env
+
+    with _kube_env_lock:
+        if _kube_env is None:
+            _kube_env = KubeEnv()
+
+    return _kube_env
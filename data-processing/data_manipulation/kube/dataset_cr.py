@@ -14,12 +14,23 @@
 
 import logging
 
+from common import log_tag_const
+from kubernetes.client.rest import ApiException
 from utils import date_time_utils
 
-from . import client
+from . import client, status_writer
 
 logger = logging.getLogger(__name__)
 
+# the seconds to wait for a newer status update of the same dataset
+_STATUS_UPDATE_DELAY = 1
+# the max seconds a status update waits
+_STATUS_UPDATE_MAX_DELAY = 5
+# the number of times to patch the status if the dataset is changed
+_CONFLICT_RETRY_COUNT = 5
+# the status codes of a failed JSON patch test and a conflict
+_CONFLICT_STATUS_CODES = [409, 422]
+
 def update_dataset_k8s_cr(
     bucket_name,
     version_data_set_name,
@@ -30,49 +41,17 @@ def update_dataset_k8s_cr(
     bucket_name: bucket name;
     version_data_set_name: version dataset name;
     reason: the update reason;
+
+    The condition is written in the background. If the dataset is updated
+    several times before it is written, only the last reason is written.
     """
     try:
-        kube = client.KubeEnv()
-
-        one_cr_datasets = kube.get_versioneddatasets_status(
-                                bucket_name, 
-                                version_data_set_name
-                            )
-
-        conditions = one_cr_datasets['status']['conditions']
-        now_utc_str = date_time_utils.now_utc_str()
-
-        found_index = None
-        for i in range(len(conditions)):
-            item = conditions[i]
-            if item['type'] == 'DataProcessing':
-                found_index = i
-                break
-
-        
-        result = None
-        if found_index is None:
-            conditions.append({
-                'lastTransitionTime': now_utc_str,
-                'reason': reason,
-                'status': "True",
-                "type": "DataProcessing"
-            })
-        else:
-            conditions[found_index] = {
-                'lastTransitionTime': now_utc_str,
+        _status_writer.submit(
+            namespace=bucket_name,
+            name=version_data_set_name,
+            update={
                 'reason': reason,
-                'status': "True",
-                "type": "DataProcessing"
-            }
-
-        kube.patch_versioneddatasets_status(
-            bucket_name, 
-            version_data_set_name,
-            {
-                'status': {
-                    'conditions': conditions
-                }
+                'lastTransitionTime': date_time_utils.now_utc_str()
             }
         )
 
@@ -89,6 +68,13 @@ def update_dataset_k8s_cr(
             'data': ''
         }
 
+def flush_dataset_status(timeout=None):
+    """Wait until all the dataset conditions are written.
+
+    timeout: the max seconds to wait;
+    """
+    return _status_writer.flush(timeout=timeout)
+
 def get_dataset_status_k8s_cr(
     bucket_name,
     version_data_set_name
@@ -100,7 +86,7 @@ def get_dataset_status_k8s_cr(
     """
     try:
         dataset_status = None
-        kube = client.KubeEnv()
+        kube = client.get_kube_env()
 
         one_cr_datasets = kube.get_versioneddatasets_status(
                                 bucket_name, 
@@ -133,3 +119,115 @@ def get_dataset_status_k8s_cr(
             'message': '获取数据集状态失败',
             'data': ''
         }
+
+def _write_data_processing_condition(
+    bucket_name,
+    version_data_set_name,
+    update
+):
+    """Write the DataProcessing condition of the dataset.
+
+    bucket_name: bucket name;
+    version_data_set_name: version dataset name;
+    update: the reason and the lastTransitionTime of the condition;
+
+    Only the DataProcessing condition is patched, the other conditions
+    written by the controller are kept. If the dataset is changed after
+    it is read, it is read again from the api server and patched again.
+    """
+    kube = client.get_kube_env()
+    condition = {
+        'lastTransitionTime': update['lastTransitionTime'],
+        'reason': update['reason'],
+        'status': "True",
+        "type": "DataProcessing"
+    }
+
+    for i in range(_CONFLICT_RETRY_COUNT):
+        one_cr_datasets = kube.get_versioneddatasets_status(
+                                bucket_name, 
+                                version_data_set_name,
+                                cached=(i == 0)
+                            )
+
+        try:
+            kube.json_patch_versioneddatasets_status(
+                bucket_name,
+                version_data_set_name,
+                _get_data_processing_condition_patch(one_cr_datasets, condition)
+            )
+            return
+        except ApiException as ex:
+            if ex.status not in _CONFLICT_STATUS_CODES or i == _CONFLICT_RETRY_COUNT - 1:
+                raise
+
+            logger.debug(''.join([
+                f"{log_tag_const.KUBERNETES} The dataset {bucket_name}/{version_data_set_name} ",
+                f"is changed, patch the DataProcessing condition again."
+            ]))
+
+
+def _get_data_processing_condition_patch(
+    one_cr_datasets,
+    condition
+):
+    """Get the JSON patch which sets only the DataProcessing condition.
+
+    one_cr_datasets: the dataset which is read;
+    condition: the DataProcessing condition;
+
+    The patch fails if the condition is not at the same index any more,
+    or the dataset is changed when the condition has to be added.
+    """
+    conditions = one_cr_datasets.get('status', {}).get('conditions')
+    if conditions is not None:
+        for i in range(len(conditions)):
+            if conditions[i].get('type') == 'DataProcessing':
+                return [
+                    {
+                        'op': 'test',
+                        'path': f"/status/conditions/{i}/type",
+                        'value': 'DataProcessing'
+                    },
+                    {
+                        'op': 'replace',
+                        'path': f"/status/conditions/{i}",
+                        'value': condition
+                    }
+                ]
+
+    operations = [{
+        'op': 'test',
+        'path': '/metadata/resourceVersion',
+        'value': one_cr_datasets['metadata']['resourceVersion']
+    }]
+    if one_cr_datasets.get('status') is None:
+        operations.append({
+            'op': 'add',
+            'path': '/status',
+            'value': {
+                'conditions': [condition]
+            }
+        })
+    elif conditions is None:
+        operations.append({
+            'op': 'add',
+            'path': '/status/conditions',
+            'value': [condition]
+        })
+    else:
+        operations.append({
+            'op': 'add',
+            'path': '/status/conditions/-',
+            'value': condition
+        })
+
+    return operations
+
+
+_status_writer = status_writer.StatusWriter(
+    name='versioneddatasets',
+    write_func=_write_data_processing_condition,
+    delay=_STATUS_UPDATE_DELAY,
+    max_delay=_STATUS_UPDATE_MAX_DELAY
+)
@@ -0,0 +1,217 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import copy
+import logging
+import threading
+import traceback
+
+from common import log_tag_const
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+logger = logging.getLogger(__name__)
+
+# the seconds of one watch request, the watch is started again after it
+_WATCH_TIMEOUT_SECONDS = 300
+# the seconds to wait before listing again after an error
+_MIN_RETRY_DELAY = 1
+_MAX_RETRY_DELAY = 60
+
+
+class Informer:
+    """A local cache of the objects of one resource in one namespace.
+
+    The objects are listed once and then kept up to date by a watch in a
+    background thread. If the watch expires, the objects are listed again.
+
+    name: the name used in the logs, such as 'llms';
+    list_func: the api function to list the objects in the namespace,
+               such as CoreV1Api().list_namespaced_config_map;
+    list_args: the positional arguments of list_func;
+    list_kwargs: the keyword arguments of list_func;
+    on_change: the function called with the object name after an object
+               is added, changed or deleted, including the changes found
+               when the objects are listed again, on_change(name);
+    """
+
+    def __init__(
+        self,
+        name,
+        list_func,
+        list_args=None,
+        list_kwargs=None,
+        on_change=None
+    ):
+        self.name = name
+        self._list_func = list_func
+        self._list_args = list_args or []
+        self._list_kwargs = list_kwargs or {}
+        self._on_change = on_change
+        self._objects = {}
+        self._lock = threading.Lock()
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._watch = None
+        self._thread = None
+
+    def start(self):
+        """Start the list and watch in a background thread."""
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"informer {self.name}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def has_synced(self):
+        """Whether the objects have been listed."""
+        return self._synced.is_set()
+
+    def get(self, name):
+        """Get a copy of the object, None if it is not found.
+
+        name: the object name;
+        """
+        with self._lock:
+            obj = self._objects.get(name)
+
+        if obj is None:
+            return None
+
+        # the callers may change the object
+        return copy.deepcopy(obj)
+
+    def _run(self):
+        retry_delay = _MIN_RETRY_DELAY
+        while not self._stopped.is_set():
+            try:
+                resource_version = self._list()
+                retry_delay = _MIN_RETRY_DELAY
+
+                while not self._stopped.is_set():
+                    resource_version = self._watch_once(resource_version)
+            except ApiException as ex:
+                if ex.status == 410:
+                    # the resource version is too old, list again
+                    logger.debug(f"{log_tag_const.KUBERNETES} The watch of {self.name} is expired.")
+                    continue
+
+                logger.error(''.join([
+                    f"{log_tag_const.KUBERNETES} The watch of {self.name} failed, ",
+                    f"retry after {retry_delay} seconds.\n",
+                    f"The error is: {ex!r}"
+                ]))
+            except Exception as ex:
+                logger.error(''.join([
+                    f"{log_tag_const.KUBERNETES} The watch of {self.name} failed, ",
+                    f"retry after {retry_delay} seconds.\n",
+                    f"The error is: {ex!r}"
+                ]))
+
+            self._stopped.wait(retry_delay)
+            retry_delay = min(_MAX_RETRY_DELAY, retry_delay * 2)
+
+    def _list(self):
+        """List all the objects and return the resource version of the list."""
+        result = self._list_func(*self._list_args, **self._list_kwargs)
+
+        objects = {}
+        for item in _get_items(result):
+            objects[_get_metadata(item, 'name')] = item
+
+        with self._lock:
+            old_objects = self._objects
+            self._objects = objects
+
+        if self._synced.is_set():
+            # the changes may be missed after the watch expires
+            for name in old_objects.keys() | objects.keys():
+                old_obj = old_objects.get(name)
+                obj = objects.get(name)
+                if (
+                    old_obj is None or
+                    obj is None or
+                    _get_metadata(old_obj, 'resource_version') != _get_metadata(obj, 'resource_version')
+                ):
+                    self._notify_change(name)
+        self._synced.set()
+
+        logger.debug(f"{log_tag_const.KUBERNETES} List {len(objects)} {self.name}.")
+
+        return _get_metadata(result, 'resource_version')
+
+    def _watch_once(self, resource_version):
+        """Watch the changes until the watch request times out.
+
+        resource_version: the resource version to watch from;
+
+        It returns the resource version of the last change.
+        """
+        self._watch = watch.Watch()
+        for event in self._watch.stream(
+            self._list_func,
+            *self._list_args,
+            resource_version=resource_version,
+            timeout_seconds=_WATCH_TIMEOUT_SECONDS,
+            **self._list_kwargs
+        ):
+            obj = event['object']
+            name = _get_metadata(obj, 'name')
+            with self._lock:
+                if event['type'] == 'DELETED':
+                    self._objects.pop(name, None)
+                else:
+                    self._objects[name] = obj
+
+            self._notify_change(name)
+            resource_version = _get_metadata(obj, 'resource_version')
+
+        return resource_version
+
+    def _notify_change(self, name):
+        if self._on_change is None:
+            return
+
+        try:
+            self._on_change(name)
+        except Exception:
+            logger.error(''.join([
+                f"{log_tag_const.KUBERNETES} Failed to handle the change of {name} in {self.name}.\n",
+                f"The error is: \n{traceback.format_exc()}"
+            ]))
+
+
+def _get_items(result):
+    """Get the items of the list result, a dict for the custom objects."""
+    if isinstance(result, dict):
+        return result.get('items', [])
+
+    return result.items
+
+
+def _get_metadata(obj, field):
+    """Get the metadata field, such as 'name' or 'resource_version'."""
+    if isinstance(obj, dict):
+        if field == 'resource_version':
+            field = 'resourceVersion'
+        return obj.get('metadata', {}).get(field)
+
+    return getattr(obj.metadata, field)
@@ -13,15 +13,30 @@
 # limitations under the License.
 
 import logging
+import threading
+import time
 import yaml
 import traceback
 
 from utils import date_time_utils
 
 from . import client
+from .custom_resources import arcadia_resource_models
 
 logger = logging.getLogger(__name__)
 
+# the seconds for which a resolved llm endpoint config is used without
+# reading the llm again
+_LLM_ENDPOINT_CONFIG_TTL = 30
+# the max seconds for which a resolved llm endpoint config is used if the
+# resourceVersion of the llm is not changed, the configmap and the secret
+# are read again after it
+_LLM_ENDPOINT_CONFIG_MAX_AGE = 600
+
+# the resolved llm endpoint configs keyed by (namespace, name)
+_llm_endpoint_configs = {}
+_llm_endpoint_configs_lock = threading.Lock()
+
 def get_spec_for_llms_k8s_cr(
     name,
     namespace
@@ -32,7 +47,7 @@ def get_spec_for_llms_k8s_cr(
     namespace: namespace;
     """
     try:
-        kube = client.KubeEnv()
+        kube = client.get_kube_env()
 
         one_cr_llm = kube.get_versionedmodels_status(
                             namespace=namespace, 
@@ -55,6 +70,170 @@ def get_spec_for_llms_k8s_cr(
         }
 
 
+def get_llm_endpoint_config(
+    name,
+    namespace,
+    config_map_name,
+    config_map_namespace
+):
+    """Get the resolved llm endpoint config, it is shared by all the chunks and tasks.
+
+    name: model name;
+    namespace: namespace;
+    config_map_name: the config map with the worker base url;
+    config_map_namespace: the namespace of the config map;
+
+    The data is a dictionary object. for example:
+    {
+        "provider": the provider in the llm spec,
+        "type": "zhipuai",
+        "worker": false,
+        "base_url": "https://open.bigmodel.cn/api/paas/v4",
+        "api_key": the api key in the secret, it is base64 encoded
+    }
+
+    The config is used for _LLM_ENDPOINT_CONFIG_TTL seconds. After that
+    the llm is read again, and the config is resolved again only if the
+    resourceVersion of the llm is changed or the config is older than
+    _LLM_ENDPOINT_CONFIG_MAX_AGE seconds. The config is dropped at once
+    if the llm is changed or deleted in the informer.
+    """
+    key = (namespace, name)
+    now = time.monotonic()
+    item = _llm_endpoint_configs.get(key)
+    if item is not None and now < item['expire_time']:
+        return {
+            'status': 200,
+            'message': '',
+            'data': item['data']
+        }
+
+    # the threads which miss the cache at the same time resolve it only once
+    with _llm_endpoint_configs_lock:
+        now = time.monotonic()
+        item = _llm_endpoint_configs.get(key)
+        if item is not None and now < item['expire_time']:
+            return {
+                'status': 200,
+                'message': '',
+                'data': item['data']
+            }
+
+        try:
+            kube = client.get_kube_env()
+            kube.add_informer_handler(
+                arcadia_resource_models.get_name(),
+                _on_llm_changed
+            )
+            one_cr_llm = kube.get_versionedmodels_status(
+                namespace=namespace,
+                name=name
+            )
+            resource_version = one_cr_llm.get('metadata', {}).get('resourceVersion')
+
+            if (
+                item is not None and
+                resource_version is not None and
+                item['resource_version'] == resource_version and
+                now - item['resolve_time'] < _LLM_ENDPOINT_CONFIG_MAX_AGE
+            ):
+                item['expire_time'] = now + _LLM_ENDPOINT_CONFIG_TTL
+                return {
+                    'status': 200,
+                    'message': '',
+                    'data': item['data']
+                }
+
+            data = _resolve_llm_endpoint_config(
+                spec=one_cr_llm['spec'],
+                namespace=namespace,
+                config_map_name=config_map_name,
+                config_map_namespace=config_map_namespace
+            )
+        except Exception as ex:
+            logger.error(''.join([
+                f"Can not resolve the llm endpoint config. The error is: \n",
+                f"{traceback.format_exc()}\n"
+            ]))
+            return {
+                'status': 400,
+                'message': '获取llms中的provider失败',
+                'data': ''
+            }
+
+        _llm_endpoint_configs[key] = {
+            'data': data,
+            'resource_version': resource_version,
+            'resolve_time': now,
+            'expire_time': now + _LLM_ENDPOINT_CONFIG_TTL
+        }
+
+    return {
+        'status': 200,
+        'message': '',
+        'data': data
+    }
+
+
+def invalidate_llm_endpoint_config(
+    name,
+    namespace
+):
+    """Drop the resolved llm endpoint config, such as after the llm is changed.
+
+    name: model name;
+    namespace: namespace;
+    """
+    with _llm_endpoint_configs_lock:
+        _llm_endpoint_configs.pop((namespace, name), None)
+
+
+def _on_llm_changed(namespace, name):
+    """Drop the resolved config after the llm is changed in the informer."""
+    invalidate_llm_endpoint_config(
+        name=name,
+        namespace=namespace
+    )
+
+
+def _resolve_llm_endpoint_config(
+    spec,
+    namespace,
+    config_map_name,
+    config_map_namespace
+):
+    """Resolve the base url and the api key of the llm spec."""
+    provider = spec.get('provider', {})
+    data = {
+        'provider': provider,
+        'type': spec.get('type'),
+        'worker': bool(provider.get('worker')),
+        'base_url': None,
+        'api_key': None
+    }
+
+    if data['worker']:
+        data['base_url'] = get_worker_base_url_k8s_configmap(
+            name=config_map_name,
+            namespace=config_map_namespace
+        )
+        if data['base_url'] is None:
+            raise RuntimeError(f"Can not get the worker base url in the config map {config_map_name}")
+    else:
+        endpoint = provider.get('endpoint')
+        secret_name = endpoint.get('authSecret').get('name')
+        data['base_url'] = endpoint.get('url')
+        secret_info = get_secret_info(
+            name=secret_name,
+            namespace=namespace
+        )
+        if secret_info is None:
+            raise RuntimeError(f"Can not get the secret {secret_name}")
+        data['api_key'] = secret_info.get('apiKey')
+
+    return data
+
+
 def get_worker_base_url_k8s_configmap(
     name,
     namespace
@@ -65,7 +244,7 @@ def get_worker_base_url_k8s_configmap(
     namespace: namespace;
     """
     try:
-        kube = client.KubeEnv()
+        kube = client.get_kube_env()
 
         config_map = kube.read_namespaced_config_map(
             name=name,
@@ -93,7 +272,7 @@ def get_secret_info(
     namespace: namespace;
     """
     try:
-        kube = client.KubeEnv()
+        kube = client.get_kube_env()
 
         return kube.get_secret_info(
             namespace=namespace,
@@ -113,7 +292,7 @@ def get_llm_qa_retry_count_in_k8s_configmap(
     config_map_name: config map name
     """
     try:
-        kube = client.KubeEnv()
+        kube = client.get_kube_env()
 
         config_map = kube.read_namespaced_config_map(
             namespace=namespace,
@@ -132,3 +311,34 @@ def get_llm_qa_retry_count_in_k8s_configmap(
         ]))
    
         return None
+
+
+def get_llm_qa_concurrency_in_k8s_configmap(
+    namespace,
+    config_map_name
+):
+    """Get the max number of QA requests sent to one model at the same time in the configmap.
+    
+    namespace: namespace;
+    config_map_name: config map name
+    """
+    try:
+        kube = client.get_kube_env()
+
+        config_map = kube.read_namespaced_config_map(
+            namespace=namespace,
+            name=config_map_name
+        )
+
+        config = config_map.data.get('dataprocess')
+        
+        json_data = yaml.safe_load(config)
+
+        return json_data['llm'].get('qa_concurrency')
+    except Exception as ex:
+        logger.error(''.join([
+            f"Can not the llm QA concurrency. The error is: \n",
+            f"{traceback.format_exc()}\n"
+        ]))
+   
+        return None
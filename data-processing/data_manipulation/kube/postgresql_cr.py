@@ -31,7 +31,7 @@ def get_postgresql_config_in_k8s_configmap(
     config_map_name: config map name
     """
     try:
-        kube = client.KubeEnv()
+        kube = client.get_kube_env()
 
         config_map = kube.read_namespaced_config_map(
             namespace=namespace,
@@ -0,0 +1,152 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import threading
+import time
+import traceback
+
+from common import log_tag_const
+
+logger = logging.getLogger(__name__)
+
+
+class StatusWriter:
+    """Write the status of the objects in a background thread.
+
+    The updates of one object are debounced and coalesced. An update is
+    written after no newer update of the object is submitted for delay
+    seconds, but no later than max_delay seconds after the first pending
+    one, and only the last update is written.
+
+    name: the name used in the logs, such as 'versioneddatasets';
+    write_func: the function which writes one update,
+                write_func(namespace, name, update);
+    delay: the seconds to wait for a newer update;
+    max_delay: the max seconds an update waits;
+    """
+
+    def __init__(
+        self,
+        name,
+        write_func,
+        delay=0,
+        max_delay=None
+    ):
+        if max_delay is None:
+            max_delay = delay
+
+        self.name = name
+        self._write_func = write_func
+        self._delay = delay
+        self._max_delay = max(delay, max_delay)
+        # the pending updates keyed by (namespace, name), for example
+        # {
+        #     "update": the latest update,
+        #     "due_time": the time to write it,
+        #     "deadline": the latest time to write it
+        # }
+        self._pending = {}
+        self._writing_count = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(
+        self,
+        namespace,
+        name,
+        update
+    ):
+        """Submit the update of the object, it replaces the pending one.
+
+        namespace: namespace;
+        name: the object name;
+        update: the update passed to write_func;
+        """
+        now = time.monotonic()
+        with self._condition:
+            key = (namespace, name)
+            item = self._pending.get(key)
+            if item is None:
+                item = {
+                    'deadline': now + self._max_delay
+                }
+                self._pending[key] = item
+
+            item['update'] = update
+            item['due_time'] = min(now + self._delay, item['deadline'])
+            self._start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Write all the submitted updates without waiting for the delay.
+
+        timeout: the max seconds to wait, wait forever if it is None;
+
+        It returns False if the updates are not all written before timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            now = time.monotonic()
+            for item in self._pending.values():
+                item['due_time'] = now
+            self._condition.notify_all()
+
+            while len(self._pending) > 0 or self._writing_count > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+
+        return True
+
+    def _start(self):
+        """Start the writer thread on first use, the caller holds the lock."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"status writer {self.name}",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    key = None
+                    wait_seconds = None
+                    if len(self._pending) > 0:
+                        key = min(self._pending, key=lambda k: self._pending[k]['due_time'])
+                        wait_seconds = self._pending[key]['due_time'] - time.monotonic()
+                        if wait_seconds <= 0:
+                            break
+                    self._condition.wait(wait_seconds)
+
+                update = self._pending.pop(key)['update']
+                self._writing_count += 1
+
+            try:
+                self._write_func(key[0], key[1], update)
+            except Exception:
+                logger.error(''.join([
+                    f"{log_tag_const.KUBERNETES} Failed to write the status of ",
+                    f"{self.name} {key[0]}/{key[1]}.\n",
+                    f"{traceback.format_exc()}"
+                ]))
+            finally:
+                with self._condition:
+                    self._writing_count -= 1
+                    self._condition.notify_all()
@@ -15,11 +15,9 @@
 
 import logging
 import re
-import time
 import traceback
 
 from common import log_tag_const
-from common.config import config
 from langchain.chat_models import ChatOpenAI
 from langchain import LLMChain
 from langchain.prompts.chat import (
@@ -28,10 +26,13 @@ from langchain.prompts.chat import (
 )
 from llm_prompt_template import llm_prompt
 
+from . import retry_policy
 from .base_qa_provider import BaseQAProvider
 
 logger = logging.getLogger(__name__)
 
+_QA_PATTERN = re.compile(r'Q\d+:(\s*)(.*?)(\s*)A\d+:(\s*)([\s\S]*?)(?=Q|$)')
+
 class QAProviderOpenAI(BaseQAProvider):
     """The QA provider is used by open ai."""
     
@@ -48,6 +49,7 @@ class QAProviderOpenAI(BaseQAProvider):
         if max_tokens is None:
             max_tokens = "512"
 
+        self.base_url = base_url
         self.llm = ChatOpenAI(
             openai_api_key=api_key, 
             base_url=base_url,
@@ -80,80 +82,45 @@ class QAProviderOpenAI(BaseQAProvider):
             llm=self.llm
         )
 
-        result = []
-        status = 200
-        message = ''
-        invoke_count = 0
-        while True:
-            try:
-                if invoke_count >= int(config.llm_qa_retry_count):
-                    logger.error(''.join([
-                        f"{log_tag_const.OPEN_AI} Cannot access the open ai service.\n",
-                        f"The tracing error is: \n{traceback.format_exc()}\n"
-                    ]))
+        def request():
+            response = llm_chain.run(text=text)
+            result = get_qa_list_from_response(response)
+            if len(result) == 0:
+                raise retry_policy.QAFormatError()
+            return result
+
+        return retry_policy.call_with_retry(
+            request,
+            endpoint=self.base_url,
+            error_message='调用本地模型失败，请检查模型是否可用',
+            log_tag=log_tag_const.OPEN_AI
+        )
 
-                    status = 1000
-                    break
-                else:
-                    response = llm_chain.run(text=text)
-                    result = self.__get_qa_list_from_response(response)
-                    if len(result) > 0:
-                        break
-                    else:
-                        logger.warn('failed to get QA list, wait for 10 seconds and retry')
-                        time.sleep(10) # sleep 10 seconds
-                        invoke_count += 1
-                        message = '模型调用成功，生成的QA格式不对，请更换prompt'
-            except Exception as ex:
-                time.sleep(10)
-                invoke_count += 1
-                message = '调用本地模型失败，请检查模型是否可用'
-        
-        return {
-            'status': status,
-            'message': message,
-            'data': result
-        }
 
+def get_qa_list_from_response(response):
+    """Get the QA list from the response.
     
-    def __get_qa_list_from_response(
-        self,
-        response
-    ):
-        """Get the QA list from the response.
-        
-        Notice: There are some problems in the local OpenAI service.
-        Some time it cannot return the correct question and answer list.
-
-        Parameters
-        ----------
-        response
-            the response from open ai service
-        """
-        result = []
-        try:
-            pattern = re.compile(r'Q\d+:(\s*)(.*?)(\s*)A\d+:(\s*)([\s\S]*?)(?=Q|$)')
-
-
-            # 移除换行符
-            response_text = response.replace('\\n', '')
-            matches = pattern.findall(response_text)
-
-            for match in matches:
-                q = match[1]
-                a = match[4]
-                if q and a:
-                    a = re.sub(r'[\n]', '', a).strip()
-                    result.append([q, a])
-        except Exception as ex:
-            logger.error(''.join([
-                f"{log_tag_const.OPEN_AI} 从结果中提取QA失败\n",
-                f"The tracing error is: \n{traceback.format_exc()}\n"
-            ]))
-        
-        return result
-
-
-
-
+    Notice: There are some problems in the local OpenAI service.
+    Some time it cannot return the correct question and answer list.
+
+    response: the response from open ai service;
+    """
+    result = []
+    try:
+        # 移除换行符
+        response_text = response.replace('\\n', '')
+        matches = _QA_PATTERN.findall(response_text)
+
+        for match in matches:
+            q = match[1]
+            a = match[4]
+            if q and a:
+                a = re.sub(r'[\n]', '', a).strip()
+                result.append([q, a])
+    except Exception as ex:
+        logger.error(''.join([
+            f"{log_tag_const.OPEN_AI} 从结果中提取QA失败\n",
+            f"The tracing error is: \n{traceback.format_exc()}\n"
+        ]))
     
+    return result
@@ -0,0 +1,242 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import functools
+import logging
+import threading
+
+from common import log_tag_const
+from langchain.prompts import PromptTemplate
+from llm_prompt_template import llm_prompt
+from openai import AsyncOpenAI
+
+from . import retry_policy
+from .base_qa_provider import BaseQAProvider
+from .qa_provider_open_ai import get_qa_list_from_response
+
+logger = logging.getLogger(__name__)
+
+# All the clients live in one background event loop, so that the
+# connections are kept alive and reused by all the threads.
+_loop = None
+_loop_lock = threading.Lock()
+# clients keyed by (base_url, model, api_key), only used in the background loop
+_clients = {}
+
+
+class AsyncQAProviderOpenAI(BaseQAProvider):
+    """The async QA provider is used by open ai.
+
+    One client with keep-alive connections is shared by all the providers
+    with the same base_url and model. generate_qa_list can be called by any
+    thread, it waits for agenerate_qa_list in the background event loop.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        base_url,
+        model,
+        temperature=None,
+        max_tokens=None
+    ):
+        if temperature is None:
+            temperature = "0.8"
+        if max_tokens is None:
+            max_tokens = "512"
+
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.temperature = float(temperature)
+        self.max_tokens = int(max_tokens)
+
+    def generate_qa_list(
+        self,
+        text,
+        prompt_template=None
+    ):
+        """Generate the QA list.
+
+        Parameters
+        ----------
+        text
+            use the text to generate QA list
+        prompt_template
+            the prompt template
+        """
+        return _run_in_background_loop(
+            self.agenerate_qa_list(
+                text=text,
+                prompt_template=prompt_template
+            )
+        )
+
+    def generate_qa_list_batch(
+        self,
+        text_list,
+        prompt_template=None,
+        concurrency=None
+    ):
+        """Generate the QA list for each text.
+
+        Parameters
+        ----------
+        text_list
+            the text list
+        prompt_template
+            the prompt template
+        concurrency
+            the max number of requests at the same time
+        """
+        return _run_in_background_loop(
+            self.agenerate_qa_list_batch(
+                text_list=text_list,
+                prompt_template=prompt_template,
+                concurrency=concurrency
+            )
+        )
+
+    async def agenerate_qa_list(
+        self,
+        text,
+        prompt_template=None
+    ):
+        """Generate the QA list.
+
+        Parameters
+        ----------
+        text
+            use the text to generate QA list
+        prompt_template
+            the prompt template
+        """
+        if prompt_template is None:
+            prompt_template = llm_prompt.get_default_prompt_template()
+
+        prompt = _get_prompt_template(prompt_template).format(text=text)
+        client = _get_client(
+            base_url=self.base_url,
+            model=self.model,
+            api_key=self.api_key
+        )
+
+        async def arequest():
+            completion = await client.chat.completions.create(
+                model=self.model,
+                messages=[{'role': 'user', 'content': prompt}],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
+            response = completion.choices[0].message.content or ''
+            result = get_qa_list_from_response(response)
+            if len(result) == 0:
+                raise retry_policy.QAFormatError()
+            return result
+
+        return await retry_policy.acall_with_retry(
+            arequest,
+            endpoint=self.base_url,
+            error_message='调用本地模型失败，请检查模型是否可用',
+            log_tag=log_tag_const.OPEN_AI
+        )
+
+    async def agenerate_qa_list_batch(
+        self,
+        text_list,
+        prompt_template=None,
+        concurrency=None
+    ):
+        """Generate the QA list for each text, several texts at the same time.
+
+        Parameters
+        ----------
+        text_list
+            the text list
+        prompt_template
+            the prompt template
+        concurrency
+            the max number of requests at the same time,
+            all the texts are sent at the same time if it is None
+
+        The results are in the same order as text_list.
+        """
+        if concurrency is None:
+            concurrency = max(1, len(text_list))
+        semaphore = asyncio.Semaphore(int(concurrency))
+
+        async def generate_qa_list_with_semaphore(text):
+            async with semaphore:
+                return await self.agenerate_qa_list(
+                    text=text,
+                    prompt_template=prompt_template
+                )
+
+        return await asyncio.gather(*[
+            generate_qa_list_with_semaphore(text)
+            for text in text_list
+        ])
+
+
+@functools.lru_cache(maxsize=32)
+def _get_prompt_template(prompt_template):
+    """Get the prompt template which is built only once."""
+    return PromptTemplate.from_template(prompt_template)
+
+
+def _get_client(
+    base_url,
+    model,
+    api_key
+):
+    """Get the shared client, it must be called in the background loop."""
+    key = (base_url, model, api_key)
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0
+        )
+        _clients[key] = client
+
+    return client
+
+
+def _get_background_loop():
+    """Get the background event loop, start it on first use."""
+    global _loop
+
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever,
+                name='open ai qa provider',
+                daemon=True
+            ).start()
+            _loop = loop
+
+    return _loop
+
+
+def _run_in_background_loop(coroutine):
+    """Run the coroutine in the background loop and wait for the result."""
+    future = asyncio.run_coroutine_threadsafe(
+        coroutine,
+        _get_background_loop()
+    )
+    return future.result()
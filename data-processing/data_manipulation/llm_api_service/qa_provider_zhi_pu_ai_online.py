@@ -16,17 +16,19 @@
 import logging
 import re
 import traceback
-import time
 
 import zhipuai
-from common import log_tag_const, const
-from common.config import config
+from common import log_tag_const
 from llm_prompt_template import llm_prompt
 
+from . import retry_policy
 from .base_qa_provider import BaseQAProvider
 
 logger = logging.getLogger(__name__)
 
+# the error codes of the ZhiPuAI service which mean too many requests
+_RATE_LIMIT_ERROR_CODES = [1302, 1303, 1305]
+
 
 class QAProviderZhiPuAIOnline(BaseQAProvider):
     """The QA provider is used by zhi pu ai online."""
@@ -63,62 +65,38 @@ class QAProviderZhiPuAIOnline(BaseQAProvider):
             text=text
         )
         
-        result = []
-        status = 200
-        message = ''
-
-        invoke_count = 0
-        wait_seconds = const.llm_wait_seconds
-        while True:
-            logger.debug(''.join([
-                f"{log_tag_const.ZHI_PU_AI} content.\n",
-                f"{content}\n"
-            ]))
-            try:
-                if invoke_count >= int(config.llm_qa_retry_count):
-                    logger.error(''.join([
-                        f"{log_tag_const.ZHI_PU_AI} Cannot access the open ai service.\n",
-                        f"The tracing error is: \n{traceback.format_exc()}\n"
-                    ]))
-
-                    status = 1000
-                    break
-                else:
-                    response = zhipuai.model_api.invoke(
-                        model="chatglm_6b",
-                        prompt=[{"role": "user", "content": content}],
-                        top_p=float(top_p),
-                        temperature=float(temperature),
-                    )
-                    if response['success']:
-                        result = self.__format_response_to_qa_list(response)
-                        if len(result) > 0:
-                            break
-                        else:
-                            logger.warn(f"failed to get QA list, wait for {wait_seconds} seconds and retry")
-                            time.sleep(wait_seconds) # sleep 120 seconds
-                            invoke_count += 1
-                            message = '模型调用成功，生成的QA格式不对，请更换prompt'
-                    else:
-                        logger.error(''.join([
-                            f"{log_tag_const.ZHI_PU_AI} Cannot access the ZhiPuAI service.\n",
-                            f"The error is: \n{response['msg']}\n"
-                        ]))
-                        logger.warn(f"zhipuai request failed, wait for {wait_seconds} seconds and retry")
-                        time.sleep(wait_seconds) # sleep 120 seconds
-                        invoke_count += 1
-                        message = '模型调用失败，失败原因: ' + response['msg']
-            except Exception as ex:
-                logger.warn(f"zhipuai request exception, wait for {wait_seconds} seconds and retry")
-                time.sleep(wait_seconds)
-                invoke_count += 1
-                message = '模型调用失败，请检查模型是否可用！'
-
-        return {
-            'status': status,
-            'message': message,
-            'data': result
-        }
+        logger.debug(''.join([
+            f"{log_tag_const.ZHI_PU_AI} content.\n",
+            f"{content}\n"
+        ]))
+
+        def request():
+            response = zhipuai.model_api.invoke(
+                model="chatglm_6b",
+                prompt=[{"role": "user", "content": content}],
+                top_p=float(top_p),
+                temperature=float(temperature),
+            )
+            if not response['success']:
+                status_code = None
+                if response.get('code') in _RATE_LIMIT_ERROR_CODES:
+                    status_code = 429
+                raise retry_policy.LLMRequestError(
+                    message='模型调用失败，失败原因: ' + response['msg'],
+                    status_code=status_code
+                )
+
+            result = self.__format_response_to_qa_list(response)
+            if len(result) == 0:
+                raise retry_policy.QAFormatError()
+            return result
+
+        return retry_policy.call_with_retry(
+            request,
+            endpoint='zhipuai',
+            error_message='模型调用失败，请检查模型是否可用！',
+            log_tag=log_tag_const.ZHI_PU_AI
+        )
 
 
     def __format_response_to_qa_list(self, response):
@@ -0,0 +1,373 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+
+from common.config import config
+
+logger = logging.getLogger(__name__)
+
+# the error kinds
+FORMAT_ERROR = 'format'
+TRANSPORT_ERROR = 'transport'
+RATE_LIMIT_ERROR = 'rate_limit'
+
+FORMAT_ERROR_MESSAGE = '模型调用成功，生成的QA格式不对，请更换prompt'
+
+# the HTTP status codes which are worth retrying besides 5xx
+_RETRYABLE_STATUS_CODES = [408, 409, 429]
+
+# rate limiters keyed by endpoint
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class QAFormatError(Exception):
+    """The model is called successfully, but the QA list can not be
+    extracted from the response."""
+
+    def __init__(self, message=FORMAT_ERROR_MESSAGE):
+        super().__init__(message)
+
+
+class LLMRequestError(Exception):
+    """The model request failed.
+
+    message: the error message for the task;
+    status_code: the HTTP status code, 429 means rate limited;
+    retry_after: the seconds to wait before retrying;
+    """
+
+    def __init__(
+        self,
+        message,
+        status_code=None,
+        retry_after=None
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """The retry policy for one QA request.
+
+    Transport failures back off exponentially with jitter and honor the
+    Retry-After of the rate limited responses. The QA format failures
+    mean that the model works, so they are retried after a short delay.
+    Each kind of failure has its own retry count.
+    """
+
+    def __init__(
+        self,
+        max_retry_count,
+        base_delay=2,
+        max_delay=60,
+        format_delay=1
+    ):
+        self.max_retry_count = max(1, int(max_retry_count))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.format_delay = format_delay
+        self._failure_counts = {
+            FORMAT_ERROR: 0,
+            TRANSPORT_ERROR: 0
+        }
+
+    def get_delay(self, ex):
+        """Get the seconds to wait before retrying, None if it should not retry.
+
+        ex: the exception of the failed request;
+        """
+        error_kind, retry_after = classify_error(ex)
+        if error_kind is None:
+            return None
+
+        count_kind = FORMAT_ERROR if error_kind == FORMAT_ERROR else TRANSPORT_ERROR
+        self._failure_counts[count_kind] += 1
+        failure_count = self._failure_counts[count_kind]
+        if failure_count >= self.max_retry_count:
+            return None
+
+        if error_kind == FORMAT_ERROR:
+            return self.format_delay * random.uniform(0.5, 1.5)
+
+        backoff = min(self.max_delay, self.base_delay * 2 ** (failure_count - 1))
+        # equal jitter, so that the concurrent requests do not retry together
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, 1))
+
+        return delay
+
+
+class TokenBucket:
+    """A token bucket rate limiter shared by the threads and the coroutines.
+
+    rate: the number of tokens added per second;
+    capacity: the max number of tokens;
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, wait if there is none."""
+        wait_seconds = self._reserve()
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+    async def acquire_async(self):
+        """Take a token, wait if there is none."""
+        wait_seconds = self._reserve()
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the seconds, such as after a 429."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def _reserve(self):
+        """Take a token and return the seconds to wait until it is available."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+
+def get_rate_limiter(endpoint):
+    """Get the rate limiter of the endpoint, None if there is no limit.
+
+    endpoint: such as the base url of the model service;
+    """
+    if config.llm_qa_rate_limit is None or config.llm_qa_rate_limit <= 0:
+        return None
+
+    with _rate_limiters_lock:
+        rate_limiter = _rate_limiters.get(endpoint)
+        if rate_limiter is None:
+            rate_limiter = TokenBucket(
+                rate=config.llm_qa_rate_limit,
+                capacity=config.llm_qa_rate_burst
+            )
+            _rate_limiters[endpoint] = rate_limiter
+
+    return rate_limiter
+
+
+def classify_error(ex):
+    """Get the error kind and the Retry-After seconds of the exception.
+
+    The error kind is None if the request should not be retried, such as
+    an authentication failure.
+
+    ex: the exception of the failed request;
+    """
+    if isinstance(ex, QAFormatError):
+        return (FORMAT_ERROR, None)
+
+    status_code = getattr(ex, 'status_code', None)
+    retry_after = getattr(ex, 'retry_after', None)
+    response = getattr(ex, 'response', None)
+    if response is not None:
+        if status_code is None:
+            status_code = getattr(response, 'status_code', None)
+        if retry_after is None:
+            retry_after = _get_retry_after(getattr(response, 'headers', None))
+
+    if status_code == 429:
+        return (RATE_LIMIT_ERROR, retry_after)
+
+    if (
+        isinstance(status_code, int) and
+        400 <= status_code < 500 and
+        status_code not in _RETRYABLE_STATUS_CODES
+    ):
+        return (None, None)
+
+    return (TRANSPORT_ERROR, retry_after)
+
+
+def call_with_retry(
+    request,
+    endpoint,
+    error_message,
+    log_tag
+):
+    """Send the QA request with the retry policy and the rate limiter.
+
+    request: a function which sends one request and returns the QA list,
+             it raises QAFormatError if the QA list is not found;
+    endpoint: the endpoint for the rate limiter;
+    error_message: the message if the request fails with an unexpected error;
+    log_tag: log tag;
+    """
+    retry_policy = RetryPolicy(max_retry_count=config.llm_qa_retry_count)
+    rate_limiter = get_rate_limiter(endpoint)
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        try:
+            return {
+                'status': 200,
+                'message': '',
+                'data': request()
+            }
+        except Exception as ex:
+            delay = _get_retry_delay(
+                retry_policy,
+                rate_limiter=rate_limiter,
+                ex=ex,
+                log_tag=log_tag
+            )
+            if delay is None:
+                return _get_failed_result(ex, error_message)
+
+            if delay > 0:
+                time.sleep(delay)
+
+
+async def acall_with_retry(
+    arequest,
+    endpoint,
+    error_message,
+    log_tag
+):
+    """Send the QA request with the retry policy and the rate limiter.
+
+    arequest: a coroutine function which sends one request and returns the QA list,
+              it raises QAFormatError if the QA list is not found;
+    endpoint: the endpoint for the rate limiter;
+    error_message: the message if the request fails with an unexpected error;
+    log_tag: log tag;
+    """
+    retry_policy = RetryPolicy(max_retry_count=config.llm_qa_retry_count)
+    rate_limiter = get_rate_limiter(endpoint)
+    while True:
+        if rate_limiter is not None:
+            await rate_limiter.acquire_async()
+
+        try:
+            return {
+                'status': 200,
+                'message': '',
+                'data': await arequest()
+            }
+        except Exception as ex:
+            delay = _get_retry_delay(
+                retry_policy,
+                rate_limiter=rate_limiter,
+                ex=ex,
+                log_tag=log_tag
+            )
+            if delay is None:
+                return _get_failed_result(ex, error_message)
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+def _get_retry_delay(
+    retry_policy,
+    rate_limiter,
+    ex,
+    log_tag
+):
+    """Get the seconds to wait before retrying, None if it should not retry.
+
+    It is 0 if the request is rate limited and the rate limiter is paused
+    for the delay instead, so the delay is waited only once.
+    """
+    delay = retry_policy.get_delay(ex)
+    if delay is None:
+        logger.error(''.join([
+            f"{log_tag} Failed to generate the QA list, stop retrying.\n",
+            f"The error is: {ex!r}\n"
+        ]))
+        return None
+
+    error_kind, _ = classify_error(ex)
+    logger.warning(''.join([
+        f"{log_tag} Failed to generate the QA list, ",
+        f"wait for {delay:.1f} seconds and retry.\n",
+        f"The error kind: {error_kind}\n",
+        f"The error is: {ex!r}"
+    ]))
+
+    if error_kind == RATE_LIMIT_ERROR and rate_limiter is not None:
+        # the other requests to the same endpoint wait as well, this
+        # request waits for the delay when it takes the next token
+        rate_limiter.pause(delay)
+        return 0
+
+    return delay
+
+
+def _get_failed_result(ex, error_message):
+    if isinstance(ex, (QAFormatError, LLMRequestError)):
+        message = str(ex)
+    else:
+        message = error_message
+
+    return {
+        'status': 1000,
+        'message': message,
+        'data': []
+    }
+
+
+def _get_retry_after(headers):
+    """Get the seconds from the Retry-After header."""
+    if headers is None:
+        return None
+
+    try:
+        retry_after_ms = headers.get('retry-after-ms')
+        if retry_after_ms is not None:
+            return float(retry_after_ms) / 1000
+
+        retry_after = headers.get('retry-after')
+        if retry_after is None:
+            return None
+
+        try:
+            return float(retry_after)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return max(0, retry_at.timestamp() - time.time())
+    except Exception:
+        return None
@@ -0,0 +1,159 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import threading
+import traceback
+
+from common import log_tag_const
+
+logger = logging.getLogger(__name__)
+
+
+class TaskScheduler:
+    """Run the waiting tasks with a fixed number of worker threads.
+
+    Each worker thread claims a task and runs it, and waits for
+    poll_interval seconds or until notify is called if no task is waiting.
+    A heartbeat thread calls heartbeat_func every heartbeat_interval
+    seconds, starting when the scheduler starts.
+
+    name: the name used in the logs;
+    claim_func: the function which claims a waiting task and returns it,
+                or returns None if no task is waiting, claim_func();
+    run_func: the function which runs a claimed task, run_func(task);
+    heartbeat_func: the function which keeps the running tasks alive,
+                    heartbeat_func();
+    concurrency: the number of worker threads;
+    poll_interval: the max seconds a worker waits for a new task;
+    heartbeat_interval: the seconds between two heartbeats;
+    """
+
+    def __init__(
+        self,
+        name,
+        claim_func,
+        run_func,
+        heartbeat_func,
+        concurrency,
+        poll_interval,
+        heartbeat_interval
+    ):
+        self.name = name
+        self._claim_func = claim_func
+        self._run_func = run_func
+        self._heartbeat_func = heartbeat_func
+        self._concurrency = max(1, concurrency)
+        self._poll_interval = poll_interval
+        self._heartbeat_interval = heartbeat_interval
+        # increased by notify, so that a worker does not wait if a task is
+        # added after it fails to claim one
+        self._notify_count = 0
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads and the heartbeat thread."""
+        self._threads.append(threading.Thread(
+            target=self._run_heartbeat,
+            name=f"{self.name} heartbeat",
+            daemon=True
+        ))
+        for index in range(self._concurrency):
+            self._threads.append(threading.Thread(
+                target=self._run_worker,
+                name=f"{self.name} worker {index}",
+                daemon=True
+            ))
+
+        for thread in self._threads:
+            thread.start()
+
+        logger.debug(''.join([
+            f"{log_tag_const.THREADING} Start the task scheduler {self.name}.\n",
+            f"concurrency: {self._concurrency}"
+        ]))
+
+    def notify(self):
+        """Wake up the waiting workers to claim the new tasks."""
+        with self._condition:
+            self._notify_count += 1
+            self._condition.notify_all()
+
+    def stop(self, timeout=None):
+        """Stop claiming new tasks.
+
+        timeout: the max seconds to wait for the running tasks, wait
+                 forever if it is None;
+
+        It returns False if some tasks are still running after timeout,
+        they are not heartbeated any more and are claimed again by
+        another scheduler after they are interrupted.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        for thread in self._threads:
+            thread.join(timeout)
+
+        return all(not thread.is_alive() for thread in self._threads)
+
+    def _run_worker(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                notify_count = self._notify_count
+
+            task = None
+            try:
+                task = self._claim_func()
+            except Exception:
+                logger.error(''.join([
+                    f"{log_tag_const.THREADING} Failed to claim a task in {self.name}.\n",
+                    f"{traceback.format_exc()}"
+                ]))
+
+            if task is None:
+                with self._condition:
+                    if not self._stopped and notify_count == self._notify_count:
+                        self._condition.wait(self._poll_interval)
+                continue
+
+            try:
+                self._run_func(task)
+            except Exception:
+                logger.error(''.join([
+                    f"{log_tag_const.THREADING} Failed to run a task in {self.name}.\n",
+                    f"{traceback.format_exc()}"
+                ]))
+
+    def _run_heartbeat(self):
+        while True:
+            try:
+                self._heartbeat_func()
+            except Exception:
+                logger.error(''.join([
+                    f"{log_tag_const.THREADING} Failed to heartbeat in {self.name}.\n",
+                    f"{traceback.format_exc()}"
+                ]))
+
+            with self._condition:
+                if not self._stopped:
+                    self._condition.wait(self._heartbeat_interval)
+                if self._stopped:
+                    return
@@ -22,9 +22,12 @@ from common import log_tag_const
 from common.config import config
 from controller import data_process_controller
 from database_clients import postgresql_pool_client
+from file_handle import text_splitter
+from kube import dataset_cr
 from sanic import Sanic
 from sanic.response import json
 from sanic_cors import CORS
+from service import data_process_service
 from utils import log_utils, sanic_utils
 
 # Initialize the log config
@@ -64,11 +67,38 @@ async def init_web_server(app, loop):
     app.config['RESPONSE_TIMEOUT'] = 60 * 60 * 60
     app.config['KEEP_ALIVE_TIMEOUT'] = 60 * 60 * 60
     app.config['conn_pool'] = postgresql_pool_client.get_pool(_create_database_connection)
+    # 开始执行等待中的任务，包括被中断的任务
+    data_process_service.start_task_scheduler(app.config['conn_pool'])
+    if config.text_splitter_prewarm:
+        # 提前加载spaCy模型，避免第一个文件处理时等待
+        await loop.run_in_executor(
+            None,
+            text_splitter.prewarm_spacy_pipeline
+        )
 
 
 @app.listener('after_server_stop')
 async def shutdown_web_server(app, loop):
-    postgresql_pool_client.release_pool(app.config['conn_pool'])
+    # 停止执行新的任务，未结束的任务由其他进程重新执行
+    stopped = await loop.run_in_executor(
+        None,
+        data_process_service.stop_task_scheduler,
+        10
+    )
+    if stopped:
+        postgresql_pool_client.release_pool(app.config['conn_pool'])
+    else:
+        # 还有任务在执行，不关闭连接池，避免任务因连接被关闭而失败
+        logger.warning(''.join([
+            f"{log_tag_const.THREADING} Some tasks are still running, ",
+            "the database connection pool is not released."
+        ]))
+    # 写入还未写入的数据集状态
+    await loop.run_in_executor(
+        None,
+        dataset_cr.flush_dataset_status,
+        10
+    )
 
 
 app.blueprint(data_process_controller.data_process)
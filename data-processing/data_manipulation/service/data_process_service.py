@@ -13,12 +13,15 @@
 # limitations under the License.
 
 
-import asyncio
 import logging
+import os
+import socket
+import time
 import traceback
 
 import ulid
 from common import log_tag_const
+from common.config import config
 from data_store_process import minio_store_process
 from database_operate import (data_process_db_operate,
                               data_process_detail_db_operate,
@@ -26,12 +29,15 @@ from database_operate import (data_process_db_operate,
                               data_process_detail_preview_db_operate,
                               data_process_document_chunk_db_operate)
 from kube import dataset_cr
-from parallel import thread_parallel
+from parallel.task_scheduler import TaskScheduler
 from utils import date_time_utils
 from kube import model_cr
 
 logger = logging.getLogger(__name__)
 
+# 当前进程的任务调度器
+_task_scheduler = None
+
 
 def list_by_page(
     req_json,
@@ -84,41 +90,23 @@ def add(
 
     if res['status'] == 200:
         # update the dataset status
-        update_dataset = dataset_cr.update_dataset_k8s_cr(
+        # 状态在后台写入，任务结束时的状态在它之后提交，不会被它覆盖
+        dataset_cr.update_dataset_k8s_cr(
             bucket_name=req_json['bucket_name'],
             version_data_set_name=req_json['version_data_set_name'],
             reason='processing'
         )
 
-        if update_dataset['status'] != 200:
-            return update_dataset
-
-        try:
-
-            async def async_text_manipulate(
-                req_json,
-                pool,
-                id
-            ):
-                minio_store_process.text_manipulate(req_json, pool=pool, id=id)
-
-            def execute_text_manipulate_task(loop):
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(async_text_manipulate(req_json, pool=pool, id=id))
-
-            thread_parallel.run_async_background_task(
-                execute_text_manipulate_task,
-                'execute text manipuate task'
-            )
-        except Exception as ex:
-            logger.error(''.join([
-                f"{log_tag_const.MINIO_STORE_PROCESS} There is an error when ",
-                f"start to run the minio store process.\n",
-                f"{traceback.format_exc()}\n"
-            ]))
-        
+        # 数据集状态提交后，任务才可以被调度器执行，并唤醒等待中的worker
+        res = data_process_db_operate.submit_schedule_by_id(
+            {
+                'id': id
+            },
+            pool=pool
+        )
+        if res['status'] == 200 and _task_scheduler is not None:
+            _task_scheduler.notify()
 
-    
     return res
 
 
@@ -127,16 +115,7 @@ def delete_by_id(
     pool
 ):
     """Delete a record with id"""
-    # 删除需要在详情中预览的信息
-    data_process_detail_db_operate.delete_transform_by_task_id(req_json, pool=pool)
-    # 删除生成的QA信息
-    data_process_detail_db_operate.delete_qa_by_task_id(req_json, pool=pool)
-    data_process_detail_preview_db_operate.delete_qa_by_task_id(req_json, pool=pool)
-    data_process_detail_db_operate.delete_qa_clean_by_task_id(req_json, pool=pool)
-    # 删除对应的进度信息
-    data_process_document_db_operate.delete_by_task_id(req_json, pool=pool)
-    # 删除chunk的信息
-    data_process_document_chunk_db_operate.delete_by_task_id(req_json, pool=pool)
+    _delete_task_data(req_json, pool=pool)
 
     return data_process_db_operate.delete_by_id(req_json, pool=pool)
 
@@ -223,6 +202,77 @@ def check_task_name(
         'data': ''
     }
 
+
+def start_task_scheduler(pool):
+    """Start running the waiting tasks in the background.
+
+    pool: database connection pool.
+
+    At most config.task_concurrency tasks are run at the same time in one
+    server process, the tasks with a higher priority run first. The tasks
+    interrupted by a stopped or crashed process are run again.
+    """
+    global _task_scheduler
+
+    worker = '-'.join([
+        socket.gethostname(),
+        str(os.getpid()),
+        ulid.ulid()
+    ])
+
+    def claim_task():
+        res = data_process_db_operate.claim_waiting_task(
+            {
+                'worker': worker
+            },
+            pool=pool
+        )
+        if res['status'] != 200:
+            raise Exception(res['message'])
+
+        if len(res['data']) == 0:
+            return None
+
+        return res['data'][0]
+
+    def run_task(task):
+        _run_task(task, pool=pool, worker=worker)
+
+    def heartbeat():
+        _heartbeat(pool=pool, worker=worker)
+
+    _task_scheduler = TaskScheduler(
+        name='data process task scheduler',
+        claim_func=claim_task,
+        run_func=run_task,
+        heartbeat_func=heartbeat,
+        concurrency=config.task_concurrency,
+        poll_interval=config.task_poll_interval,
+        heartbeat_interval=config.task_heartbeat_interval
+    )
+    _task_scheduler.start()
+
+
+def stop_task_scheduler(timeout=None):
+    """Stop running the waiting tasks.
+
+    timeout: the max seconds to wait for the running tasks, wait forever
+             if it is None;
+
+    The tasks still running are run again by another server process after
+    config.task_heartbeat_timeout seconds.
+    """
+    global _task_scheduler
+
+    if _task_scheduler is None:
+        return True
+
+    scheduler = _task_scheduler
+    _task_scheduler = None
+
+    return scheduler.stop(timeout)
+
+
 def _get_default_data_for_detail():
     """Get the data for the detail"""
     return {
@@ -394,6 +444,10 @@ def _set_children_info_for_config_map_for_result(
     """
     # insert the qa list
     if process_cofig_map.get('qa_split'):
+        file_progress = _get_file_progress(
+            task_id=task_id,
+            conn_pool=conn_pool
+        )
         from_result['chunk_processing']['children'].append({
             'name': 'qa_split',
             'enable': 'true',
@@ -406,10 +460,8 @@ def _set_children_info_for_config_map_for_result(
                 task_id=task_id,
                 conn_pool=conn_pool
             ),
-            'file_progress': _get_file_progress(
-                task_id=task_id,
-                conn_pool=conn_pool
-            )
+            'file_progress': file_progress,
+            'qa_cache': _get_qa_cache_count(file_progress)
         })
 
     # remove invisible characters
@@ -659,6 +711,22 @@ def _get_file_progress(
 
     return list_file.get('data')
 
+def _get_qa_cache_count(file_progress):
+    """Get the QA cache hit count and miss count of all the files.
+    
+    file_progress: the file progress list;
+    """
+    hit_count = 0
+    miss_count = 0
+    for item in file_progress or []:
+        hit_count += item.get('qa_cache_hit_count') or 0
+        miss_count += item.get('qa_cache_miss_count') or 0
+
+    return {
+        'hit_count': hit_count,
+        'miss_count': miss_count
+    }
+
 def _get_qa_split_status(
     task_id,
     conn_pool
@@ -779,3 +847,103 @@ def _get_privacy_process_file_num(
             f"{log_tag_const.MINIO_STORE_PROCESS} Get the number of files processed after privacy "
         ]))
         return 0
+
+
+def _delete_task_data(
+    req_json,
+    pool
+):
+    """Delete the data generated by the task.
+    
+    req_json is a dictionary object. for example:
+    {
+        "id": "01HGWBE48DT3ADE9ZKA62SW4WS"
+    }
+    """
+    # 删除需要在详情中预览的信息
+    data_process_detail_db_operate.delete_transform_by_task_id(req_json, pool=pool)
+    # 删除生成的QA信息
+    data_process_detail_db_operate.delete_qa_by_task_id(req_json, pool=pool)
+    data_process_detail_preview_db_operate.delete_qa_by_task_id(req_json, pool=pool)
+    data_process_detail_db_operate.delete_qa_clean_by_task_id(req_json, pool=pool)
+    # 删除对应的进度信息
+    data_process_document_db_operate.delete_by_task_id(req_json, pool=pool)
+    # 删除chunk的信息
+    data_process_document_chunk_db_operate.delete_by_task_id(req_json, pool=pool)
+
+
+def _run_task(
+    task,
+    pool,
+    worker
+):
+    """Run a task claimed by the worker.
+
+    task: the claimed task, for example
+        {
+            "id": "01HGWBE48DT3ADE9ZKA62SW4WS",
+            "request_info": the request to add the task
+        }
+    """
+    id = task['id']
+    req_json = task['request_info']
+    status = None
+    try:
+        # 被中断的任务重新执行，先删除上次执行生成的数据
+        _delete_task_data({'id': id}, pool=pool)
+
+        minio_store_process.text_manipulate(req_json, pool=pool, id=id)
+    except Exception:
+        logger.error(''.join([
+            f"{log_tag_const.MINIO_STORE_PROCESS} There is an error when ",
+            f"run the data process task {id}.\n",
+            f"{traceback.format_exc()}\n"
+        ]))
+        status = 'process_fail'
+        dataset_cr.update_dataset_k8s_cr(
+            bucket_name=req_json['bucket_name'],
+            version_data_set_name=req_json['version_data_set_name'],
+            reason=status
+        )
+    finally:
+        data_process_db_operate.finish_schedule_by_id(
+            {
+                'id': id,
+                'worker': worker,
+                'status': status
+            },
+            pool=pool
+        )
+
+
+def _heartbeat(
+    pool,
+    worker
+):
+    """Keep the running tasks of the worker alive, and set the interrupted
+    tasks of the other workers to waiting.
+    """
+    data_process_db_operate.update_schedule_heartbeat(
+        {
+            'worker': worker
+        },
+        pool=pool
+    )
+
+    heartbeat_datetime = date_time_utils.timestamp_to_str(
+        time.time() - config.task_heartbeat_timeout
+    )
+    res = data_process_db_operate.requeue_interrupted_tasks(
+        {
+            'heartbeat_datetime': heartbeat_datetime
+        },
+        pool=pool
+    )
+
+    if res['status'] == 200 and len(res['data']) > 0:
+        logger.warning(''.join([
+            f"{log_tag_const.MINIO_STORE_PROCESS} Resume the interrupted tasks.\n",
+            f"task ids: {[item['id'] for item in res['data']]}"
+        ]))
+        if _task_scheduler is not None:
+            _task_scheduler.notify()
@@ -12,4 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-llm_wait_seconds = 120
+
+import os
+import sys
+
+# the modules are imported from the data_manipulation folder, the same as server.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,127 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+
+import pytest
+from file_handle import common_handle
+
+
+def test_qa_split_skips_queued_chunks_when_reading_fails(monkeypatch):
+    monkeypatch.setattr(common_handle.config, 'llm_qa_concurrency', 1)
+    monkeypatch.setattr(common_handle.config, 'qa_chunk_window_size', 100)
+    monkeypatch.setattr(
+        common_handle,
+        '_get_llm_semaphore',
+        lambda llm_config: threading.BoundedSemaphore(1)
+    )
+
+    # the first chunk is running until the file fails to be read
+    read_failed = threading.Event()
+    started_chunk_ids = []
+
+    def qa_split(**kwargs):
+        started_chunk_ids.append(kwargs['document_chunk_id'])
+        read_failed.wait(5)
+        return {
+            'status': 200,
+            'message': '',
+            'data': ''
+        }
+
+    monkeypatch.setattr(common_handle, '_qa_split', qa_split)
+
+    def qa_chunks():
+        for index in range(5):
+            yield {
+                'document_chunk_id': str(index),
+                'content': 'xxx'
+            }
+        read_failed.set()
+        raise RuntimeError('the page can not be parsed')
+
+    with pytest.raises(RuntimeError):
+        common_handle._qa_split_with_concurrency(
+            support_type_map={'qa_split': {'llm_config': {}}},
+            task_id='task',
+            get_chunk_count=lambda: (5, False),
+            qa_chunks=qa_chunks(),
+            file_name='a.pdf',
+            document_id='document',
+            conn_pool=None,
+            create_user='admin'
+        )
+
+    assert started_chunk_ids == ['0']
+
+
+def test_qa_split_sets_the_progress_to_100_after_all_the_chunks(monkeypatch):
+    monkeypatch.setattr(common_handle.config, 'llm_qa_concurrency', 2)
+    monkeypatch.setattr(common_handle.config, 'qa_chunk_window_size', 100)
+    monkeypatch.setattr(common_handle.config, 'llm_qa_cache_enabled', False)
+    monkeypatch.setattr(
+        common_handle,
+        '_get_llm_semaphore',
+        lambda llm_config: threading.BoundedSemaphore(2)
+    )
+
+    saved_progress = []
+
+    def qa_split(**kwargs):
+        saved_progress.append(kwargs['get_progress']())
+        return {
+            'status': 200,
+            'message': '',
+            'data': ''
+        }
+
+    monkeypatch.setattr(common_handle, '_qa_split', qa_split)
+
+    updated_progress = []
+
+    class DocumentDbOperate:
+        @staticmethod
+        def update_document_progress(req_json, pool):
+            updated_progress.append(req_json['progress'])
+
+    monkeypatch.setattr(
+        common_handle,
+        'data_process_document_db_operate',
+        DocumentDbOperate
+    )
+
+    qa_chunks = [
+        {
+            'document_chunk_id': str(index),
+            'content': 'xxx'
+        }
+        for index in range(3)
+    ]
+
+    result = common_handle._qa_split_with_concurrency(
+        support_type_map={'qa_split': {'llm_config': {}}},
+        task_id='task',
+        # the file is still being read, so the chunk count is estimated
+        get_chunk_count=lambda: (3, False),
+        qa_chunks=qa_chunks,
+        file_name='a.pdf',
+        document_id='document',
+        conn_pool=None,
+        create_user='admin'
+    )
+
+    assert result['status'] == 200
+    assert max(saved_progress) < 100
+    assert updated_progress == [100]
@@ -0,0 +1,61 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+
+import docx
+from docx.enum.section import WD_SECTION
+from utils import docx_utils
+
+
+def _save(document):
+    file = io.BytesIO()
+    document.save(file)
+    file.seek(0)
+    return file
+
+
+def test_iter_blocks_yields_the_paragraphs_and_the_cells_in_order():
+    document = docx.Document()
+    document.add_paragraph('第一段')
+    document.add_paragraph(' ')
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).merge(table.cell(0, 1)).text = '合并'
+    table.cell(1, 1).text = '单元格'
+    document.add_section(WD_SECTION.NEW_PAGE)
+    document.add_paragraph('第二节\t段落')
+
+    assert list(docx_utils.iter_blocks(_save(document))) == [
+        {'text': '第一段', 'section': 0, 'paragraph': 0},
+        {'text': '合并', 'section': 0, 'paragraph': 2, 'table': 0, 'row': 0, 'column': 0},
+        {'text': '单元格', 'section': 0, 'paragraph': 2, 'table': 0, 'row': 1, 'column': 1},
+        {'text': '第二节\t段落', 'section': 1, 'paragraph': 4}
+    ]
+
+
+def test_iter_blocks_gives_the_same_text_as_python_docx():
+    document = docx.Document()
+    for index in range(300):
+        document.add_paragraph(f"段落 {index}").add_run('换行').add_break()
+
+    file = _save(document)
+    expected = [
+        paragraph.text
+        for paragraph in docx.Document(file).paragraphs
+        if paragraph.text.strip()
+    ]
+    file.seek(0)
+
+    assert [block['text'] for block in docx_utils.iter_blocks(file)] == expected
@@ -0,0 +1,88 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+from transform.text import clean_transform, privacy_transform, transform_plan
+
+_TRANSFORM_TYPES = (
+    'remove_invisible_characters',
+    'space_standardization',
+    'remove_emojis',
+    'remove_email',
+    'remove_ip_address',
+    'remove_number'
+)
+
+
+def _transform_one_by_one(text):
+    """Run the transforms one by one, the same as before the plan."""
+    for transform in [
+        clean_transform.remove_invisible_characters,
+        clean_transform.space_standardization,
+        clean_transform.remove_emojis,
+        privacy_transform.remove_email,
+        privacy_transform.remove_ip_address,
+        privacy_transform.remove_phone,
+        privacy_transform.remove_id_card,
+        privacy_transform.remove_weixin,
+        privacy_transform.remove_bank_card
+    ]:
+        text = transform(text)['data']['text']
+
+    return text
+
+
+def _transform_with_plan(text):
+    plan = transform_plan.get_transform_plan(_TRANSFORM_TYPES)
+    return transform_plan.execute_transform_plan(plan, text)['data']['text']
+
+
+@pytest.mark.parametrize('text, expected', [
+    # the invisible character is removed before the privacy patterns scan the text
+    ('联系foo\x00@bar.com。', '联系xxxxxx。'),
+    ('电话138\xad12345678。', '电话xxxxxx。'),
+    # the card numbers are matched after the phone behind them is masked
+    ('卡号：622202123456789012313912345678。', '卡号：xxxxxxxxxxxx。'),
+    ('地址：192.168.11010119900307888813912345678。', '地址：192.168.xxxxxxxxxxxx。'),
+    # the phone is matched before the bank card
+    ('手机：1234567813912345678😀。', '手机：12345678xxxxxx。')
+])
+def test_privacy_transforms_scan_the_transformed_text(text, expected):
+    assert _transform_with_plan(text) == expected
+    assert _transform_one_by_one(text) == expected
+
+
+def test_emojis_are_removed_after_space_standardization():
+    # U+200D joins the emoji sequence, it is a whitespace replaced first
+    text = '家庭\U0001F468\u200d\U0001F469\u200d\U0001F467结束'
+    plan = transform_plan.get_transform_plan(_TRANSFORM_TYPES)
+    result = transform_plan.execute_transform_plan(plan, text)['data']
+
+    assert result['text'] == '家庭  结束'
+    assert _transform_one_by_one(text) == '家庭  结束'
+    assert [item['transform_type'] for item in result['clean_data']] == [
+        'space_standardization',
+        'remove_emojis'
+    ]
+
+
+def test_plan_is_the_same_as_transforms_one_by_one():
+    text = ''.join([
+        '联系邮箱:172817631@qq.com马上申请。服务器192.168.1.1挂了！',
+        '电话13912345678，微信:abc123，身份证110101199003078888。',
+        '😀好的\t结束　银行卡6222021234567890123。普通句子没有隐私。'
+    ])
+
+    assert _transform_with_plan(text) == _transform_one_by_one(text)
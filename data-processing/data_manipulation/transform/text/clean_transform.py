@@ -14,16 +14,24 @@
 
 
 import logging
-import re
+import threading
 import traceback
 
 import ftfy
 import opencc
-from common import log_tag_const, special_characters
+from common import log_tag_const
 from selectolax.parser import HTMLParser
 
+from . import regex_pattern
+
 logger = logging.getLogger(__name__)
 
+# OpenCC converters keyed by the conversion config such as 't2s' and 's2t'.
+# Loading the conversion dictionaries is expensive, so each converter is
+# created once and shared by all the threads.
+_opencc_converters = {}
+_opencc_converters_lock = threading.Lock()
+
 
 def remove_invisible_characters(text):
     """remove invisible characters.
@@ -37,10 +45,10 @@ def remove_invisible_characters(text):
     “一户一表、水表出户、抄表到户”是指一个家庭用户安装一个计量水表，计量水表安装在住宅的公共部位，供水企业抄表到户，按户计量收费。
     """
     try:
-        pattern = r'[\x00-\x1F\x7F-\x9F\xAD\r\t\b\x0B\x1C\x1D\x1E]'
-        find_pattern = r'[^，。！？,.!?]*[\x00-\x1F\x7F-\x9F\xAD\r\t\b\x0B\x1C\x1D\x1E][^，。！？,.!?]*'
+        pattern = regex_pattern.get_pattern('invisible_characters')
+        find_pattern = regex_pattern.get_find_pattern('invisible_characters')
 
-        clean_text = re.sub(pattern, '', text)
+        clean_text = pattern.sub('', text)
 
         clean_data = _find_clean_data(
             text=text,
@@ -80,16 +88,16 @@ def space_standardization(text):
     第一条 灭火是指国家综合性消防救援队、专职消防队依法承担的火灾扑救工作。
     """
     try:
-        various_whitespaces = special_characters.VARIOUS_WHITESPACES
-        pattern = '|'.join(re.escape(value) for value in various_whitespaces)
-        find_pattern = '|'.join(f'[^，。！？,.!?]*{re.escape(value)}[^，。！？,.!?]*' for value in various_whitespaces)
+        pattern = regex_pattern.get_pattern('various_whitespaces')
+        find_pattern = regex_pattern.get_find_pattern('various_whitespaces')
 
-        clean_text = re.sub(pattern, ' ', text)
+        clean_text = pattern.sub(' ', text)
 
         clean_data = _find_clean_data(
             text=text,
             pattern=pattern,
-            find_pattern=find_pattern
+            find_pattern=find_pattern,
+            replace_string=' '
         )
 
         return {
@@ -160,7 +168,7 @@ def traditional_to_simplified(text):
     风暴带来的暂停使消防员和其他紧急反应人员得以进入禁区进行结构破坏评估。
     """
     try:
-        clean_text = opencc.OpenCC('t2s').convert(text)
+        clean_text = _get_opencc_converter('t2s').convert(text)
 
         return {
             'status': 200,
@@ -184,6 +192,44 @@ def traditional_to_simplified(text):
         }
 
 
+def traditional_to_simplified_batch(text_list):
+    """Traditional Chinese to Simplified Chinese for a list of text.
+    
+    text_list: text list;
+
+    usage:
+    input:
+    ['風暴帶來的暫停', '進行結構破壞評估']
+    
+    output:
+    ['风暴带来的暂停', '进行结构破坏评估']
+    """
+    try:
+        converter = _get_opencc_converter('t2s')
+        clean_text_list = [converter.convert(text) for text in text_list]
+
+        return {
+            'status': 200,
+            'message': '',
+            'data': {
+                'found': 0,
+                'text_list': clean_text_list
+            }
+        }
+    except Exception as ex:
+        error = str(ex)
+        logger.error(''.join([
+            f"{log_tag_const.CLEAN_TRANSFORM} Executing Traditional Chinese to Simplified Chinese failed\n",
+            f"The tracing error is: \n{traceback.format_exc()}\n"
+        ]))
+
+        return {
+            'status': 400,
+            'message': error,
+            'data': traceback.format_exc()
+        }
+
+
 def remove_html_tag(text):
     """clean html code in text samples.
     
@@ -240,11 +286,10 @@ def remove_emojis(text):
     这是一段带有表情符号的文本。
     """
     try:
-        emojis = special_characters.EMOJI
-        pattern = '|'.join(re.escape(value) for value in emojis)
-        find_pattern = '|'.join(f'[^，。！？,.!?]*{re.escape(value)}[^，。！？,.!?]*' for value in emojis)
+        pattern = regex_pattern.get_pattern('emojis')
+        find_pattern = regex_pattern.get_find_pattern('emojis')
 
-        clean_text = re.sub(pattern, '', text)
+        clean_text = pattern.sub('', text)
 
         clean_data = _find_clean_data(
             text=text,
@@ -277,23 +322,46 @@ def remove_emojis(text):
 def _find_clean_data(
     text,
     pattern,
-    find_pattern
+    find_pattern,
+    replace_string=''
 ):
     """find clean data for pre_content and post_content.
     
     text: text;
-    pattern: ;
-    find_pattern: ;
-
+    pattern: the compiled pattern for the content to be cleaned;
+    find_pattern: the compiled pattern for the sentence including the content;
+    replace_string: the string used to replace the content;
     """
     clean_data = []
 
-    sentences = re.findall(find_pattern, text)
-    for sentence in sentences:
-        post_content = re.sub(pattern, '', sentence)
+    # most of the text has nothing to clean, skip the sentence scanning.
+    if pattern.search(text) is None:
+        return clean_data
+
+    for match in find_pattern.finditer(text):
+        sentence = match.group(0)
+        post_content = pattern.sub(replace_string, sentence)
         clean_data.append({
             'pre_content': sentence,
             'post_content': post_content
         })
 
     return clean_data
+
+
+def _get_opencc_converter(conversion):
+    """Get the shared OpenCC converter for the conversion config.
+    
+    conversion: conversion config, such as 't2s', 's2t';
+    """
+    converter = _opencc_converters.get(conversion)
+    if converter is not None:
+        return converter
+
+    with _opencc_converters_lock:
+        converter = _opencc_converters.get(conversion)
+        if converter is None:
+            converter = opencc.OpenCC(conversion)
+            _opencc_converters[conversion] = converter
+
+    return converter
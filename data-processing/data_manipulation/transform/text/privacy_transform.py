@@ -14,10 +14,11 @@
 
 
 import logging
-import re
 import traceback
 
-from common import log_tag_const, special_characters
+from common import log_tag_const
+
+from . import regex_pattern
 
 logger = logging.getLogger(__name__)
 
@@ -42,10 +43,10 @@ def remove_email(
         if replace_string is None:
             replace_string = 'xxxxxx'
 
-        pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        find_pattern = r'[^，。！？,.!?]*[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}[^，。！？,.!?]*'
-   
-        clean_text = re.sub(pattern, replace_string, text)
+        pattern = regex_pattern.get_pattern('email')
+        find_pattern = regex_pattern.get_find_pattern('email')
+
+        clean_text = pattern.sub(replace_string, text)
 
         clean_data = _find_clean_data(
             text=text,
@@ -92,37 +93,17 @@ def remove_ip_address(
         if replace_string is None:
             replace_string = 'xxxxxx'
 
-        pattern = ''.join([
-            r'((?:(?:1[0-9][0-9]\.)|(?:2[0-4][0-9]\.)|',
-            r'(?:25[0-5]\.)|(?:[1-9][0-9]\.)|(?:[0-9]\.))',
-            r'{3}(?:(?:1[0-9][0-9])|(?:2[0-4][0-9])|',
-            r'(?:25[0-5])|(?:[1-9][0-9])|(?:[0-9]))|',
-            r'([\da-fA-F]{1,4}:){7}[\da-fA-F]{1,4})'
-        ])
-
-        find_pattern = ''.join([
-            r'([^，。！？,.!?]*)',
-            pattern,
-            r'([^，。！？,.!?]*)'
-        ])
+        pattern = regex_pattern.get_pattern('ip_address')
+        find_pattern = regex_pattern.get_find_pattern('ip_address')
 
-        clean_text = re.sub(pattern=pattern,
-                            repl=replace_string,
-                            string=text)
+        clean_text = pattern.sub(replace_string, text)
 
-        clean_data = []
-        sentences = re.findall(find_pattern, text)
-        for sentence in sentences:
-            sentence = ''.join([
-                sentence[0],
-                sentence[1],
-                sentence[3]
-            ])
-            post_content = re.sub(pattern, replace_string, sentence)
-            clean_data.append({
-                'pre_content': sentence,
-                'post_content': post_content
-            })
+        clean_data = _find_clean_data(
+            text=text,
+            pattern=pattern,
+            find_pattern=find_pattern,
+            replace_string=replace_string
+        )
 
         return {
             'status': 200,
@@ -166,32 +147,17 @@ def remove_phone(
         if replace_string is None:
             replace_string = 'xxxxxx'
 
-        pattern = r'((\+|00)86)?(1)((3[\d])|(4[5,6,7,9])|(5[0-3,5-9])|(6[5-7])|(7[0-8])|(8[\d])|(9[1,8,9]))(\d{8})(?![0-9])'
-        find_pattern = ''.join([
-            r'([^，。！？,.!?]*)',
-            pattern,
-            r'([^，。！？,.!?]*)'
-        ])
+        pattern = regex_pattern.get_pattern('phone')
+        find_pattern = regex_pattern.get_find_pattern('phone')
 
-        clean_text = re.sub(pattern=pattern,
-                            repl=replace_string,
-                            string=text)
+        clean_text = pattern.sub(replace_string, text)
 
-        clean_data = []
-        sentences = re.findall(find_pattern, text)
-        for sentence in sentences:
-            sentence = ''.join([
-                sentence[0],
-                sentence[3],
-                sentence[4],
-                sentence[12],
-                sentence[13]
-            ])
-            post_content = re.sub(pattern, replace_string, sentence)
-            clean_data.append({
-                'pre_content': sentence,
-                'post_content': post_content
-            })
+        clean_data = _find_clean_data(
+            text=text,
+            pattern=pattern,
+            find_pattern=find_pattern,
+            replace_string=replace_string
+        )
 
         return {
             'status': 200,
@@ -235,39 +201,19 @@ def remove_id_card(
         if replace_string is None:
             replace_string = 'xxxxxx'
 
-        id_card_regex = [
-            r'\b([1-9]\d{5}[1-9]\d{3})((0\d)|(1[0-2]))(([0|1|2]\d)|(3[0-1]))(\d{3}[0-9Xx])(?![0-9])',
-            r'\b([1-9]\d{7})((0\d)|(1[0-2]))(([0-2][1-9])|(3[0-1]))(\d{2}[0-9Xx])(?![0-9])'
-        ]
-
         clean_data = []
-        for regex_exp in id_card_regex:
-            find_pattern = ''.join([
-                r'([^，。！？,.!?]*)',
-                regex_exp,
-                r'([^，。！？,.!?]*)'
-            ])
-
-            sentences = re.findall(find_pattern, text)
-            
-            text = re.sub(pattern=regex_exp,
-                          repl=replace_string,
-                          string=text)
-
-            for sentence in sentences:
-                sentence = ''.join([
-                    sentence[0],
-                    sentence[1],
-                    sentence[2],
-                    sentence[5],
-                    sentence[8],
-                    sentence[9]
-                ])
-                post_content = re.sub(regex_exp, replace_string, sentence)
-                clean_data.append({
-                    'pre_content': sentence,
-                    'post_content': post_content
-                })
+        for pattern_name in ['id_card_18', 'id_card_15']:
+            pattern = regex_pattern.get_pattern(pattern_name)
+            find_pattern = regex_pattern.get_find_pattern(pattern_name)
+
+            clean_data.extend(_find_clean_data(
+                text=text,
+                pattern=pattern,
+                find_pattern=find_pattern,
+                replace_string=replace_string
+            ))
+
+            text = pattern.sub(replace_string, text)
 
         return {
             'status': 200,
@@ -310,42 +256,16 @@ def remove_weixin(
     try:
         if replace_string is None:
             replace_string = 'xxxxxx'
-        weixin_regex = [
-            r'vxin[：|:][a-zA-Z0-9{3,20}]+',
-            r'vx[：|:][a-zA-Z0-9{3,20}]+',
-            r'VX[：|:][a-zA-Z0-9{3,20}]+',
-            r'Vxin[：|:][a-zA-Z0-9{3,20}]+',
-            r'wx[：|:][a-zA-Z0-9{3,20}]+',
-            r'WX[：|:][a-zA-Z0-9{3,20}]+',
-            r'wei xin[：|:][a-zA-Z0-9{3,20}]+',
-            r'weixin[：|:][a-zA-Z0-9{3,20}]+',
-            r'微信[：|:][a-zA-Z0-9{3,20}]+',
-            r'微信号[：|:][a-zA-Z0-9{3,20}]+',
-            r'薇信[：|:][a-zA-Z0-9{3,20}]+',
-            r'薇信号[：|:][a-zA-Z0-9{3,20}]+',
-            r'v信[：|:][a-zA-Z0-9{3,20}]+',
-            r'V信[：|:][a-zA-Z0-9{3,20}]+'
-        ]
+        pattern = regex_pattern.get_pattern('weixin')
 
         clean_data = []
-        for regex_exp in weixin_regex:
-            find_pattern = ''.join([
-                r'[^，。！？,.!?]*',
-                regex_exp,
-                r'[^，。！？,.!?]*'
-            ])
-            sentences = re.findall(regex_exp, text)
-            
-            text = re.sub(pattern=regex_exp,
-                          repl=replace_string,
-                          string=text)
-
-            for sentence in sentences:
-                post_content = re.sub(regex_exp, replace_string, sentence)
-                clean_data.append({
-                    'pre_content': sentence,
-                    'post_content': post_content
-                })
+        for sentence in pattern.findall(text):
+            clean_data.append({
+                'pre_content': sentence,
+                'post_content': replace_string
+            })
+
+        text = pattern.sub(replace_string, text)
 
         return {
             'status': 200,
@@ -388,12 +308,10 @@ def remove_bank_card(
         if replace_string is None:
             replace_string = 'xxxxxx'
 
-        pattern = r'\b([1-9]{1})(\d{15}|\d{18})(?![0-9])'
-        find_pattern = r'([^，。！？,.!?]*)\b([1-9]{1})(\d{15}|\d{18})((?![0-9])[^，。！？,.!?]*)'
+        pattern = regex_pattern.get_pattern('bank_card')
+        find_pattern = regex_pattern.get_find_pattern('bank_card')
 
-        clean_text = re.sub(pattern=pattern,
-                            repl=replace_string,
-                            string=text)
+        clean_text = pattern.sub(replace_string, text)
 
         clean_data = _find_clean_data(
             text=text,
@@ -432,17 +350,19 @@ def _find_clean_data(
     """find clean data for pre_content and post_content.
     
     text: text;
-    pattern: ;
-    find_pattern: ;
+    pattern: the compiled pattern for the privacy info;
+    find_pattern: the compiled pattern for the sentence including the privacy info;
     replace_string: replace string for privacy
-
-    
     """
     clean_data = []
 
-    sentences = re.findall(find_pattern, text)
-    for sentence in sentences:
-        post_content = re.sub(pattern, replace_string, sentence)
+    # most of the text has no privacy info, skip the sentence scanning.
+    if pattern.search(text) is None:
+        return clean_data
+
+    for match in find_pattern.finditer(text):
+        sentence = match.group(0)
+        post_content = pattern.sub(replace_string, sentence)
         clean_data.append({
             'pre_content': sentence,
             'post_content': post_content
@@ -0,0 +1,186 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import functools
+import re
+
+from common import special_characters
+
+# the text around the matched content in the same sentence
+SENTENCE_CONTEXT = r'[^，。！？,.!?]*'
+
+
+def _get_invisible_characters_pattern():
+    return r'[\x00-\x1F\x7F-\x9F\xAD\r\t\b\x0B\x1C\x1D\x1E]'
+
+
+def _get_various_whitespaces_pattern():
+    # all the whitespaces are single characters, so a character class
+    # is enough instead of an alternation.
+    whitespaces = sorted(special_characters.VARIOUS_WHITESPACES)
+    return '[' + ''.join(re.escape(value) for value in whitespaces) + ']'
+
+
+def _get_emojis_pattern():
+    return _get_trie_pattern(special_characters.EMOJI)
+
+
+def _get_email_pattern():
+    return r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+
+
+def _get_ip_address_pattern():
+    return ''.join([
+        r'((?:(?:1[0-9][0-9]\.)|(?:2[0-4][0-9]\.)|',
+        r'(?:25[0-5]\.)|(?:[1-9][0-9]\.)|(?:[0-9]\.))',
+        r'{3}(?:(?:1[0-9][0-9])|(?:2[0-4][0-9])|',
+        r'(?:25[0-5])|(?:[1-9][0-9])|(?:[0-9]))|',
+        r'([\da-fA-F]{1,4}:){7}[\da-fA-F]{1,4})'
+    ])
+
+
+def _get_phone_pattern():
+    return ''.join([
+        r'((\+|00)86)?(1)((3[\d])|(4[5,6,7,9])|(5[0-3,5-9])|',
+        r'(6[5-7])|(7[0-8])|(8[\d])|(9[1,8,9]))(\d{8})(?![0-9])'
+    ])
+
+
+def _get_id_card_18_pattern():
+    return r'\b([1-9]\d{5}[1-9]\d{3})((0\d)|(1[0-2]))(([0|1|2]\d)|(3[0-1]))(\d{3}[0-9Xx])(?![0-9])'
+
+
+def _get_id_card_15_pattern():
+    return r'\b([1-9]\d{7})((0\d)|(1[0-2]))(([0-2][1-9])|(3[0-1]))(\d{2}[0-9Xx])(?![0-9])'
+
+
+def _get_weixin_pattern():
+    # The prefixes are followed by a colon, so none of them can match inside
+    # another one and a single alternation is the same as trying them one by one.
+    prefixes = [
+        'vxin', 'vx', 'VX', 'Vxin', 'wx', 'WX', 'wei xin', 'weixin',
+        '微信', '微信号', '薇信', '薇信号', 'v信', 'V信'
+    ]
+    return ''.join([
+        '(?:',
+        '|'.join(re.escape(value) for value in prefixes),
+        r')[：|:][a-zA-Z0-9{3,20}]+'
+    ])
+
+
+def _get_bank_card_pattern():
+    return r'\b([1-9]{1})(\d{15}|\d{18})(?![0-9])'
+
+
+_PATTERN_GETTERS = {
+    'invisible_characters': _get_invisible_characters_pattern,
+    'various_whitespaces': _get_various_whitespaces_pattern,
+    'emojis': _get_emojis_pattern,
+    'email': _get_email_pattern,
+    'ip_address': _get_ip_address_pattern,
+    'phone': _get_phone_pattern,
+    'id_card_18': _get_id_card_18_pattern,
+    'id_card_15': _get_id_card_15_pattern,
+    'weixin': _get_weixin_pattern,
+    'bank_card': _get_bank_card_pattern
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_pattern_str(name):
+    """Get the regular expression string with the pattern name.
+
+    name: pattern name, such as 'emojis', 'email';
+    """
+    return _PATTERN_GETTERS[name]()
+
+
+@functools.lru_cache(maxsize=None)
+def get_pattern(name):
+    """Get the compiled pattern with the pattern name.
+
+    The pattern is compiled on first use and shared by all the callers.
+
+    name: pattern name, such as 'emojis', 'email';
+    """
+    return re.compile(get_pattern_str(name))
+
+
+@functools.lru_cache(maxsize=None)
+def get_find_pattern(name):
+    """Get the compiled pattern which finds the sentences including
+    the content matched by the pattern name.
+
+    name: pattern name, such as 'emojis', 'email';
+    """
+    return re.compile(''.join([
+        SENTENCE_CONTEXT,
+        '(?:',
+        get_pattern_str(name),
+        ')',
+        SENTENCE_CONTEXT
+    ]))
+
+
+def _get_trie_pattern(words):
+    """Build a regular expression which matches any of the words.
+
+    A plain alternation makes the regex engine try every word at every
+    position. The words are merged into a trie so that each position only
+    follows the branch of its own characters, and the longest word wins.
+
+    words: the word list;
+    """
+    trie = {}
+    for word in words:
+        if len(word) == 0:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    return _get_trie_node_pattern(trie)
+
+
+def _get_trie_node_pattern(node):
+    """Convert a trie node to the regular expression."""
+    is_word_end = '' in node
+
+    alternatives = []
+    single_chars = []
+    for char in sorted(key for key in node if key != ''):
+        child = node[char]
+        if list(child.keys()) == ['']:
+            single_chars.append(re.escape(char))
+        else:
+            alternatives.append(re.escape(char) + _get_trie_node_pattern(child))
+
+    if len(single_chars) == 1:
+        alternatives.append(single_chars[0])
+    elif len(single_chars) > 1:
+        alternatives.append('[' + ''.join(single_chars) + ']')
+
+    if len(alternatives) == 0:
+        return ''
+
+    if len(alternatives) == 1 and not is_word_end:
+        return alternatives[0]
+
+    pattern = '(?:' + '|'.join(alternatives) + ')'
+    if is_word_end:
+        pattern += '?'
+
+    return pattern
@@ -0,0 +1,313 @@
+# Copyright 2023 KubeAGI.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import bisect
+import functools
+import logging
+import re
+import traceback
+
+from common import log_tag_const
+
+from . import clean_transform, regex_pattern
+
+logger = logging.getLogger(__name__)
+
+# the punctuation which ends a sentence, the same as regex_pattern.SENTENCE_CONTEXT
+_SENTENCE_SEPARATOR = re.compile(r'[，。！？,.!?]')
+
+_PRIVACY_REPLACE_STRING = 'xxxxxx'
+
+# The transform types in the order they are applied.
+TRANSFORM_ORDER = [
+    'remove_invisible_characters',
+    'space_standardization',
+    'remove_garbled_text',
+    'traditional_to_simplified',
+    'remove_html_tag',
+    'remove_emojis',
+    'remove_email',
+    'remove_ip_address',
+    'remove_number'
+]
+
+# The patterns which match exactly one character. The steps with these
+# patterns are fused into one stage, which gives the same result as
+# running them one by one, because replacing a character neither creates
+# nor breaks a match of the other patterns. The other regex steps are a
+# stage of their own, because a removed or replaced character changes what
+# the following patterns match, such as the emoji sequences joined by the
+# whitespace U+200D or the boundaries of a card number.
+_CHARACTER_PATTERN_NAMES = {
+    'invisible_characters',
+    'various_whitespaces'
+}
+
+# The steps of each transform type.
+# A regex step replaces the content matched by the pattern and records the
+# sentences including it, or only the matched content if record_match is True.
+# A function step calls the transform function for the whole text.
+_TRANSFORM_STEPS = {
+    'remove_invisible_characters': [
+        {'pattern_name': 'invisible_characters', 'replace_string': ''}
+    ],
+    'space_standardization': [
+        {'pattern_name': 'various_whitespaces', 'replace_string': ' '}
+    ],
+    'remove_garbled_text': [
+        {'function': clean_transform.remove_garbled_text}
+    ],
+    'traditional_to_simplified': [
+        {'function': clean_transform.traditional_to_simplified}
+    ],
+    'remove_html_tag': [
+        {'function': clean_transform.remove_html_tag}
+    ],
+    'remove_emojis': [
+        {'pattern_name': 'emojis', 'replace_string': ''}
+    ],
+    'remove_email': [
+        {'pattern_name': 'email', 'replace_string': _PRIVACY_REPLACE_STRING}
+    ],
+    'remove_ip_address': [
+        {'pattern_name': 'ip_address', 'replace_string': _PRIVACY_REPLACE_STRING}
+    ],
+    'remove_number': [
+        {'pattern_name': 'phone', 'replace_string': _PRIVACY_REPLACE_STRING},
+        {'pattern_name': 'id_card_18', 'replace_string': _PRIVACY_REPLACE_STRING},
+        {'pattern_name': 'id_card_15', 'replace_string': _PRIVACY_REPLACE_STRING},
+        {'pattern_name': 'weixin', 'replace_string': _PRIVACY_REPLACE_STRING, 'record_match': True},
+        {'pattern_name': 'bank_card', 'replace_string': _PRIVACY_REPLACE_STRING}
+    ]
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_transform_plan(transform_types):
+    """Get the transform plan for the transform types.
+
+    transform_types: a tuple of the enabled transform types, such as
+        ('remove_invisible_characters', 'remove_email');
+
+    The plan is a list of stages in the order of TRANSFORM_ORDER. The
+    adjacent regex steps whose patterns match exactly one character are
+    fused into one stage whose patterns are combined into a single
+    alternation, so that the stage scans the text only once. Where the
+    patterns of a stage match the same character, the earlier one in
+    TRANSFORM_ORDER wins. Every other regex step is a stage of its own,
+    which scans the text after all the previous stages as the transforms
+    run one by one.
+    """
+    plan = []
+    regex_steps = []
+    for transform_type in TRANSFORM_ORDER:
+        if transform_type not in transform_types:
+            continue
+
+        for step in _TRANSFORM_STEPS[transform_type]:
+            step = dict(step, transform_type=transform_type)
+            if step.get('pattern_name') in _CHARACTER_PATTERN_NAMES:
+                regex_steps.append(step)
+                continue
+
+            if len(regex_steps) > 0:
+                plan.append(_get_regex_stage(regex_steps))
+                regex_steps = []
+            if step.get('function') is None:
+                # 逐个执行，扫描前面处理后的文本，否则可能漏掉隐私信息或表情
+                plan.append(_get_regex_stage([step]))
+                continue
+
+            plan.append({
+                'type': 'function',
+                'step': step
+            })
+
+    if len(regex_steps) > 0:
+        plan.append(_get_regex_stage(regex_steps))
+
+    return plan
+
+
+def execute_transform_plan(plan, text):
+    """Execute the transform plan on the text.
+
+    plan: the plan from get_transform_plan;
+    text: text;
+
+    The clean data is grouped by transform type in the plan order, each
+    item is like
+        {
+            'transform_type': 'remove_email',
+            'pre_content': '联系邮箱:172817631@qq.com马上申请',
+            'post_content': '联系邮箱:xxxxxx马上申请'
+        }
+    """
+    try:
+        clean_data = []
+        for stage in plan:
+            if stage['type'] == 'regex':
+                text = _execute_regex_stage(stage, text, clean_data)
+            else:
+                text = _execute_function_stage(stage, text, clean_data)
+
+        return {
+            'status': 200,
+            'message': '',
+            'data': {
+                'clean_data': clean_data,
+                'text': text
+            }
+        }
+    except Exception as ex:
+        logger.error(''.join([
+            f"{log_tag_const.CLEAN_TRANSFORM} Executing the transform plan failed\n",
+            f"The tracing error is: \n{traceback.format_exc()}\n"
+        ]))
+        return {
+            'status': 400,
+            'message': str(ex),
+            'data': traceback.format_exc()
+        }
+
+
+def _get_regex_stage(steps):
+    """Combine the regex steps into one stage."""
+    group_patterns = []
+    for index, step in enumerate(steps):
+        step['pattern'] = regex_pattern.get_pattern(step['pattern_name'])
+        group_patterns.append(''.join([
+            f"(?P<s{index}>",
+            regex_pattern.get_pattern_str(step['pattern_name']),
+            ')'
+        ]))
+
+    return {
+        'type': 'regex',
+        'pattern': re.compile('|'.join(group_patterns)),
+        'steps': steps
+    }
+
+
+def _execute_regex_stage(stage, text, clean_data):
+    """Replace all the matched content of the stage in one scan."""
+    steps = stage['steps']
+    matches_for_steps = [[] for _ in steps]
+
+    pieces = []
+    last_end = 0
+    for match in stage['pattern'].finditer(text):
+        step_index = int(match.lastgroup[1:])
+        matches_for_steps[step_index].append(match)
+
+        pieces.append(text[last_end:match.start()])
+        pieces.append(steps[step_index]['replace_string'])
+        last_end = match.end()
+
+    if last_end == 0:
+        # nothing matched
+        return text
+
+    pieces.append(text[last_end:])
+
+    separator_positions = None
+    for step_index, step in enumerate(steps):
+        matches = matches_for_steps[step_index]
+        if len(matches) == 0:
+            continue
+
+        if step.get('record_match'):
+            for match in matches:
+                clean_data.append({
+                    'transform_type': step['transform_type'],
+                    'pre_content': match.group(0),
+                    'post_content': step['replace_string']
+                })
+            continue
+
+        if separator_positions is None:
+            separator_positions = [
+                item.start() for item in _SENTENCE_SEPARATOR.finditer(text)
+            ]
+
+        last_sentence_span = None
+        for match in matches:
+            sentence_span = _get_sentence_span(
+                separator_positions,
+                start=match.start(),
+                end=match.end(),
+                text_length=len(text)
+            )
+            if sentence_span == last_sentence_span:
+                # only one record for one sentence
+                continue
+            last_sentence_span = sentence_span
+
+            # the sentence is recorded as it is after the previous steps
+            sentence = text[sentence_span[0]:sentence_span[1]]
+            for previous_step in steps[:step_index]:
+                sentence = previous_step['pattern'].sub(
+                    previous_step['replace_string'],
+                    sentence
+                )
+            clean_data.append({
+                'transform_type': step['transform_type'],
+                'pre_content': sentence,
+                'post_content': step['pattern'].sub(step['replace_string'], sentence)
+            })
+
+    return ''.join(pieces)
+
+
+def _execute_function_stage(stage, text, clean_data):
+    """Call the transform function of the stage."""
+    step = stage['step']
+    result = step['function'](text)
+    if result['status'] != 200:
+        return text
+
+    if result['data']['found'] > 0:
+        clean_data.append({
+            'transform_type': step['transform_type'],
+            'pre_content': text,
+            'post_content': result['data']['text']
+        })
+
+    return result['data']['text']
+
+
+def _get_sentence_span(
+    separator_positions,
+    start,
+    end,
+    text_length
+):
+    """Get the start and end of the sentence including the matched content.
+
+    separator_positions: the sorted positions of the sentence separators;
+    start: the start of the matched content;
+    end: the end of the matched content;
+    text_length: the length of the text;
+    """
+    index = bisect.bisect_left(separator_positions, start)
+    sentence_start = separator_positions[index - 1] + 1 if index > 0 else 0
+
+    index = bisect.bisect_left(separator_positions, end)
+    if index < len(separator_positions):
+        sentence_end = separator_positions[index]
+    else:
+        sentence_end = text_length
+
+    return (sentence_start, sentence_end)
@@ -25,19 +25,22 @@ logger = logging.getLogger(__name__)
 def save_csv(
     file_name,
     phase_value,
-    data
+    data,
+    task_id=None
 ):
     """Save the csv file.
     
     file_name: file name;
-    phase_value: phase value
+    phase_value: phase value;
+    data: the rows, a list or a generator which is written row by row;
+    task_id: data process task id, the file is saved in the temp folder
+             of the task if it is given;
     """
-    csv_file_path = file_utils.get_temp_file_path()
+    csv_file_path = file_utils.get_temp_file_path(task_id)
 
     # 如果文件夹不存在，则创建
     directory_path = csv_file_path + phase_value
-    if not os.path.exists(directory_path):
-        os.makedirs(directory_path)
+    os.makedirs(directory_path, exist_ok=True)
 
     file_path = directory_path + '/' + file_name
 
@@ -12,7 +12,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import posixpath
+import zipfile
+
 import docx
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+# the relationship type of the main document part
+_OFFICE_DOCUMENT_RELATIONSHIP_TYPE = (
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+)
+_PACKAGE_RELATIONSHIP_TAG = (
+    '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+)
+# the bytes of document.xml read from the zip file at a time
+_READ_SIZE = 64 * 1024
 
 def get_content(
     file_path
@@ -22,10 +40,130 @@ def get_content(
     file_path: file path;
     """
     doc = docx.Document(file_path)
-    content = ""
-    for i in range(len(doc.paragraphs)):
-        para = doc.paragraphs[i]
-        text = para.text
-        content += text
 
-    return content 
+    return ''.join(para.text for para in doc.paragraphs)
+
+
+def iter_blocks(
+    file_path
+):
+    """Get the paragraphs and the table cells in the document order.
+    
+    file_path: file path, or a seekable binary file object;
+
+    It yields the blocks one by one, for example
+    {
+        "text": "xxx",
+        "section": 0,
+        "paragraph": 3
+    }
+    The paragraph is the index of the paragraph or the table in the body,
+    a table yields one block for each cell with "table", "row" and
+    "column" as well. The empty blocks are skipped.
+
+    Only the main document part is read from the zip file, and it is
+    parsed incrementally. Each paragraph or table of the body is released
+    after its blocks are yielded, so the memory is bounded by the largest
+    paragraph or table instead of the whole document, and the images and
+    the other parts are never loaded.
+    """
+    section = 0
+    table_index = 0
+    for paragraph_index, element in enumerate(_iter_body_elements(file_path)):
+        if element.tag == qn('w:p'):
+            text = Paragraph(element, None).text
+            if text.strip():
+                yield {
+                    'text': text,
+                    'section': section,
+                    'paragraph': paragraph_index
+                }
+
+            # 段落中的sectPr表示一节的结束
+            paragraph_properties = element.pPr
+            if paragraph_properties is not None and paragraph_properties.sectPr is not None:
+                section += 1
+        elif element.tag == qn('w:tbl'):
+            for row_index, row in enumerate(Table(element, None).rows):
+                # 合并的单元格只取一次
+                cell_elements = set()
+                for column_index, cell in enumerate(row.cells):
+                    if cell._tc in cell_elements:
+                        continue
+                    cell_elements.add(cell._tc)
+
+                    text = cell.text
+                    if text.strip():
+                        yield {
+                            'text': text,
+                            'section': section,
+                            'paragraph': paragraph_index,
+                            'table': table_index,
+                            'row': row_index,
+                            'column': column_index
+                        }
+            table_index += 1
+
+
+def _iter_body_elements(file_path):
+    """Parse the main document part and yield the children of the body.
+
+    file_path: file path, or a seekable binary file object;
+
+    The elements are created with the element classes of python-docx, as
+    docx.Document does. Each child is removed from the tree once the
+    next one is read.
+    """
+    body_tag = qn('w:body')
+    with zipfile.ZipFile(file_path) as docx_file:
+        parser = etree.XMLPullParser(
+            events=('start', 'end'),
+            remove_blank_text=True,
+            resolve_entities=False
+        )
+        parser.set_element_class_lookup(element_class_lookup)
+
+        with docx_file.open(_get_document_part_name(docx_file)) as document_xml:
+            depth = 0
+            body = None
+            while True:
+                data = document_xml.read(_READ_SIZE)
+                if not data:
+                    break
+
+                parser.feed(data)
+                for event, element in parser.read_events():
+                    if event == 'start':
+                        depth += 1
+                        if depth == 2 and element.tag == body_tag:
+                            body = element
+                        continue
+
+                    depth -= 1
+                    if body is None or element.getparent() is not body:
+                        continue
+
+                    yield element
+                    # 释放已处理的段落和表格
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del body[0]
+
+            parser.close()
+
+
+def _get_document_part_name(docx_file):
+    """Get the name of the main document part in the zip file."""
+    try:
+        rels = etree.fromstring(docx_file.read('_rels/.rels'))
+    except KeyError:
+        return 'word/document.xml'
+
+    for relationship in rels.iter(_PACKAGE_RELATIONSHIP_TAG):
+        if (
+            relationship.get('Type') == _OFFICE_DOCUMENT_RELATIONSHIP_TYPE and
+            relationship.get('TargetMode') != 'External'
+        ):
+            return posixpath.normpath(relationship.get('Target')).lstrip('/')
+
+    return 'word/document.xml'
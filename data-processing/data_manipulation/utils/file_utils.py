@@ -14,8 +14,11 @@
 
 
 import os
+import shutil
 from pathlib import Path
 
+from common.config import config
+
 
 def get_file_name(
     file_name,
@@ -28,14 +31,41 @@ def get_file_name(
     return file_name_without_extension + '_' + handle_name + '.' + file_extension
 
 
-def get_temp_file_path():
-    """Get temp file path"""
-    current_directory = os.getcwd()
+def get_temp_file_path(task_id=None):
+    """Get temp file path
+    
+    task_id: data process task id;
+
+    It returns the temp folder of the task if task_id is given, so that
+    the tasks running at the same time do not share the files, or else
+    the shared temp folder. The temp folders are under
+    config.temp_file_root.
+    """
+    temp_file_root = config.temp_file_root
+
+    if task_id is None:
+        return os.path.join(temp_file_root, '')
+
+    return os.path.join(temp_file_root, 'tasks', task_id, '')
+
+
+def get_dir_size(dir_path):
+    """Get the bytes of all the files in the folder, 0 if it does not exist"""
+    size = 0
+    for root, dirs, files in os.walk(dir_path):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except FileNotFoundError:
+                # the file is deleted by another thread
+                pass
 
-    csv_file_path = os.path.join(current_directory, 'file_handle/temp_file/')
+    return size
 
-    return csv_file_path
 
+def delete_dir(dir_path):
+    """Delete the folder and all the files in it"""
+    shutil.rmtree(dir_path, ignore_errors=True)
 
 
 def delete_file(file_path):
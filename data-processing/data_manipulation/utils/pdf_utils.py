@@ -13,22 +13,158 @@
 # limitations under the License.
 
 
+import collections
+import contextlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 from pypdf import PdfReader
 
+# the process pools shared by all the files, keyed by the number of processes
+_executors = {}
+_executors_lock = threading.Lock()
+
 
 def get_content(
-    file_path
+    file_path,
+    process_count=1,
+    parallel_page_threshold=100
 ):
     """Get the content from a pdf file.
     
     file_path: file path;
+    process_count: the number of processes to extract the text;
+    parallel_page_threshold: the pages are extracted in one process
+        if the file has fewer pages;
+    """
+    return ''.join(
+        text
+        for page_number, text in iter_pages(
+            file_path,
+            process_count=process_count,
+            parallel_page_threshold=parallel_page_threshold
+        )
+    )
+
+
+def iter_pages(
+    file_path,
+    page_window_size=50,
+    process_count=1,
+    parallel_page_threshold=100
+):
+    """Get the text of the pages one by one.
+    
+    file_path: file path, or a seekable binary file object which is not
+               closed;
+    page_window_size: the number of pages read by one PdfReader;
+    process_count: the number of processes to extract the text;
+    parallel_page_threshold: the pages are extracted in one process
+        if the file has fewer pages;
+
+    It yields (page_number, text) in page order, the page_number starts
+    from 0. A new PdfReader is used for each window of pages, so the
+    objects parsed for the pages before are released and the memory is
+    bounded by the window.
+
+    If process_count is more than 1, the windows are extracted by a
+    process pool, at most two windows per process are extracted ahead
+    of the pages yielded. The pool is created on first use and shared by
+    all the files, so the number of processes does not grow with the
+    files extracted at the same time. A file object is always extracted
+    in this process, because the worker processes open the file by path.
+    """
+    is_path = isinstance(file_path, (str, os.PathLike))
+    if is_path:
+        pdf_file_context = open(file_path, 'rb')
+    else:
+        pdf_file_context = contextlib.nullcontext(file_path)
+
+    with pdf_file_context as pdf_file:
+        page_count = len(PdfReader(pdf_file).pages)
+
+        if not is_path or process_count <= 1 or page_count < parallel_page_threshold:
+            for start in range(0, page_count, page_window_size):
+                reader = PdfReader(pdf_file)
+                for page_number in range(start, min(start + page_window_size, page_count)):
+                    yield (page_number, reader.pages[page_number].extract_text())
+            return
+
+    page_ranges = [
+        (start, min(start + page_window_size, page_count))
+        for start in range(0, page_count, page_window_size)
+    ]
+    executor = _get_executor(process_count)
+    futures = collections.deque()
+    try:
+        for start, end in page_ranges:
+            futures.append((
+                start,
+                executor.submit(_extract_page_range, file_path, start, end)
+            ))
+            if len(futures) < process_count * 2:
+                continue
+
+            yield from _get_page_range_result(futures.popleft())
+
+        while len(futures) > 0:
+            yield from _get_page_range_result(futures.popleft())
+    except BrokenProcessPool:
+        # 进程异常退出后进程池不可用，下一个文件使用新的进程池
+        _remove_executor(process_count, executor)
+        raise
+    finally:
+        # 共享的进程池不关闭，只取消这个文件还未开始的页
+        for start, future in futures:
+            future.cancel()
+
+
+def _get_executor(process_count):
+    """Get the shared process pool, it is created on first use.
+
+    The worker processes are spawned instead of forked. This process runs
+    many threads, and a forked child could deadlock on a lock held by one
+    of them at the time of the fork.
     """
-    reader = PdfReader(file_path)
-    content = ""
+    with _executors_lock:
+        executor = _executors.get(process_count)
+        if executor is None:
+            executor = ProcessPoolExecutor(
+                max_workers=process_count,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _executors[process_count] = executor
 
-    for page in reader.pages:
-        content += page.extract_text()
+        return executor
 
-    return content 
+
+def _remove_executor(
+    process_count,
+    executor
+):
+    """Remove the broken process pool so that a new one is created."""
+    with _executors_lock:
+        if _executors.get(process_count) is executor:
+            del _executors[process_count]
+
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_page_range(
+    file_path,
+    start,
+    end
+):
+    """Extract the text of the pages from start to end in a worker process."""
+    with open(file_path, 'rb') as pdf_file:
+        reader = PdfReader(pdf_file)
+        return [reader.pages[page_number].extract_text() for page_number in range(start, end)]
 
 
+def _get_page_range_result(item):
+    start, future = item
+    for index, text in enumerate(future.result()):
+        yield (start + index, text)
@@ -29,9 +29,35 @@
         update_program character varying(64) COLLATE pg_catalog."default",
         namespace character varying(64) COLLATE pg_catalog."default",
         bucket_name character varying(64) COLLATE pg_catalog."default",
+        schedule_status character varying(32) COLLATE pg_catalog."default",
+        priority integer DEFAULT 0,
+        schedule_worker character varying(128) COLLATE pg_catalog."default",
+        schedule_heartbeat_datetime character varying(32) COLLATE pg_catalog."default",
+        request_info jsonb,
         CONSTRAINT data_process_task_pkey PRIMARY KEY (id)
     );
 
+    -- 已有的数据库中增加新的字段
+    ALTER TABLE public.data_process_task
+        ADD COLUMN IF NOT EXISTS schedule_status character varying(32) COLLATE pg_catalog."default";
+    ALTER TABLE public.data_process_task
+        ADD COLUMN IF NOT EXISTS priority integer DEFAULT 0;
+    ALTER TABLE public.data_process_task
+        ADD COLUMN IF NOT EXISTS schedule_worker character varying(128) COLLATE pg_catalog."default";
+    ALTER TABLE public.data_process_task
+        ADD COLUMN IF NOT EXISTS schedule_heartbeat_datetime character varying(32) COLLATE pg_catalog."default";
+    ALTER TABLE public.data_process_task
+        ADD COLUMN IF NOT EXISTS request_info jsonb;
+
+    CREATE INDEX IF NOT EXISTS data_process_task_schedule_status_idx
+        ON public.data_process_task (schedule_status, priority DESC, create_datetime);
+
+    COMMENT ON COLUMN public.data_process_task.schedule_status IS '调度状态 created, waiting, running, finished';
+    COMMENT ON COLUMN public.data_process_task.priority IS '优先级 数值越大越先执行';
+    COMMENT ON COLUMN public.data_process_task.schedule_worker IS '执行任务的进程';
+    COMMENT ON COLUMN public.data_process_task.schedule_heartbeat_datetime IS '执行任务的进程最近心跳时间';
+    COMMENT ON COLUMN public.data_process_task.request_info IS 'json结构 新增任务的请求 用于恢复任务';
+
     -- Table: public.data_process_task_detail
 
     -- DROP TABLE IF EXISTS public.data_process_task_detail;
@@ -71,7 +97,7 @@
     COMMENT ON COLUMN public.data_process_task_detail.document_id IS '文档id';
     COMMENT ON COLUMN public.data_process_task_detail.document_chunk_id IS '文档chunk id';
 
-    CREATE TABLE public.data_process_task_question_answer (
+    CREATE TABLE IF NOT EXISTS public.data_process_task_question_answer (
         id varchar(32) NOT NULL, -- 主键
         task_id varchar(32) NULL, -- 任务Id
         file_name varchar(512) NULL, -- 文件名称
@@ -125,9 +151,17 @@
         from_source_type character(64) COLLATE pg_catalog."default",
         from_source_path character varying(4096) COLLATE pg_catalog."default",
         document_type character varying(64) COLLATE pg_catalog."default",
+        qa_cache_hit_count integer DEFAULT 0,
+        qa_cache_miss_count integer DEFAULT 0,
         CONSTRAINT data_process_task_document_pkey PRIMARY KEY (id)
     );
 
+    -- 已有的数据库中增加新的字段
+    ALTER TABLE public.data_process_task_document
+        ADD COLUMN IF NOT EXISTS qa_cache_hit_count integer DEFAULT 0;
+    ALTER TABLE public.data_process_task_document
+        ADD COLUMN IF NOT EXISTS qa_cache_miss_count integer DEFAULT 0;
+
     COMMENT ON TABLE public.data_process_task_document IS '数据处理任务文档';
     COMMENT ON COLUMN public.data_process_task_document.id IS '主键';
     COMMENT ON COLUMN public.data_process_task_document.file_name IS '文件名称';
@@ -147,6 +181,8 @@
     COMMENT ON COLUMN public.data_process_task_document.from_source_type IS '如minio等';
     COMMENT ON COLUMN public.data_process_task_document.from_source_path IS '文件路径, minio的需要包括bucket的名称';
     COMMENT ON COLUMN public.data_process_task_document.document_type IS '文档类型 如txt web_url pdf等';
+    COMMENT ON COLUMN public.data_process_task_document.qa_cache_hit_count IS 'QA缓存命中的chunk数量';
+    COMMENT ON COLUMN public.data_process_task_document.qa_cache_miss_count IS 'QA缓存未命中的chunk数量';
 
     CREATE TABLE IF NOT EXISTS public.data_process_task_detail_preview
     (
@@ -253,3 +289,35 @@
     COMMENT ON COLUMN public.data_process_task_question_answer_clean.update_datetime IS '更新时间';
     COMMENT ON COLUMN public.data_process_task_question_answer_clean.update_user IS '更新用户';
     COMMENT ON COLUMN public.data_process_task_question_answer_clean.update_program IS '更新程序';
+
+    CREATE TABLE IF NOT EXISTS public.data_process_task_qa_cache
+    (
+        id character varying(64) COLLATE pg_catalog."default" NOT NULL,
+        model character varying(256) COLLATE pg_catalog."default",
+        question_answer jsonb,
+        hit_count integer DEFAULT 0,
+        last_hit_datetime character varying(32) COLLATE pg_catalog."default",
+        create_datetime character varying(32) COLLATE pg_catalog."default",
+        create_user character varying(32) COLLATE pg_catalog."default",
+        create_program character varying(64) COLLATE pg_catalog."default",
+        update_datetime character varying(32) COLLATE pg_catalog."default",
+        update_user character varying(32) COLLATE pg_catalog."default",
+        update_program character varying(32) COLLATE pg_catalog."default",
+        CONSTRAINT data_process_task_qa_cache_pkey PRIMARY KEY (id)
+    );
+
+    CREATE INDEX IF NOT EXISTS data_process_task_qa_cache_last_hit_datetime_idx
+        ON public.data_process_task_qa_cache (last_hit_datetime);
+
+    COMMENT ON TABLE public.data_process_task_qa_cache IS '数据处理QA缓存';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.id IS '主键 chunk内容和模型配置的sha256';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.model IS '模型';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.question_answer IS 'json结构 问题和答案列表';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.hit_count IS '命中次数';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.last_hit_datetime IS '最近命中时间';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.create_datetime IS '创建时间';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.create_user IS '创建用户';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.create_program IS '创建程序';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.update_datetime IS '更新时间';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.update_user IS '更新用户';
+    COMMENT ON COLUMN public.data_process_task_qa_cache.update_program IS '更新程序';